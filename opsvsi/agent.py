@@ -0,0 +1,121 @@
+#!/usr/bin/python
+
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Client side of the scripts/vsi_agent command agent. Commands are sent over
+# the agent's unix socket and any number of them can be in flight at once;
+# replies are matched to requests by id.
+
+import itertools
+import os
+import socket
+import threading
+import time
+
+AGENT_SCRIPT = os.path.join(os.path.dirname(__file__), "scripts", "vsi_agent")
+
+
+class AgentError(Exception):
+    pass
+
+
+class AgentRequest(object):
+    def __init__(self, cmd):
+        self.cmd = cmd
+        self.done = threading.Event()
+        self.status = None
+        self.stdout = None
+        self.stderr = None
+
+    def result(self, timeout=None):
+        # Event.wait() without a timeout can't be interrupted in python 2.
+        if timeout is None:
+            while not self.done.wait(3600):
+                pass
+        elif not self.done.wait(timeout):
+            raise AgentError("Timed out waiting for: %s" % self.cmd)
+        if self.status is None:
+            raise AgentError("Agent connection lost running: %s" % self.cmd)
+        return self.status, self.stdout, self.stderr
+
+
+class AgentClient(object):
+    def __init__(self, path, timeout=10):
+        # The agent creates the socket once it is listening.
+        deadline = time.time() + timeout
+        while not os.path.exists(path):
+            if time.time() > deadline:
+                raise AgentError("Agent socket %s not found" % path)
+            time.sleep(0.05)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+        self.sock_file = self.sock.makefile('rb')
+        self.ids = itertools.count(1)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.reader = threading.Thread(target=self.readReplies)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def readReplies(self):
+        try:
+            while True:
+                header = self.sock_file.readline()
+                if not header:
+                    break
+                req_id, status, out_len, err_len = header.split()
+                out = self.sock_file.read(int(out_len))
+                err = self.sock_file.read(int(err_len))
+                with self.lock:
+                    request = self.pending.pop(req_id)
+                request.status = int(status)
+                request.stdout = out
+                request.stderr = err
+                request.done.set()
+        except (socket.error, ValueError):
+            pass
+
+        # Wake up whoever is still waiting.
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for request in pending.values():
+            request.done.set()
+
+    def submit(self, cmd):
+        request = AgentRequest(cmd)
+        with self.lock:
+            req_id = str(next(self.ids))
+            self.pending[req_id] = request
+            self.sock.sendall("%s %d\n%s" % (req_id, len(cmd), cmd))
+        return request
+
+    # Run a command and return its (exit status, stdout, stderr).
+    def run(self, cmd, timeout=None):
+        return self.submit(cmd).result(timeout)
+
+    # Run all the commands concurrently, results are in the same order.
+    def runAll(self, cmds, timeout=None):
+        requests = [self.submit(cmd) for cmd in cmds]
+        return [request.result(timeout) for request in requests]
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except socket.error:
+            pass
+        self.sock_file.close()
+        self.sock.close()
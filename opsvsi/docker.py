@@ -7,14 +7,113 @@ from mininet.cli import *
 from mininet.log import *
 from mininet.util import *
 from subprocess import *
+from dockerapi import *
+from agent import *
+import atexit
+import json
+import re
+import time
+import socket
 import select
+import shutil
+import signal
+import threading
+import uuid
 import os
+from collections import OrderedDict
+from contextlib import contextmanager
 
 # Using this constant for init_cmd will allow
 # the docker image to execute # its own startup
 # scripts/default CMD as defined in its corresponding Dockerfile.
 DOCKER_DEFAULT_CMD = "DOCKER_DEFAULT_CMD"
 
+# Default number of seconds to wait for a container to be running
+# after it has been started. Can be overridden per node with the
+# 'start_timeout' option.
+DOCKER_START_TIMEOUT = 60
+
+# Nodes started with the 'snapshot' option restore their container from
+# a CRIU checkpoint of an already booted container of the same image, when
+# there is one. Checkpoints are kept per image ID under this directory.
+DOCKER_SNAPSHOT_DIR = "/tmp/openswitch-test/vsi-snapshots"
+DOCKER_SNAPSHOT_NAME = "booted"
+
+# Binds the checkpointed container was created with, kept in the checkpoint
+# directory.
+DOCKER_SNAPSHOT_BINDS = "vsi_binds.json"
+
+# Seconds to wait for the node shell to exit before killing it.
+SHELL_EXIT_TIMEOUT = 10
+
+
+def snapshotDir(image_id):
+    return os.path.join(DOCKER_SNAPSHOT_DIR, image_id.split(':')[-1][:12])
+
+
+# The binds of a container with the source of /shared left out. Every node
+# has its own /shared directory; runc checkpoints bind mounts as external
+# mounts keyed by their destination, so a restore picks up the /shared of
+# the new container. All the other binds have to be the same.
+def snapshotBinds(binds):
+    result = []
+    for bind in binds:
+        parts = bind.split(':')
+        if len(parts) > 1 and parts[1] == '/shared':
+            parts[0] = ''
+        result.append(':'.join(parts))
+    return result
+
+# Seconds to wait for the vtysh prompt after a command, and the largest
+# chunk the vtysh output is read in.
+CLI_TIMEOUT = 120
+CLI_MAX_READ = 65536
+
+
+class CLITimeoutError(Exception):
+    pass
+
+
+# Read the output of an interactive CLI (vtysh) from fd until done(output)
+# is true, usually once its prompt shows up. The timeout applies to the
+# whole read. Raises CLITimeoutError on timeout or if the CLI exits.
+def readCLIUntil(name, fd, done, timeout, buflen=1024):
+    deadline = time.time() + timeout
+
+    out = bytearray()
+    while True:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise CLITimeoutError("%s: no vtysh prompt after %d seconds, "
+                                  "output so far:\n%s" %
+                                  (name, timeout, str(out)))
+        ready, _, _ = select.select([fd], [], [], remaining)
+        if not ready:
+            continue
+
+        data = os.read(fd, buflen)
+        if not data:
+            raise CLITimeoutError("%s: vtysh exited, output so far:\n%s" %
+                                  (name, str(out)))
+        out += data
+        if done(out):
+            break
+
+        # Big outputs (running-config, BGP tables) come in full reads,
+        # read them in bigger chunks.
+        if len(data) == buflen and buflen < CLI_MAX_READ:
+            buflen *= 2
+
+    return str(out)
+
+
+# Whether a vtysh command may change the configuration, i.e. anything but
+# a show command.
+def cliChangesConfig(cmd):
+    return re.match(r'^\s*(do\s+)?sh(o|ow)?(\s|$)', cmd) is None and \
+        cmd.strip() != ''
+
+
 # This function dumps the last "LINES_TO_DUMP" lines from the docker daemon logs
 # Docker daemon logs can be gathered by different means depending on the host OS
 # For example:
@@ -67,9 +166,98 @@ def dumpDockerLogFile():
     for line in lines:
         error(line)
 
+class PooledContainer(object):
+    def __init__(self, container_name, shareddir, pid, image, mounts):
+        self.container_name = container_name
+        self.shareddir = shareddir
+        self.pid = pid
+        self.key = ContainerPool.key(image, mounts)
+
+
+# Keeps up to 'size' idle booted containers per image (and mounts) so that
+# they can be leased by the nodes of later tests in the same process,
+# instead of booting a new container every time. Idle containers are
+# removed when the process exits.
+class ContainerPool(object):
+    def __init__(self, size, pooldir=None):
+        pool_id = 'vsipool-' + str(uuid.uuid4().fields[4])
+        sbox_uuid = os.environ.get('SANDBOX_UUID')
+        if sbox_uuid is not None:
+            pool_id = sbox_uuid + "-" + pool_id
+        self.id = pool_id
+        self.size = size
+        if pooldir is None:
+            pooldir = "/tmp/openswitch-test/" + self.id
+        self.pooldir = pooldir
+        self.idle = {}
+        self.count = 0
+        self.lock = threading.Lock()
+        atexit.register(self.drain)
+
+    @staticmethod
+    def key(image, mounts):
+        return (image, tuple(mounts))
+
+    def allocate(self):
+        with self.lock:
+            self.count += 1
+            container_name = "%s_%d" % (self.id, self.count)
+        shareddir = os.path.join(self.pooldir, container_name, 'shared')
+        os.makedirs(shareddir)
+        return container_name, shareddir
+
+    def lease(self, image, mounts):
+        key = ContainerPool.key(image, mounts)
+        while True:
+            with self.lock:
+                idle = self.idle.get(key)
+                if not idle:
+                    return None
+                container = idle.pop()
+
+            # Make sure it didn't die while idle.
+            try:
+                state = get_docker_client().inspect_container(
+                    container.container_name)['State']
+            except DockerApiError:
+                continue
+            if state['Pid'] == container.pid:
+                return container
+            get_docker_client().remove_container(container.container_name)
+
+    def hasRoom(self, image, mounts):
+        with self.lock:
+            idle = self.idle.get(ContainerPool.key(image, mounts), [])
+            return len(idle) < self.size
+
+    # Take the container back if there is room for it. Returns whether it
+    # was taken, otherwise it is up to the caller to remove it.
+    def release(self, container):
+        with self.lock:
+            idle = self.idle.setdefault(container.key, [])
+            if len(idle) >= self.size:
+                return False
+            idle.append(container)
+            return True
+
+    def drain(self):
+        with self.lock:
+            containers = [c for idle in self.idle.values() for c in idle]
+            self.idle = {}
+        for container in containers:
+            try:
+                get_docker_client().remove_container(container.container_name)
+            except (DockerApiError, socket.error) as err:
+                error("Failed to remove pooled docker %s: %s\n" %
+                      (container.container_name, err))
+
+
 class DockerNode(Node):
     def __init__(self, name, image='openswitch/ubuntutest', **kwargs):
         self.image = image
+        # Parsed running-config kept by SwitchVtyshUtils, dropped whenever
+        # a command may have changed the configuration.
+        self.runningConfig = None
 
         self.testid = kwargs.pop('testid', None)
         self.container_name = self.testid + '_' + name
@@ -79,30 +267,124 @@ class DockerNode(Node):
         os.makedirs(self.nodedir)
 
         self.shareddir = self.nodedir + '/shared'
-        os.makedirs(self.shareddir)
 
         self.mounts = kwargs.pop('mounts', [])
         self.init_cmd = kwargs.pop('init_cmd', '/sbin/init')
+        self.start_timeout = kwargs.pop('start_timeout', DOCKER_START_TIMEOUT)
+        self.snapshot = kwargs.pop('snapshot', False)
+        self.image_id = None
+        self.restored = False
 
         self.nodetype = kwargs.pop('nodetype', "VsiOpenSwitch")
 
+        # Optional ContainerPool to lease the container from
+        # and to give it back to at the end of the test.
+        self.pool = kwargs.pop('pool', None)
+        self.leased = None
+
+        # Run commands through an agent inside the container, see
+        # execCmd(). VSI_AGENT=1 turns it on for all the nodes.
+        self.useAgent = kwargs.pop('agent',
+                                   os.environ.get('VSI_AGENT') == '1')
+        self.agent = None
+
+        # Seconds spent in each boot phase of the node, in boot order.
+        # Also registered by name in the optional 'boot_times' dict of the
+        # test, which keeps them when the node fails to boot.
+        self.bootTimes = OrderedDict()
+        boot_times = kwargs.pop('boot_times', None)
+        if boot_times is not None:
+            boot_times[name] = (self.nodetype, self.bootTimes)
+
+        self.docker = get_docker_client()
+        self.bashrc_file_name = "mininet_bash_rc"
+
+        if self.pool is not None:
+            self.leased = self.pool.lease(self.image, self.mounts)
+
+        if self.leased is not None:
+            # Reuse an already booted container. Its shared directory
+            # lives in the pool, link it into the test log dir.
+            self.container_name = self.leased.container_name
+            os.symlink(self.leased.shareddir, self.shareddir)
+            self.docker_pid = self.leased.pid
+            debug("Docker container leased from pool.\n")
+            debug(" Name=" + self.container_name)
+            debug(" PID=", self.docker_pid)
+        else:
+            if self.pool is not None:
+                self.container_name, pool_shareddir = self.pool.allocate()
+                os.symlink(pool_shareddir, self.shareddir)
+            else:
+                os.makedirs(self.shareddir)
+            self.startContainer()
+
+        if self.useAgent:
+            self.startAgent()
+
+        super(DockerNode, self).__init__(name, **kwargs)
+
+    def startAgent(self):
+        shutil.copy(AGENT_SCRIPT, self.shareddir)
+        # A pooled container may still have the socket of a previous agent.
+        agent_sock = os.path.join(os.path.realpath(self.shareddir),
+                                  "vsi_agent.sock")
+        if os.path.exists(agent_sock):
+            os.unlink(agent_sock)
+
+        try:
+            with self.bootPhase('agent'):
+                self.docker.exec_detached(self.container_name,
+                                          ["python", "/shared/vsi_agent",
+                                           "/shared/vsi_agent.sock"])
+                self.agent = AgentClient(agent_sock)
+        except (DockerApiError, AgentError, socket.error) as err:
+            # Before Node.__init__, the node has no name yet.
+            error("%s: command agent not available, using the shell: %s\n" %
+                  (self.container_name, err))
+            self.agent = None
+
+    # Run a command in the container and return its (exit status, stdout,
+    # stderr). Through the agent this is a socket round trip and commands
+    # can run concurrently. Without it the command goes through the node
+    # shell, with stderr merged into stdout.
+    def execCmd(self, cmd):
+        if self.agent is not None:
+            self.runningConfig = None
+            return self.agent.run(cmd)
+        out = self.cmd(cmd)
+        status = int(self.cmd("echo $?"))
+        return status, out, ''
+
+    # Run the commands concurrently through the agent (one after the
+    # other through the shell). Results are in the same order.
+    def execCmds(self, cmds):
+        if self.agent is not None:
+            self.runningConfig = None
+            return self.agent.runAll(cmds)
+        return [self.execCmd(cmd) for cmd in cmds]
+
+    @contextmanager
+    def bootPhase(self, phase):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.bootTimes[phase] = time.time() - start
+
+    def startContainer(self):
         # Just in case test isn't running in a container,
         # clean up any mess left by previous run
-        call(["docker rm -f " + self.container_name], stdout=PIPE,
-             stderr=PIPE, shell=True)
-
-        mountParams = []
-        for mount in self.mounts:
-            mountParams += ["-v", mount]
+        with self.bootPhase('docker_rm'):
+            self.docker.remove_container(self.container_name)
 
         # If OpsVsiHost simulate terminal, and run BASH
         if self.nodetype == "OpsVsiHost":
-            dockerOptions = "-dt"
+            tty = True
             self.init_cmd = "/bin/bash"
         else:
-            dockerOptions = "-d"
+            tty = False
 
-        self.bashrc_file_name = "mininet_bash_rc"
         f = open(self.shareddir + '/' + self.bashrc_file_name, "w")
         f.write("export PS1='\177'")
         f.close()
@@ -110,60 +392,191 @@ class DockerNode(Node):
         # /tmp File system on the docker app is wiped out
         # after starting the docker.
         # So don't create any files in /tmp directory of the docker app.
+        binds = [os.path.realpath(self.shareddir) + ":/shared",
+                 "/dev/log:/dev/log",
+                 "/lib/modules:/lib/modules",
+                 "/sys/fs/cgroup:/sys/fs/cgroup"]
         env_cov_data_dir = os.environ.get('VSI_COV_DATA_DIR', None)
-        if env_cov_data_dir is None:
-            cmd = ["docker", "run", "--privileged",
-                   "-v", self.shareddir + ":/shared",
-                   "-v", "/dev/log:/dev/log",
-                   "-v", "/lib/modules:/lib/modules",
-                   "-v", "/sys/fs/cgroup:/sys/fs/cgroup"] + \
-                   mountParams + \
-                   ["-h", self.container_name, "--name=" + self.container_name,
-                    dockerOptions, self.image]
-        else:
-            cmd = ["docker", "run", "--privileged",
-                   "-v", self.shareddir + ":/shared",
-                   "-v", "/dev/log:/dev/log",
-                   "-v", "/sys/fs/cgroup:/sys/fs/cgroup",
-                   "-v", "/lib/modules:/lib/modules",
-                   "-v", env_cov_data_dir + ":" + env_cov_data_dir] +\
-                   mountParams + \
-                   ["-h", self.container_name, "--name=" + self.container_name,
-                    dockerOptions, self.image]
+        if env_cov_data_dir is not None:
+            binds.append(env_cov_data_dir + ":" + env_cov_data_dir)
+        binds += self.mounts
 
+        cmd = None
         if self.init_cmd != DOCKER_DEFAULT_CMD:
-            cmd.append(self.init_cmd)
-
-        dPid = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT, close_fds=True)
-        # do we have to read stdout/stderr now before we wait
-        d_out = dPid.stdout.readlines();
-        dPid.wait();
-        if dPid.returncode != 0:
-            # dump d_out and then abort I guess
-            debug(d_out)
-            error("Failed to start docker")
+            cmd = [self.init_cmd]
+
+        config = {'cmd': cmd,
+                  'hostname': self.container_name,
+                  'binds': binds,
+                  'privileged': True,
+                  'tty': tty}
+
+        self.binds = binds
+        try:
+            with self.bootPhase('docker_run'):
+                if not self.restoreSnapshot(config):
+                    self.docker.run_container(self.container_name,
+                                              self.image, **config)
+            # Wait until container actually starts and grab it's PID
+            with self.bootPhase('pid_discovery'):
+                state = self.docker.wait_for_container(self.container_name,
+                                                       self.start_timeout)
+        except (DockerApiError, ContainerStartError) as err:
+            debug(str(err))
+            error("Failed to start docker %s: %s\n" %
+                  (self.container_name, err))
             dumpDockerLogFile()
             # Clean up any partial/zombie docker instance
-            call(["docker rm -f "+self.container_name], stdout=PIPE,
-                 stderr=PIPE, shell=True)
-        # Wait until container actually starts and grab it's PID
-        while True:
-            pid_cmd = ["docker", "inspect", "--format='{{ .State.Pid }}'",
-                       self.container_name]
-            pidp = Popen(pid_cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT,
-                         close_fds=False)
-            ps_out = pidp.stdout.readlines()
-            pidp.wait()
-            if pidp.returncode == 0:
-                pid = int(ps_out[0])
-                if pid != 0:
-                    self.docker_pid = pid
-                    debug("Docker container started.\n")
-                    debug(" Name=" + self.container_name)
-                    debug(" PID=", self.docker_pid)
-                    break
+            self.docker.remove_container(self.container_name)
+            raise
+
+        self.docker_pid = state['Pid']
+        debug("Docker container started.\n")
+        debug(" Name=" + self.container_name)
+        debug(" PID=", self.docker_pid)
+
+    def restoreSnapshot(self, config):
+        if not self.snapshot:
+            return False
+
+        try:
+            self.image_id = self.docker.inspect_image(self.image)['Id']
+        except DockerApiError:
+            # Not pulled yet, so there can't be a snapshot of it either.
+            return False
+
+        checkpoint_dir = snapshotDir(self.image_id)
+        snapshot = os.path.join(checkpoint_dir, DOCKER_SNAPSHOT_NAME)
+        if not os.path.isdir(snapshot):
+            return False
+
+        try:
+            f = open(os.path.join(snapshot, DOCKER_SNAPSHOT_BINDS))
+            saved_binds = json.load(f)
+            f.close()
+        except (IOError, ValueError):
+            saved_binds = None
+        if saved_binds != snapshotBinds(config['binds']):
+            info("%s: boot snapshot was taken with other binds, booting "
+                 "it instead\n" % self.container_name)
+            return False
+
+        container_id = self.docker.create_container(self.container_name,
+                                                    self.image, **config)
+        try:
+            self.docker.start_container(container_id,
+                                        checkpoint=DOCKER_SNAPSHOT_NAME,
+                                        checkpoint_dir=checkpoint_dir)
+        except DockerApiError as err:
+            error("Failed to restore %s from boot snapshot, booting it "
+                  "instead: %s\n" % (self.container_name, err))
+            self.docker.remove_container(container_id)
+            return False
+
+        debug("Docker container restored from boot snapshot.\n")
+        self.restored = True
+        return True
+
+    # Checkpoint the running container so that later nodes of the same
+    # image can be restored from it. The container keeps running.
+    #
+    # CRIU can't checkpoint the external tty of the 'docker exec' session
+    # of the node shell, nor the connection of the command agent, so they
+    # are stopped for the checkpoint and started again after it.
+    def saveSnapshot(self):
+        if self.image_id is None:
+            self.image_id = self.docker.inspect_image(self.image)['Id']
+
+        checkpoint_dir = snapshotDir(self.image_id)
+        snapshot = os.path.join(checkpoint_dir, DOCKER_SNAPSHOT_NAME)
+        if os.path.isdir(snapshot):
+            return
+        if not os.path.isdir(checkpoint_dir):
+            try:
+                os.makedirs(checkpoint_dir)
+            except OSError:
+                pass
+
+        # Checkpoint under a private name and move it in place, as other
+        # nodes may be saving a snapshot of the same image concurrently.
+        checkpoint = DOCKER_SNAPSHOT_NAME + '-' + self.container_name
+        self.detachShell()
+        try:
+            self.docker.checkpoint_container(self.container_name, checkpoint,
+                                             checkpoint_dir)
+        except DockerApiError as err:
+            error("Failed to save boot snapshot of %s: %s\n" %
+                  (self.container_name, err))
+            return
+        finally:
+            self.attachShell()
 
-        super(DockerNode, self).__init__(name, **kwargs)
+        # Restores must use the same binds, see snapshotBinds().
+        f = open(os.path.join(checkpoint_dir, checkpoint,
+                              DOCKER_SNAPSHOT_BINDS), 'w')
+        json.dump(snapshotBinds(self.binds), f)
+        f.close()
+        try:
+            os.rename(os.path.join(checkpoint_dir, checkpoint), snapshot)
+        except OSError:
+            shutil.rmtree(os.path.join(checkpoint_dir, checkpoint),
+                          ignore_errors=True)
+
+    # Stop the node shell and the command agent, leaving nothing of them
+    # in the container.
+    def detachShell(self):
+        if self.agent is not None:
+            self.cmd("kill `cat /shared/vsi_agent.sock.pid` 2>/dev/null")
+            self.agent.close()
+            self.agent = None
+
+        self.write("exit\n")
+        deadline = time.time() + SHELL_EXIT_TIMEOUT
+        while self.shell.poll() is None and time.time() < deadline:
+            time.sleep(0.05)
+        if self.shell.poll() is None:
+            os.killpg(self.shell.pid, signal.SIGHUP)
+            self.shell.wait()
+
+        self.outToNode.pop(self.stdout.fileno(), None)
+        self.inToNode.pop(self.stdin.fileno(), None)
+        self.stdin.close()
+        self.stdout.close()
+        self.shell = None
+
+    def attachShell(self):
+        DockerNode.startShell(self)
+        if self.useAgent:
+            self.startAgent()
+
+    # Bring the container back to the state it had right after boot, so
+    # that another test can lease it. Nodes that can't do that return
+    # False and are never pooled.
+    def resetContainer(self):
+        return False
+
+    def releaseContainer(self):
+        # Don't bother resetting the container if the pool is full.
+        if not self.pool.hasRoom(self.image, self.mounts):
+            return False
+        try:
+            if not self.resetContainer():
+                return False
+        except Exception as err:
+            error("Failed to reset docker %s: %s\n" %
+                  (self.container_name, err))
+            return False
+
+        # Other nodes may have filled the pool in the meantime.
+        if not self.pool.release(PooledContainer(
+                self.container_name, os.path.realpath(self.shareddir),
+                self.docker_pid, self.image, self.mounts)):
+            return False
+
+        # The container stays, only stop this test's shell into it.
+        if self.shell.poll() is None:
+            os.killpg(self.shell.pid, signal.SIGHUP)
+        return True
 
     def popen(self, *args, **kwargs):
         return Node.popen(self, *args, mncmd=['docker', 'exec',
@@ -171,11 +584,25 @@ class DockerNode(Node):
                           **kwargs)
 
     def terminate(self):
+        if self.agent is not None:
+            self.agent.close()
+            self.agent = None
         if self.shell:
-            call(["docker rm -f "+self.container_name], stdout=PIPE,
-                 stderr=PIPE, shell=True)
+            if self.pool is not None and self.releaseContainer():
+                self.cleanup()
+                return
+            try:
+                self.docker.remove_container(self.container_name)
+            except DockerApiError as err:
+                error("Failed to remove docker %s: %s\n" %
+                      (self.container_name, err))
             self.cleanup()
 
+    # Shell commands can change the configuration (vtysh -c, ovs-vsctl...).
+    def sendCmd(self, *args, **kwargs):
+        self.runningConfig = None
+        super(DockerNode, self).sendCmd(*args, **kwargs)
+
     def startShell(self):
         if self.shell:
             error("%s: shell is already running")
@@ -188,6 +615,7 @@ class DockerNode(Node):
                "--timing=" + self.nodedir + "/transcript.timing",
                "-q", "-f", self.nodedir + "/transcript"]
 
+        start = time.time()
         self.shell = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT,
                            close_fds=True)
         self.stdin = self.shell.stdin
@@ -210,6 +638,7 @@ class DockerNode(Node):
                 break
             self.pollOut.poll()
         self.waiting = False
+        self.bootTimes['shell_prompt'] = time.time() - start
         # +m: disable job control notification
         self.cmd('unset HISTFILE; stty -echo; set +m')
 
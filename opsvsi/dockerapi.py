@@ -0,0 +1,333 @@
+#!/usr/bin/python
+
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Minimal Docker Engine API client. It talks HTTP/1.1 to the docker daemon
+# over its unix socket and keeps the connection alive between requests, so
+# that container management does not need to fork the docker CLI.
+
+import httplib
+import json
+import os
+import socket
+import tarfile
+import threading
+import time
+import urllib
+from StringIO import StringIO
+
+DOCKER_SOCKET = '/var/run/docker.sock'
+
+
+class DockerApiError(Exception):
+    def __init__(self, status, message):
+        super(DockerApiError, self).__init__("Docker API error %s: %s" %
+                                             (status, message))
+        self.status = status
+        self.reason = message
+
+
+class ContainerStartError(Exception):
+    pass
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        httplib.HTTPConnection.__init__(self, 'localhost')
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def default_socket_path():
+    # Honour DOCKER_HOST when it points to a unix socket.
+    docker_host = os.environ.get('DOCKER_HOST', '')
+    if docker_host.startswith('unix://'):
+        return docker_host[len('unix://'):]
+    return DOCKER_SOCKET
+
+
+def split_image_tag(image):
+    name, sep, tag = image.rpartition(':')
+    if not sep or '/' in tag:
+        return image, 'latest'
+    return name, tag
+
+
+class DockerApiClient(object):
+    def __init__(self, socket_path=None, timeout=None):
+        if socket_path is None:
+            socket_path = default_socket_path()
+        self.socket_path = socket_path
+        self.timeout = timeout
+        # One keep-alive connection per thread, since nodes may be booted
+        # from a pool of worker threads.
+        self.local = threading.local()
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = UnixHTTPConnection(self.socket_path, self.timeout)
+            self.local.conn = conn
+        return conn
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def request(self, method, path, params=None, body=None):
+        url = path
+        if params:
+            url += '?' + urllib.urlencode(params)
+
+        headers = {}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        # A kept-alive connection may have been closed by the daemon
+        # while idle. Retry once on a fresh connection in that case.
+        for attempt in range(2):
+            conn = self.connection()
+            try:
+                conn.request(method, url, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (httplib.HTTPException, socket.error):
+                self.close()
+                if attempt:
+                    raise
+
+        if response.status >= 400:
+            try:
+                message = json.loads(data)['message']
+            except (ValueError, KeyError, TypeError):
+                message = data.strip()
+            raise DockerApiError(response.status, message)
+
+        return response.status, data
+
+    def request_json(self, method, path, params=None, body=None):
+        status, data = self.request(method, path, params, body)
+        if not data:
+            return None
+        return json.loads(data)
+
+    def pull_image(self, image):
+        name, tag = split_image_tag(image)
+        status, data = self.request('POST', '/images/create',
+                                    {'fromImage': name, 'tag': tag})
+        # Pull progress is streamed as a sequence of JSON messages.
+        # Failures are reported in-band.
+        for line in data.splitlines():
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            if 'error' in message:
+                raise DockerApiError(status, message['error'])
+
+    def create_container(self, name, image, cmd=None, hostname=None,
+                         binds=None, privileged=False, tty=False):
+        config = {'Image': image,
+                  'Hostname': hostname or '',
+                  'Tty': tty,
+                  'HostConfig': {'Privileged': privileged,
+                                 'Binds': binds or []}}
+        if cmd is not None:
+            config['Cmd'] = cmd
+
+        try:
+            container = self.request_json('POST', '/containers/create',
+                                          {'name': name}, config)
+        except DockerApiError as err:
+            # 'docker run' pulls missing images, do the same.
+            if err.status != httplib.NOT_FOUND:
+                raise
+            self.pull_image(image)
+            container = self.request_json('POST', '/containers/create',
+                                          {'name': name}, config)
+        return container['Id']
+
+    def start_container(self, name, checkpoint=None, checkpoint_dir=None):
+        params = {}
+        if checkpoint is not None:
+            params['checkpoint'] = checkpoint
+        if checkpoint_dir is not None:
+            params['checkpoint-dir'] = checkpoint_dir
+        self.request('POST', '/containers/%s/start' % name, params)
+
+    def checkpoint_container(self, name, checkpoint, checkpoint_dir=None,
+                             exit=False):
+        # CRIU checkpoint, only available on daemons with the
+        # experimental features enabled.
+        config = {'CheckpointID': checkpoint, 'Exit': exit}
+        if checkpoint_dir is not None:
+            config['CheckpointDir'] = checkpoint_dir
+        self.request('POST', '/containers/%s/checkpoints' % name, body=config)
+
+    # Start a command in the container in the background, like
+    # 'docker exec -d'.
+    def exec_detached(self, name, cmd):
+        exec_instance = self.request_json('POST', '/containers/%s/exec' % name,
+                                          body={'Cmd': cmd,
+                                                'AttachStdin': False,
+                                                'AttachStdout': False,
+                                                'AttachStderr': False})
+        self.request('POST', '/exec/%s/start' % exec_instance['Id'],
+                     body={'Detach': True, 'Tty': False})
+
+    def inspect_image(self, image):
+        return self.request_json('GET', '/images/%s/json' % image)
+
+    def run_container(self, name, image, **kwargs):
+        container_id = self.create_container(name, image, **kwargs)
+        self.start_container(container_id)
+        return container_id
+
+    def remove_container(self, name, force=True):
+        try:
+            self.request('DELETE', '/containers/%s' % name,
+                         {'force': int(force)})
+        except DockerApiError as err:
+            if err.status != httplib.NOT_FOUND:
+                raise
+            return False
+        return True
+
+    def inspect_container(self, name):
+        return self.request_json('GET', '/containers/%s/json' % name)
+
+    def wait_for_container(self, name, timeout):
+        # Wait for the container to be running, driven by its start/die
+        # events rather than by polling. Returns the container State.
+        deadline = time.time() + timeout
+        filters = {'type': ['container'],
+                   'container': [name],
+                   'event': ['start', 'die']}
+        params = {'filters': json.dumps(filters),
+                  'until': int(deadline) + 1}
+
+        # The event stream needs its own connection.
+        conn = UnixHTTPConnection(self.socket_path, timeout)
+        try:
+            conn.request('GET', '/events?' + urllib.urlencode(params))
+            response = conn.getresponse()
+            if response.status >= 400:
+                raise DockerApiError(response.status, response.read().strip())
+
+            # Subscribe first and then check, so that an event that fires
+            # in between can't be missed.
+            state = self.check_container_state(name)
+            if state is not None:
+                return state
+
+            for line in stream_lines(response):
+                state = self.check_container_state(name)
+                if state is not None:
+                    return state
+                conn.sock.settimeout(max(deadline - time.time(), 0.01))
+        except socket.timeout:
+            pass
+        finally:
+            conn.close()
+
+        raise ContainerStartError("Container %s not running after %d "
+                                  "seconds" % (name, timeout))
+
+    def check_container_state(self, name):
+        state = self.inspect_container(name)['State']
+        if state['Pid'] != 0:
+            return state
+        if state.get('Status') in ('exited', 'dead') or \
+           state.get('FinishedAt', '0001-01-01T00:00:00Z')[:4] != '0001':
+            raise ContainerStartError("Container %s exited with code %s %s" %
+                                      (name, state.get('ExitCode'),
+                                       state.get('Error', '')))
+        return None
+
+    def list_containers(self, all=True, name=None):
+        params = {'all': int(all)}
+        if name is not None:
+            params['filters'] = json.dumps({'name': [name]})
+        return self.request_json('GET', '/containers/json', params)
+
+    def copy_from_container(self, name, src, dest):
+        status, data = self.request('GET', '/containers/%s/archive' % name,
+                                    {'path': src})
+        archive = tarfile.open(fileobj=StringIO(data))
+        try:
+            member = archive.next()
+            if os.path.isdir(dest):
+                dest = os.path.join(dest, os.path.basename(member.name))
+            f = open(dest, 'wb')
+            f.write(archive.extractfile(member).read())
+            f.close()
+        finally:
+            archive.close()
+
+
+def stream_lines(response):
+    # Yield the newline separated records of a streamed response (e.g. the
+    # events endpoint) as they arrive, instead of waiting for the end of
+    # the body like HTTPResponse.read() does.
+    buf = ''
+    while True:
+        if response.chunked:
+            size = int(response.fp.readline().split(';')[0], 16)
+            if size == 0:
+                break
+            data = response.fp.read(size)
+            response.fp.readline()
+        else:
+            data = response.fp.readline()
+            if not data:
+                break
+        buf += data
+        while '\n' in buf:
+            line, buf = buf.split('\n', 1)
+            if line.strip():
+                yield line
+
+
+def format_container_list(containers):
+    # Rough equivalent of the 'docker ps -a' table, used in failure logs.
+    lines = ["%-12s  %-30s  %-30s  %s" %
+             ('CONTAINER ID', 'IMAGE', 'STATUS', 'NAMES')]
+    for container in containers:
+        names = ','.join(n.lstrip('/') for n in container.get('Names') or [])
+        lines.append("%-12s  %-30s  %-30s  %s" %
+                     (container['Id'][:12], container.get('Image', ''),
+                      container.get('Status', ''), names))
+    return '\n'.join(lines) + '\n'
+
+
+_docker_client = None
+
+
+def get_docker_client():
+    global _docker_client
+    if _docker_client is None:
+        _docker_client = DockerApiClient()
+    return _docker_client
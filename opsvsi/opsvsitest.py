@@ -19,11 +19,58 @@ import pytest
 import inspect
 import subprocess
 import sys
+import math
+import multiprocessing
+import json
+import time
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
 
 SWNS_EXEC = '/sbin/ip netns exec swns '
 NS_EXEC = SWNS_EXEC
 NETNS_NAME = ' netns swns'
 
+P4_RUNTIME_CLI = "/usr/bin/bm_tools/runtime_CLI.py " \
+                 "--json /usr/share/ovs_p4_plugin/switch_bmv2.json " \
+                 "--thrift-port 10001"
+P4_RUNTIME_PROMPT = "RuntimeCmd:"
+
+# Number of commands cmdCLI_batch() writes ahead of the responses.
+CLI_PIPELINE_WINDOW = 32
+
+# Seconds start() waits for restd to be active.
+RESTD_START_TIMEOUT = 30
+
+# Seconds resetContainer() waits for ovsdb-server to be back.
+SWITCH_RESET_TIMEOUT = 30
+
+# Timeout for creating all the tuntap ports of a switch in one batch.
+TUNTAP_BATCH_TIMEOUT = 60
+
+# OVSDB database file of the switch, and where pooled switches keep
+# a copy of it taken right after boot.
+OVSDB_FILE = '/var/run/openvswitch/ovsdb.db'
+OVSDB_BOOT_SNAPSHOT = '/var/local/vsi_ovsdb_boot.db'
+
+# Per-process pool of booted switch containers, see getSwitchPool().
+switch_pool = None
+
+
+def getSwitchPool(size):
+    global switch_pool
+    if switch_pool is None:
+        switch_pool = ContainerPool(size)
+    return switch_pool
+
+class CLIResult(object):
+    def __init__(self, command, output):
+        self.command = command
+        self.output = output
+        # vtysh reports errors on lines starting with '%'
+        self.errors = [line for line in output.splitlines()
+                       if line.startswith('%')]
+
+
 class OpsVsiHost (DockerHost):
     def __init__(self, name, **kwargs):
         kwargs['nodetype'] = "OpsVsiHost"
@@ -42,7 +89,8 @@ class OpsVsiLink(DockerLink):
 
 class VsiOpenSwitch (DockerNode, Switch):
     def __init__(self, name, image='openswitch/genericx86-64',
-                 numPorts=54, **kwargs):
+                 numPorts=54, lazyPorts=None, ports=None,
+                 cliTimeout=CLI_TIMEOUT, **kwargs):
         kwargs['nodetype'] = "VsiOpenSwitch"
 
         # During OpenSwitch CIT test run, CT/FT tests
@@ -54,17 +102,75 @@ class VsiOpenSwitch (DockerNode, Switch):
         if test_image is not None:
             image = test_image
 
+        # Start from a checkpoint of an already booted switch of the same
+        # image instead of a cold /sbin/init boot. Needs a docker daemon
+        # with CRIU checkpoint support (experimental features enabled).
+        if 'snapshot' not in kwargs:
+            kwargs['snapshot'] = os.environ.get('VSI_BOOT_SNAPSHOT') == '1'
+
+        # Used by startShell(), which runs as part of the docker start.
+        self.cliTimeout = cliTimeout
+
         # Start Openswitch firmware in a docker
         super(VsiOpenSwitch, self).__init__(name, image, **kwargs)
 
         self.inNamespace = True
         self.numPorts = numPorts
 
+        # In lazy port mode only the ports used by the topology and the
+        # ones declared in 'ports' are created by start(). The others are
+        # created on first use by ensure_port(). VSI_LAZY_PORTS=1 turns
+        # it on for all the switches.
+        if lazyPorts is None:
+            lazyPorts = os.environ.get('VSI_LAZY_PORTS') == '1'
+        self.lazyPorts = lazyPorts
+        self.declaredPorts = [str(port) for port in (ports or [])]
+        self.tuntapPorts = set()
+
     def tuntap_cmd(self, tuntap_cmd):
         cmd = "timeout 10 " + tuntap_cmd
-        cmd_output = self.ovscmd(cmd)
-        return_code = self.ovscmd("echo $?")
-        if int(return_code) == 124:
+        return_code, out, err = self.execCmd(cmd)
+        cmd_output = out + err
+        if return_code == 124:
+            print "#### Failed tuntap command - start ####"
+            print "Return code : " + str(return_code)
+            print "Tuntap command : " + tuntap_cmd
+            print cmd_output
+            print "#### Failed tuntap command - end ####"
+            return True
+        else:
+            return False
+
+    # Create all the given ports as TUN TAP interfaces in 'swns' with a
+    # single 'ip -batch' run. Ports that fail are reported, but like with
+    # tuntap_cmd() only a run that times out is treated as a failure.
+    def tuntap_batch(self, ports):
+        if not ports:
+            return False
+
+        batch_file = "tuntap_batch"
+        f = open(os.path.join(self.shareddir, batch_file), "w")
+        for port in ports:
+            f.write("tuntap add dev %s mode tap\n" % port)
+        f.close()
+
+        tuntap_cmd = SWNS_EXEC + "/sbin/ip -force -batch /shared/" + batch_file
+        return_code, out, err = self.execCmd("timeout %d %s" %
+                                             (TUNTAP_BATCH_TIMEOUT,
+                                              tuntap_cmd))
+        # Through the node shell stderr is part of out.
+        cmd_output = out + err
+        lines = cmd_output.strip().splitlines()
+
+        # 'ip -force -batch' prints the error and then the failed line.
+        for i, line in enumerate(lines):
+            m = re.search(r'Command failed \S+:(\d+)', line)
+            if m:
+                reason = lines[i - 1].strip() if i > 0 else ''
+                print "Failed to add tuntap port %s: %s" % \
+                    (ports[int(m.group(1)) - 1], reason)
+
+        if return_code == 124:
             print "#### Failed tuntap command - start ####"
             print "Return code : " + str(return_code)
             print "Tuntap command : " + tuntap_cmd
@@ -74,6 +180,58 @@ class VsiOpenSwitch (DockerNode, Switch):
         else:
             return False
 
+    # Make sure the given ports exist, creating the missing ones. Only
+    # lazy port mode switches can be missing ports. Returns False if
+    # creating them timed out.
+    def ensure_ports(self, ports):
+        # P4 switch plugin creates its own TAP interfaces.
+        if not self.lazyPorts or NS_EXEC != SWNS_EXEC:
+            return True
+
+        missing = []
+        for port in ports:
+            port = str(port)
+            if port not in self.nameToIntf and \
+               port not in self.tuntapPorts and port not in missing:
+                missing.append(port)
+        if not missing:
+            return True
+        if self.tuntap_batch(missing):
+            return False
+        self.tuntapPorts.update(missing)
+        return True
+
+    def ensure_port(self, name):
+        return self.ensure_ports([name])
+
+    # Register the given interfaces with the P4 switch simulation
+    # platform, streaming all the port_add commands through a single
+    # runtime_CLI session. Returns the list of interfaces that failed.
+    def p4_port_add(self, intfs):
+        if not intfs:
+            return []
+
+        batch_file = "p4_port_add"
+        f = open(os.path.join(self.shareddir, batch_file), "w")
+        for intf in intfs:
+            f.write("port_add %s %d\n" % (intf, int(intf) - 1))
+        f.close()
+
+        output = self.cmd(NS_EXEC + P4_RUNTIME_CLI + " < /shared/" +
+                          batch_file)
+
+        # runtime_CLI prints its prompt before reading each command, so
+        # the output of the n-th command follows the n-th prompt.
+        results = output.split(P4_RUNTIME_PROMPT)[1:]
+        failed = []
+        for i, intf in enumerate(intfs):
+            result = results[i].strip() if i < len(results) else 'no result'
+            if 'Error' in result or 'Invalid' in result or \
+               result == 'no result':
+                error("P4 port_add %s failed: %s\n" % (intf, result))
+                failed.append(intf)
+        return failed
+
     def start(self, controllers):
         global NS_EXEC, NETNS_NAME
 
@@ -95,70 +253,75 @@ class VsiOpenSwitch (DockerNode, Switch):
         # So do not create TAP interfaces as part of test framework.
         self.tuntap_failed = False
         if 'emulns' not in netns:
-            for i in range(1, self.numPorts + 1):
-                if str(i) not in self.nameToIntf:
-                    cmd = SWNS_EXEC + "/sbin/ip tuntap add dev " + str(i) + " mode tap"
-                    self.tuntap_failed = self.tuntap_cmd(cmd)
-                    if self.tuntap_failed:
-                        return
+            ports = [str(i) for i in range(1, self.numPorts + 1)
+                     if str(i) not in self.nameToIntf]
 
             # In generic-X86 image ports 49-54 are QSFP splittable ports.
             # so create subports for them.
             for i in irange(49, 54):
                 for j in irange(1, 4):
-                    cmd = SWNS_EXEC + "/sbin/ip tuntap add dev " + str(i) + "-" + str(j) + " mode tap"
-                    self.tuntap_failed = self.tuntap_cmd(cmd)
-                    if self.tuntap_failed:
-                        return
+                    ports.append(str(i) + "-" + str(j))
+
+            if self.lazyPorts:
+                ports = [port for port in self.declaredPorts
+                         if port not in self.nameToIntf]
+
+            with self.bootPhase('tuntap'):
+                self.tuntap_failed = self.tuntap_batch(ports)
+            if self.tuntap_failed:
+                return
+            self.tuntapPorts.update(ports)
 
         # Move the interfaces created by Mininet to intended namespace.
-        for intf in self.nameToIntf:
-            if intf == 'lo':
-                continue
-            self.cmd("/sbin/ip link set " + intf + NETNS_NAME)
-            self.cmd(NS_EXEC + "/sbin/ip link set " + intf + " up")
+        with self.bootPhase('intf_moves'):
+            p4_ports = []
+            for intf in self.nameToIntf:
+                if intf == 'lo':
+                    continue
+                self.cmd("/sbin/ip link set " + intf + NETNS_NAME)
+                self.cmd(NS_EXEC + "/sbin/ip link set " + intf + " up")
+                p4_ports.append(intf)
 
             # Feed moved interfaces to P4 switch simulation platform
             # Keep Port to Interface mapping as per ports.yaml
             if 'emulns' in netns:
-                self.cmd(NS_EXEC + "echo port_add " + intf + " " + str(int(intf) - 1) + " | " +
-                         NS_EXEC + "/usr/bin/bm_tools/runtime_CLI.py --json /usr/share/ovs_p4_plugin/switch_bmv2.json --thrift-port 10001")
-
-        # Checking restd status
-        output = ''
-        try:
-            output = self.cmd(
-                'systemctl status restd'
-            )
-        except:
-            pass
-        if 'Active: \x1b[1;32mactive' not in output:
-            error = 'Failed to start restd'
-            try:
-                print('Starting restd daemon...')
-                self.cmd('systemctl start restd')
-                print('Checking restd service started...')
-                for i in range(0, 300):
-                    output = ''
-                    output = self.cmd(
-                        'systemctl status restd'
-                    )
-                    if 'Active: \x1b[1;32mactive' not in output:
-                        sleep(0.1)
-                    else:
-                        break
-                else:
-                    error = "Failed to start restd service"
-                    raise Exception("Failed to start restd service")
-            except Exception as error:
-                raise Exception (
-                    error
-                )
-            except:
-                raise Exception(
-                    error
-                )
-
+                self.p4_port_add(p4_ports)
+
+        # Make sure restd is running. This starts it if it isn't.
+        with self.bootPhase('restd'):
+            restd_active = self.wait_for_services(['restd'],
+                                                  RESTD_START_TIMEOUT,
+                                                  start=True)
+        if not restd_active:
+            raise Exception("Failed to start restd service")
+
+    # Wait until all the given systemd services are active, with a single
+    # round trip to the switch. With start=True the services are started
+    # (a no-op for the ones already running) and 'systemctl start' blocks
+    # until their start jobs are done. Returns True if they all became
+    # active within timeout seconds, starting them included.
+    def wait_for_services(self, services, timeout=30, start=False):
+        units = ' '.join(services)
+        if start:
+            wait = 'systemctl start %s 2>/dev/null' % units
+        else:
+            # systemd can't wait for a unit to come up without starting
+            # it, so poll inside the container. 'systemctl is-active'
+            # succeeds as soon as any of its units is active, so wait for
+            # them one at a time.
+            wait = "sh -c 'for u in %s; do until systemctl is-active " \
+                   "--quiet $u; do sleep 0.05; done; done'" % units
+        states = self.cmd("timeout %d %s; systemctl is-active %s "
+                          "2>/dev/null" % (timeout, wait, units)).split()
+
+        inactive = ['%s (%s)' % (service, state)
+                    for service, state in zip(services, states)
+                    if state != 'active']
+        if len(states) != len(services) or inactive:
+            error("%s: services not active after %d seconds: %s\n" %
+                  (self.name, timeout, ', '.join(inactive) or states))
+            return False
+        return True
 
     def startCLI(self):
         # The vtysh shell is opened as subprocess in the docker
@@ -166,6 +329,7 @@ class VsiOpenSwitch (DockerNode, Switch):
         # chr(127) in the prompt which we poll for in the read.
         cmd = ["docker", "exec", "-i", self.container_name, "/usr/bin/vtysh", "-t", "-vCONSOLE:ERR"]
         vtysh = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE, close_fds=True)
+        self.cli = vtysh
         self.cliStdin = vtysh.stdin
         self.cliStdout = vtysh.stdout
 
@@ -175,10 +339,8 @@ class VsiOpenSwitch (DockerNode, Switch):
     def shared_logs(self):
         logs = "Container Name: " + self.container_name
 
-        docker_ps_cmd = ['docker', 'ps', '-a']
-        docker_ps = Popen(docker_ps_cmd, stdout=PIPE)
-        out = docker_ps.communicate()[0]
-        logs = logs + "\nDocker ps :\n" + str(out)
+        out = format_container_list(self.docker.list_containers())
+        logs = logs + "\nDocker ps :\n" + out
 
         switch_logs = os.path.join(self.shareddir, "logs")
         f = open(switch_logs, 'a')
@@ -205,7 +367,16 @@ class VsiOpenSwitch (DockerNode, Switch):
         dir, f = os.path.split(__file__)
         switch_wait = os.path.join(dir, "scripts", "wait_for_openswitch")
         shutil.copy(switch_wait, self.shareddir)
-        self.cmd("/shared/wait_for_openswitch")
+
+        # The UTS namespace comes back from the checkpoint with the
+        # hostname of the container it was taken from.
+        if self.restored:
+            self.cmd("hostname " + self.container_name)
+
+        self.switch_ready_time = None
+        with self.bootPhase('wait_for_openswitch'):
+            self.cmd("rm -f /shared/switch_ready; "
+                     "/shared/wait_for_openswitch")
         script_output = self.cmd("cat /shared/logs")
         script_status = script_output.splitlines()[0]
 
@@ -225,31 +396,101 @@ class VsiOpenSwitch (DockerNode, Switch):
             self.switchd_failed = False
             self.cur_hw_failed = False
 
-        self.startCLI()
+            # When the script saw the switch become ready (epoch seconds).
+            ready_file = os.path.join(self.shareddir, "switch_ready")
+            if os.path.exists(ready_file):
+                f = open(ready_file)
+                self.switch_ready_time = float(f.read().strip())
+                f.close()
+
+            # Keep the freshly booted database of a pooled switch, so
+            # that it can be reset to it before the next lease.
+            if self.pool is not None and self.leased is None:
+                self.cmd("cp " + OVSDB_FILE + " " + OVSDB_BOOT_SNAPSHOT)
+
+            if self.snapshot and not self.restored and self.leased is None:
+                with self.bootPhase('snapshot'):
+                    self.saveSnapshot()
+
+        with self.bootPhase('start_cli'):
+            self.startCLI()
+
+    def resetContainer(self):
+        if self.switchd_failed or self.cur_hw_failed or \
+           getattr(self, 'tuntap_failed', False):
+            return False
+
+        # Close this test's vtysh session.
+        self.cliStdin.close()
+        self.cli.wait()
+
+        # Remove the ports created for the topology, they are recreated
+        # by start() for the next test.
+        for ns_exec in (SWNS_EXEC, NS_EXEC, ''):
+            links = self.cmd(ns_exec + "ls /sys/class/net")
+            for intf in links.split():
+                if re.match(r'^\d+(-\d+)?$', intf):
+                    self.cmd(ns_exec + "/sbin/ip link del " + intf)
+
+        # Restore the database as it was right after boot. The daemons
+        # reconnect to ovsdb-server and resync from it.
+        self.cmd("systemctl stop ovsdb-server")
+        self.cmd("cp " + OVSDB_BOOT_SNAPSHOT + " " + OVSDB_FILE)
+        if not self.wait_for_services(['ovsdb-server'], SWITCH_RESET_TIMEOUT,
+                                      start=True):
+            return False
+
+        # Only give the switch back once it is ready again, checked the
+        # same way as after a boot. wait_for_openswitch reports through
+        # the first line of the log.
+        self.cmd("rm -f /shared/logs /shared/switchd /shared/switch_ready; "
+                 "/shared/wait_for_openswitch")
+        script_output = self.cmd("cat /shared/logs")
+        self.cmd("rm -f /shared/logs /shared/switchd /shared/switch_ready")
+
+        lines = script_output.splitlines()
+        if not lines or 'Success' not in lines[0]:
+            error("%s: switch not ready after reset: %s\n" %
+                  (self.name, script_output))
+            return False
+        return True
 
     def writeCLI(self, fd, inp):
         try:
             os.write(fd, inp + "\n")
         except OSError as err:
             info("os.write failed. Checking for running dockers --> \n")
-            docker_logs = Popen(['docker', 'ps', '-a'], stdout=PIPE)
-            out = docker_logs.communicate()[0]
+            out = format_container_list(self.docker.list_containers())
             info(out)
             info(err.args)
             raise err
 
-    def readCLI(self, fd, buflen=1024):
-        out = ''
-        while True:
-            data = os.read(fd, buflen)
-            if len(data) > 0:
-                out += data
-                if data[-1] == chr(127):
-                    out.replace(chr(127), '')
-                    break
-        return out
+    # Read vtysh output up to its prompt, which the -t option terminates
+    # with chr(127). The sentinel is removed from the returned output.
+    # Raises CLITimeoutError if the prompt doesn't show up within timeout
+    # seconds (cliTimeout by default).
+    def readCLI(self, fd, buflen=1024, timeout=None):
+        return self.readCLIRaw(fd, buflen, timeout).replace(chr(127), '')
+
+    # Same as readCLI(), but the prompt sentinels are kept.
+    def readCLIRaw(self, fd, buflen=1024, timeout=None):
+        if timeout is None:
+            timeout = self.cliTimeout
+        return readCLIUntil(self.name, fd, lambda out: out[-1] == 127,
+                            timeout, buflen)
+
+    # Configuring an interface is a first use of its port.
+    def portUsedByCLI(self, inp):
+        if self.lazyPorts:
+            m = re.match(r'\s*interface\s+(\d+(-\d+)?)\s*$', inp)
+            if m:
+                self.ensure_port(m.group(1))
 
     def cmdCLI(self, inp, waiting=True):
+        self.portUsedByCLI(inp)
+        if cliChangesConfig(inp):
+            self.runningConfig = None
+
         if waiting:
             self.writeCLI(self.cliStdin.fileno(), inp)
             return self.readCLI(self.cliStdout.fileno(), 1024)
@@ -257,6 +498,33 @@ class VsiOpenSwitch (DockerNode, Switch):
             self.writeCLI(self.cliStdin.fileno(), inp)
         return ''
 
+    # Run a list of vtysh commands, pipelined: up to 'window' commands are
+    # written ahead of the responses being read. Each response ends at a
+    # prompt sentinel. Returns a CLIResult per command, in order.
+    def cmdCLI_batch(self, commands, window=CLI_PIPELINE_WINDOW,
+                     timeout=None):
+        fd_in = self.cliStdin.fileno()
+        fd_out = self.cliStdout.fileno()
+
+        outputs = []
+        sent = 0
+        while len(outputs) < len(commands):
+            # Don't get too far ahead, vtysh stops reading its input
+            # while its output pipe is full.
+            while sent < len(commands) and sent - len(outputs) < window:
+                self.portUsedByCLI(commands[sent])
+                if cliChangesConfig(commands[sent]):
+                    self.runningConfig = None
+                self.writeCLI(fd_in, commands[sent])
+                sent += 1
+
+            # Returns at a sentinel, so only ever complete responses.
+            raw = self.readCLIRaw(fd_out, CLI_MAX_READ, timeout)
+            outputs += raw.split(chr(127))[:-1]
+
+        return [CLIResult(command, output)
+                for command, output in zip(commands, outputs)]
+
     def stop(self, deleteIntfs=True):
         pass
 
@@ -277,8 +545,168 @@ class VsiOpenSwitch (DockerNode, Switch):
         return out
 
 
+# Nearest-rank percentile of a list of numbers.
+def percentile(values, pct):
+    values = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(values)))
+    return values[max(rank - 1, 0)]
+
+
+# Teardown is mostly waiting on the docker daemon and the kernel,
+# so it uses more workers than there are cores.
+STOP_WORKERS = 16
+
+
+def deleteLinks(links, workers=STOP_WORKERS):
+    # Deleting one end of a veth pair deletes the other one as well.
+    # Pick the end that is easiest to reach (switch ports live in the
+    # switch namespace) and delete all the ends of a node in one batch.
+    intfsByNode = {}
+    for link in links:
+        intf = link.intf1
+        if isinstance(intf.node, VsiOpenSwitch):
+            intf = link.intf2
+        intfsByNode.setdefault(intf.node, []).append(intf.name)
+
+    def delete(item):
+        node, names = item
+        prefix = NS_EXEC if isinstance(node, VsiOpenSwitch) else ''
+        script = ''.join('link del %s\\n' % name for name in names)
+        node.cmd("printf '%s' | %s/sbin/ip -force -batch -" %
+                 (script, prefix))
+
+    runConcurrently(delete, intfsByNode.items(), workers)
+
+    for link in links:
+        link.intf1.node.delIntf(link.intf1)
+        link.intf2.node.delIntf(link.intf2)
+        link.intf1 = link.intf2 = None
+
+
+def runConcurrently(func, items, workers):
+    items = list(items)
+    if not items:
+        return []
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(func, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+# Same as Mininet.stop(), but links are deleted in one batch per node and
+# the nodes are terminated concurrently. Returns the time taken by each
+# step, in seconds.
+def parallelStop(net, workers=STOP_WORKERS):
+    times = {}
+
+    start = time.time()
+    for controller in net.controllers:
+        controller.stop()
+    if net.terms:
+        net.stopXterms()
+    times['controllers'] = time.time() - start
+
+    start = time.time()
+    info('*** Stopping %i links\n' % len(net.links))
+    deleteLinks(net.links, workers)
+    times['links'] = time.time() - start
+
+    def stopNode(node):
+        if node in net.switches:
+            node.stop()
+        node.terminate()
+
+    start = time.time()
+    nodes = net.switches + net.hosts
+    info('*** Stopping %i switches and hosts\n' % len(nodes))
+    runConcurrently(stopNode, nodes, workers)
+    times['nodes'] = time.time() - start
+
+    info('*** Teardown: %s\n' %
+         ', '.join('%s %.2fs' % (step, times[step])
+                   for step in ('controllers', 'links', 'nodes')))
+    return times
+
+
+class OpsVsiNet(Mininet):
+    # Mininet builds the topology one node at a time, and every docker node
+    # blocks in its constructor until the container (and for a switch, the
+    # OpenSwitch firmware) is up. With bootWorkers > 1 all the nodes of the
+    # topology are constructed concurrently first, and Mininet then adopts
+    # the already started nodes while it builds the links.
+    def __init__(self, topo=None, bootWorkers=1, **kwargs):
+        self.bootWorkers = bootWorkers
+        self.bootedNodes = {}
+        super(OpsVsiNet, self).__init__(topo=topo, **kwargs)
+
+    def buildFromTopo(self, topo=None):
+        if topo is not None and self.bootWorkers > 1:
+            self.bootNodes(topo)
+        super(OpsVsiNet, self).buildFromTopo(topo)
+
+    def bootNodes(self, topo):
+        jobs = []
+        for name in topo.hosts():
+            params = dict(topo.nodeInfo(name))
+            jobs.append((params.pop('cls', self.host), name, params))
+        for name in topo.switches():
+            params = dict(topo.nodeInfo(name))
+            jobs.append((params.pop('cls', self.switch), name, params))
+        if not jobs:
+            return
+
+        workers = min(self.bootWorkers, len(jobs))
+        info('*** Booting %d nodes with %d workers\n' % (len(jobs), workers))
+        pool = ThreadPool(workers)
+        try:
+            results = [pool.apply_async(cls, (name,), params)
+                       for cls, name, params in jobs]
+            booted = {}
+            failure = None
+            for (cls, name, params), result in zip(jobs, results):
+                try:
+                    booted[name] = result.get()
+                except Exception as err:
+                    error('Failed to boot node %s: %s\n' % (name, err))
+                    failure = failure or err
+        finally:
+            pool.close()
+            pool.join()
+
+        if failure is not None:
+            # Don't leave the containers that did come up behind.
+            for node in booted.values():
+                node.terminate()
+            raise failure
+
+        self.bootedNodes = booted
+
+    def adoptNode(self, name, **params):
+        # Called by Mininet in place of the node class. Keep the parameters
+        # Mininet computed (e.g. host IP/MAC) so that node configuration
+        # behaves as if the node had been constructed here.
+        node = self.bootedNodes.pop(name)
+        node.params.update(params)
+        return node
+
+    def stop(self):
+        self.stopTimes = parallelStop(self)
+
+    def addHost(self, name, cls=None, **params):
+        if name in self.bootedNodes:
+            cls = self.adoptNode
+        return super(OpsVsiNet, self).addHost(name, cls=cls, **params)
+
+    def addSwitch(self, name, cls=None, **params):
+        if name in self.bootedNodes:
+            cls = self.adoptNode
+        return super(OpsVsiNet, self).addSwitch(name, cls=cls, **params)
+
+
 class OpsVsiTest(object):
-    def __init__(self, test_id=None, switchmounts=[], hostmounts=[], hostimage='openswitch/ubuntutest:latest', start_net=True):
+    def __init__(self, test_id=None, switchmounts=[], hostmounts=[], hostimage='openswitch/ubuntutest:latest', start_net=True, boot_workers=None, switch_pool=None):
         # If 'test_id' is not passed create a random UUID.
         # Docker is unable to handle a container name with complete UUID.
         # So take only the fifth field of it.
@@ -293,6 +721,24 @@ class OpsVsiTest(object):
         self.hostmounts = hostmounts
         self.hostimage = hostimage
 
+        # Number of docker nodes booted concurrently by setupNet.
+        # VSI_BOOT_WORKERS overrides the default of booting one node at a
+        # time; 0 means one worker per CPU core.
+        if boot_workers is None:
+            boot_workers = int(os.environ.get('VSI_BOOT_WORKERS', 1))
+        if boot_workers <= 0:
+            boot_workers = multiprocessing.cpu_count()
+        self.boot_workers = boot_workers
+
+        # Number of idle booted switches kept for reuse by later tests
+        # in this process. VSI_SWITCH_POOL sets it when not given, and
+        # 0 (the default) disables pooling.
+        if switch_pool is None:
+            switch_pool = int(os.environ.get('VSI_SWITCH_POOL', 0))
+        self.switch_pool = None
+        if switch_pool > 0:
+            self.switch_pool = getSwitchPool(switch_pool)
+
         # Set log level to 'debug' to enable Debugging.
         self.setLogLevel('info')
         info("\n============= OpenSwitchVsi TEST START =============\n")
@@ -304,37 +750,72 @@ class OpsVsiTest(object):
         os.makedirs(self.testdir)
         info("Test log dir: " + self.testdir + "\n")
 
+        # Boot phase timings of the docker nodes by name, as (nodetype,
+        # phases), filled in by the nodes as they boot.
+        self.boot_times = OrderedDict()
+
         # Setup and start the network topology.
         if start_net is True:
-            self.setupNet()
-            for switch in self.net.switches:
-                if isinstance(switch, VsiOpenSwitch):
-                    if switch.cur_hw_failed:
-                        logs = switch.ovscmd("cat /shared/logs")
-                        print logs
-                        print "cur_hw was not set to 1. Check the logs folder : " + self.testdir + "\n"
-                        self.net.stop()
-                        pytest.fail("CUR_HW was not set to 1\n")
-                    elif switch.switchd_failed:
-                        logs = switch.ovscmd("cat /shared/logs")
-                        print logs
-                        print "Switchd failed to start up. Check the logs folder : " + self.testdir + "\n"
-                        self.net.stop()
-                        pytest.fail("Switchd failed to start up")
-                    else:
-                        debug("Switch %s booted up successfully" % switch.container_name)
-            self.net.start()
+            try:
+                self.setupNet()
+                for switch in self.net.switches:
+                    if isinstance(switch, VsiOpenSwitch):
+                        if switch.cur_hw_failed:
+                            logs = switch.ovscmd("cat /shared/logs")
+                            print logs
+                            print "cur_hw was not set to 1. Check the logs folder : " + self.testdir + "\n"
+                            self.net.stop()
+                            pytest.fail("CUR_HW was not set to 1\n")
+                        elif switch.switchd_failed:
+                            logs = switch.ovscmd("cat /shared/logs")
+                            print logs
+                            print "Switchd failed to start up. Check the logs folder : " + self.testdir + "\n"
+                            self.net.stop()
+                            pytest.fail("Switchd failed to start up")
+                        else:
+                            debug("Switch %s booted up successfully" % switch.container_name)
+                self.net.start()
+            finally:
+                # Most wanted when a node failed to boot.
+                self.writeBootTiming()
             for switch in self.net.switches:
                 if isinstance(switch, VsiOpenSwitch) and switch.tuntap_failed:
                     switch.get_syslog_on_failure()
                     self.net.stop()
                     pytest.fail("Failure adding tuntap interfaces")
 
+    # Write the time spent in each boot phase of every docker node to
+    # boot_timing.json in the test dir, along with per phase p50/p95/max
+    # across the switches. Nodes that failed to boot have the phases they
+    # went through.
+    def writeBootTiming(self):
+        report = {'switches': {}, 'hosts': {}, 'summary': {}}
+        phases = OrderedDict()
+        for name, (nodetype, bootTimes) in self.boot_times.items():
+            kind = 'hosts' if nodetype == "OpsVsiHost" else 'switches'
+            times = dict(bootTimes)
+            times['total'] = sum(bootTimes.values())
+            report[kind][name] = times
+            if kind == 'switches':
+                for phase, seconds in times.items():
+                    phases.setdefault(phase, []).append(seconds)
+
+        for phase, values in phases.items():
+            report['summary'][phase] = {'p50': percentile(values, 50),
+                                        'p95': percentile(values, 95),
+                                        'max': max(values),
+                                        'count': len(values)}
+
+        f = open(os.path.join(self.testdir, 'boot_timing.json'), 'w')
+        json.dump(report, f, indent=4, sort_keys=True)
+        f.close()
+
     def setLogLevel(self, levelname='info'):
         setLogLevel(levelname)
 
     def getNodeOpts(self):
-        return {'testid': self.id, 'testdir': self.testdir}
+        return {'testid': self.id, 'testdir': self.testdir,
+                'boot_times': self.boot_times}
 
     def setHostImageOpts(self, hostimage):
         self.hostimage = hostimage
@@ -348,22 +829,32 @@ class OpsVsiTest(object):
     def getSwitchOpts(self):
         opts = self.getNodeOpts()
         opts.update({'mounts': self.switchmounts})
+        if self.switch_pool is not None:
+            opts.update({'pool': self.switch_pool})
         return opts
 
+    def getNetOpts(self):
+        return {'bootWorkers': self.boot_workers}
+
     def stopNet(self):
         self.net.stop()
+        # Only OpsVsiNet times its (parallel) teardown. Networks built
+        # with a plain Mininet keep its own, one node after the other.
+        self.stop_times = getattr(self.net, 'stopTimes', None)
 
     def setupNet(self):
         # If you override this function, make sure to pass
         # Host/Switch options into hopts/sopts of the topology that
-        # you build or into addHost/addSwitch calls
+        # you build or into addHost/addSwitch calls. Build the topology
+        # with OpsVsiNet and getNetOpts() to boot its nodes in parallel.
         topo = SingleSwitchTopo(k=2,
                                 hopts=self.getHostOpts(),
                                 sopts=self.getSwitchOpts())
 
-        self.net = Mininet(topo,
-                           switch=VsiOpenSwitch,
-                           host=OpsVsiHost,
-                           link=OpsVsiLink,
-                           controller=None,
-                           build=True)
+        self.net = OpsVsiNet(topo,
+                             switch=VsiOpenSwitch,
+                             host=OpsVsiHost,
+                             link=OpsVsiLink,
+                             controller=None,
+                             build=True,
+                             **self.getNetOpts())
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 
 from docker import *
+import re
 
 QUAGGA_DOCKER_IMAGE = 'openswitch/quagga'
 
@@ -10,11 +11,24 @@ QUAGGA_DOCKER_IMAGE = 'openswitch/quagga'
 # router bgp 7675.
 QUAGGA_DOCKER_DEFAULT_BGP_ASN = "7675"
 
+# The vtysh prompt, e.g. "quagga# " or "quagga(config-router)# ". Quagga's
+# vtysh has no -t option, so the prompt line itself is the sentinel that
+# ends the output of a command.
+QUAGGA_VTYSH_PROMPT = re.compile(r'^[\w.-]+(\([\w-]+\))?[#>] $')
+
+
+def atQuaggaPrompt(out):
+    return QUAGGA_VTYSH_PROMPT.match(str(out[out.rfind('\n') + 1:])) \
+        is not None
+
 
 class QuaggaSwitch (DockerNode, Switch):
-    def __init__(self, name, image=QUAGGA_DOCKER_IMAGE, **kwargs):
+    def __init__(self, name, image=QUAGGA_DOCKER_IMAGE,
+                 cliTimeout=CLI_TIMEOUT, **kwargs):
         # Override init_cmd so that the Docker image can execute its own script.
         kwargs['init_cmd'] = DOCKER_DEFAULT_CMD
+        self.cliTimeout = cliTimeout
+        self.cli = None
 
         # Start Quagga switch in a docker
         super(QuaggaSwitch, self).__init__(name, image, **kwargs)
@@ -23,13 +37,59 @@ class QuaggaSwitch (DockerNode, Switch):
 
     def start(self, controllers):
         # Wait until bgpd and zebra daemons are started
-        while True:
-            bgp_pid = self.cmd("pgrep -f bgpd").strip()
+        while self.cmd("pgrep -f bgpd").strip() == "" or \
+                self.cmd("pgrep -f zebra").strip() == "":
+            time.sleep(0.1)
+
+        # vtysh connects to the daemons when it starts, so the session
+        # can only be opened once they are running.
+        self.startCLI()
+
+        # Now that bgpd is running, remove the default bgp config
+        self.cmdCLI("configure term")
+        self.cmdCLI("no router bgp %s" % QUAGGA_DOCKER_DEFAULT_BGP_ASN)
+        self.cmdCLI("end")
+
+    # Long-lived vtysh session, so that show and config commands don't
+    # start a new vtysh, which reconnects to every daemon, each time.
+    def startCLI(self):
+        cmd = ["docker", "exec", "-i", self.container_name, "vtysh"]
+        vtysh = Popen(cmd, stdin=PIPE, stdout=PIPE, stderr=STDOUT,
+                      close_fds=True)
+        self.cli = vtysh
+        self.cliStdin = vtysh.stdin
+        self.cliStdout = vtysh.stdout
+
+        # Wait for prompt, after the banner
+        self.readCLI(vtysh.stdout.fileno())
+        # vtysh would pipe long outputs through a pager otherwise.
+        self.cmdCLI("terminal length 0")
+
+    # Read vtysh output up to its prompt. The prompt is removed from the
+    # returned output.
+    def readCLI(self, fd, buflen=1024, timeout=None):
+        if timeout is None:
+            timeout = self.cliTimeout
+        out = readCLIUntil(self.name, fd, atQuaggaPrompt, timeout, buflen)
+        return out[:out.rfind('\n') + 1]
+
+    def cmdCLI(self, inp, timeout=None):
+        if cliChangesConfig(inp):
+            self.runningConfig = None
+        os.write(self.cliStdin.fileno(), inp + "\n")
+        out = self.readCLI(self.cliStdout.fileno(), 1024, timeout)
 
-            if bgp_pid != "":
-                # Now that bgpd is running, remove the default bgp config
-                cmd = '-c "configure term" '
-                cmd += "-c \"no router bgp %s\"" % QUAGGA_DOCKER_DEFAULT_BGP_ASN
+        # readline echoes the command when its input isn't a terminal.
+        line, sep, rest = out.partition('\n')
+        if line.strip() == inp.strip():
+            out = rest
+        return out
 
-                self.cmd("vtysh %s" % cmd)
-                break
+    def terminate(self):
+        cli, self.cli = self.cli, None
+        if cli is not None:
+            cli.stdin.close()
+        super(QuaggaSwitch, self).terminate()
+        # The session ends with the container at the latest.
+        if cli is not None:
+            cli.wait()
@@ -18,6 +18,7 @@
 from opsvsi.opsvsitest import *
 from opsvsiutils.systemutil import *
 from opsvsi.quagga import *
+from opsvsiutils.vtyshutils import *
 
 # Flags for defining what types of switches will be used for BGP testing.
 # The "peer" is only applicable to tests that have more than one switch
@@ -79,3 +80,159 @@ class PrefixListEntry(object):
         self.prefixLen = prefixLen
         self.ge = ge
         self.le = le
+
+
+# Name of the route-map generated for a BgpConfig.routeMaps entry.
+def routeMapName(neighbor, dir):
+    return "rm_%s_%s" % (getattr(neighbor, 'routerid', neighbor), dir)
+
+
+# Renders a BgpConfig into vtysh configuration lines, for OpenSwitch or
+# Quagga, and applies it to a switch by only pushing the lines that are
+# missing from its running-config.
+class BgpConfigCompiler(object):
+    def __init__(self, ops=True):
+        self.ops = ops
+
+    def network(self, network):
+        prefix = normalize_prefix(network)
+        # Quagga shows classful networks without their length.
+        if not self.ops and normalize_prefix(prefix.split('/')[0]) == \
+                prefix:
+            return prefix.split('/')[0]
+        return prefix
+
+    # The configuration as an OrderedDict of context line -> lines in that
+    # context. Lines outside of any context are under None.
+    def compile(self, bgp_cfg):
+        contexts = OrderedDict()
+        top = contexts[None] = []
+
+        for plist in bgp_cfg.prefixLists + bgp_cfg.prefixListEntries:
+            line = "ip prefix-list %s seq %s %s %s" % \
+                   (plist.name, plist.seq_num, plist.action, plist.network)
+            if plist.prefixLen != '':
+                line += "/%s" % plist.prefixLen
+            if getattr(plist, 'ge', ''):
+                line += " ge %s" % plist.ge
+            if getattr(plist, 'le', ''):
+                line += " le %s" % plist.le
+            top.append(line)
+
+        for neighbor, prefix_list, dir, action, metric, community in \
+                bgp_cfg.routeMaps:
+            name = routeMapName(neighbor, dir)
+            lines = contexts["route-map %s %s 10" %
+                             (name, action or 'permit')] = []
+            if prefix_list:
+                lines.append("match ip address prefix-list %s" %
+                             getattr(prefix_list, 'name', prefix_list))
+            if metric != '':
+                lines.append("set metric %s" % metric)
+            if community != '':
+                lines.append("set community %s" % community)
+
+        lines = contexts["router bgp %s" % bgp_cfg.asn] = []
+        lines.append("bgp router-id %s" % bgp_cfg.routerid)
+        for network in bgp_cfg.networks:
+            lines.append("network %s" % self.network(network))
+        for neighbor in bgp_cfg.neighbors:
+            lines.append("neighbor %s remote-as %s" %
+                         (neighbor.routerid, neighbor.asn))
+        for neighbor, prefix_list, dir, action, metric, community in \
+                bgp_cfg.routeMaps:
+            lines.append("neighbor %s route-map %s %s" %
+                         (getattr(neighbor, 'routerid', neighbor),
+                          routeMapName(neighbor, dir), dir))
+
+        return contexts
+
+    # All the configuration lines, in the form vtysh_cfg_cmd takes.
+    def render(self, bgp_cfg):
+        return self.flatten(self.compile(bgp_cfg))
+
+    def flatten(self, contexts):
+        lines = list(contexts.get(None, []))
+        for context, children in contexts.items():
+            if context is not None:
+                lines += [context] + children + ["exit"]
+        return lines
+
+    # The lines needed to bring a parsed running-config (see
+    # SwitchVtyshUtils.vtysh_get_running_cfg_tree) to the BgpConfig. With
+    # prune, the networks, neighbors and BGP instance that are not in the
+    # BgpConfig are removed as well.
+    def diff(self, bgp_cfg, running_config, prune=False):
+        delta = OrderedDict()
+        current = dict((cfgKey(node.line), node) for node in running_config)
+
+        for context, children in self.compile(bgp_cfg).items():
+            if context is None:
+                have = set(current)
+            else:
+                node = current.get(cfgKey(context))
+                have = set(cfgKey(n.line) for n in node or [])
+
+            lines = [line for line in children if cfgKey(line) not in have]
+
+            if prune and context is not None and \
+                    context.startswith("router bgp "):
+                lines = self.removals(node, children) + lines
+                # There can be a single BGP instance.
+                for other in current.values():
+                    if other.words[:2] == ['router', 'bgp'] and \
+                            cfgKey(other.line) != cfgKey(context):
+                        delta.setdefault(None, []).insert(
+                            0, "no %s" % other.line)
+
+            if lines or (context is not None and node is None):
+                delta.setdefault(context, []).extend(lines)
+
+        return self.flatten(delta)
+
+    def removals(self, node, children):
+        if node is None:
+            return []
+        want = set(cfgKey(line) for line in children)
+        lines = []
+        for child in node:
+            if cfgKey(child.line) in want:
+                continue
+            if child.words[0] == 'network':
+                lines.append("no %s" % child.line)
+            elif child.words[0] == 'neighbor':
+                peer = "neighbor %s " % child.words[1]
+                if any(line.startswith(peer) for line in want):
+                    # A setting of a neighbor that is kept.
+                    if not child.line.startswith(peer + "remote-as "):
+                        lines.append("no %s" % child.line)
+                elif "no " + peer.strip() not in lines:
+                    # Removing the neighbor removes all of its settings.
+                    lines.append("no " + peer.strip())
+        return lines
+
+    # Push the difference between the BgpConfig and the running-config of
+    # the switch in one vtysh_cfg_cmd batch. Returns the lines pushed. The
+    # running-config is fetched again unless refresh is False, since the
+    # cached one misses changes made through REST or OVSDB.
+    def apply(self, switch, bgp_cfg, prune=False, show_results=False,
+              refresh=True):
+        config = SwitchVtyshUtils.vtysh_get_running_cfg_tree(switch, refresh)
+        delta = self.diff(bgp_cfg, config, prune)
+        if delta:
+            SwitchVtyshUtils.vtysh_cfg_cmd(switch, delta,
+                                           show_results=show_results)
+        return delta
+
+
+# Key of a configuration line for comparing rendered lines with the
+# running-config, with networks in their canonical form.
+def cfgKey(line):
+    words = line.split()
+    if len(words) > 1 and words[0] == 'network':
+        words[1] = normalize_prefix(words[1])
+    return ' '.join(words)
+
+
+def bgpConfigCompiler(switch):
+    return BgpConfigCompiler(ops=isinstance(switch, VsiOpenSwitch))
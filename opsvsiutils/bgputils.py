@@ -0,0 +1,360 @@
+#!/usr/bin/python
+
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Parsers for the 'show ip bgp' and 'show ipv6 bgp' outputs of OpenSwitch
+# and Quagga vtysh. The output is turned into a BgpRouteTable indexed by
+# prefix, so that route checks are exact lookups instead of substring
+# matches on the output lines.
+
+import re
+import socket
+from collections import OrderedDict
+
+# Route status codes, in the first three columns of a route line.
+BGP_STATUS_CODES = set('sdh*>=irSR ')
+
+# Where the Metric, LocPrf and Weight columns of the table end, when the
+# output has no header line to take them from.
+BGP_DEFAULT_COLUMNS = {'metric': 46, 'locprf': 53, 'weight': 60}
+
+BGP_ORIGIN_CODES = ('i', 'e', '?')
+
+BGP_DETAIL_PATH = re.compile(r'^\s+(\S+) from (\S+) \((\S+)\)')
+
+
+# Normalize an address, or an address with a length, so that equal ones
+# compare equal, e.g. for IPv6 addresses printed in different forms.
+def normalize_address(address):
+    address = address.strip().lower()
+    if '/' in address:
+        address, length = address.split('/', 1)
+    else:
+        length = None
+
+    if ':' in address:
+        try:
+            address = socket.inet_ntop(socket.AF_INET6,
+                                       socket.inet_pton(socket.AF_INET6,
+                                                        address))
+        except (socket.error, ValueError):
+            pass
+
+    if length is None:
+        return address
+    return "%s/%s" % (address, length)
+
+
+# Normalize a prefix so that equal ones compare equal. IPv4 prefixes
+# printed without a length (Quagga does that for classful ones) get their
+# classful length, or /32 if they are not a classful network.
+def normalize_prefix(prefix):
+    prefix = normalize_address(prefix)
+    if '/' in prefix:
+        return prefix
+    if ':' in prefix:
+        return prefix + '/128'
+
+    length = 32
+    if re.match(r'^\d+\.\d+\.\d+\.\d+$', prefix):
+        octets = [int(o) for o in prefix.split('.')]
+        if octets[0] < 128:
+            classful = 8
+        elif octets[0] < 192:
+            classful = 16
+        else:
+            classful = 24
+        if all(o == 0 for o in octets[classful // 8:]):
+            length = classful
+    return "%s/%d" % (prefix, length)
+
+
+class BgpPath(object):
+    def __init__(self, next_hop, status='', metric=None, locprf=None,
+                 weight=None, as_path=None, origin=None):
+        self.next_hop = normalize_address(next_hop)
+        self.status = status.strip()
+        self.metric = metric
+        self.locprf = locprf
+        self.weight = weight
+        self.as_path = as_path or []
+        self.origin = origin
+        # Only filled in from detailed ('show ip bgp <prefix>') output.
+        self.peer = None
+        self.router_id = None
+        self.flags = []
+
+    @property
+    def valid(self):
+        return '*' in self.status or 'valid' in self.flags
+
+    @property
+    def best(self):
+        return '>' in self.status or 'best' in self.flags
+
+    @property
+    def internal(self):
+        return 'i' in self.status or 'internal' in self.flags
+
+    def __repr__(self):
+        return "BgpPath(%s, %r, path=%s %s)" % (self.next_hop, self.status,
+                                                ' '.join(self.as_path),
+                                                self.origin)
+
+
+class BgpRoute(object):
+    def __init__(self, prefix):
+        self.prefix = normalize_prefix(prefix)
+        self.paths = []
+
+    # Paths by next hop. An empty next hop means any path.
+    def path(self, next_hop):
+        if not next_hop:
+            return self.paths[0] if self.paths else None
+        next_hop = normalize_address(next_hop)
+        for path in self.paths:
+            if path.next_hop == next_hop:
+                return path
+        return None
+
+    def has_next_hop(self, next_hop):
+        return self.path(next_hop) is not None
+
+    @property
+    def best(self):
+        for path in self.paths:
+            if path.best:
+                return path
+        return None
+
+    def __repr__(self):
+        return "BgpRoute(%s, %r)" % (self.prefix, self.paths)
+
+
+class BgpRouteTable(object):
+    def __init__(self):
+        self.routes = OrderedDict()
+        self.router_id = None
+
+    def add_path(self, prefix, path):
+        route = self.routes.get(normalize_prefix(prefix))
+        if route is None:
+            route = BgpRoute(prefix)
+            self.routes[route.prefix] = route
+        route.paths.append(path)
+        return route
+
+    # The routes prefix designates. A prefix given without a length is
+    # first taken as classful, as in the table, and otherwise matches the
+    # routes to that network address with any length, e.g. 10.10.10.0
+    # matches 10.10.10.0/24.
+    def lookup(self, prefix):
+        route = self.routes.get(normalize_prefix(prefix))
+        if route is not None:
+            return [route]
+        if '/' in prefix:
+            return []
+        address = normalize_address(prefix)
+        return [route for route in self.routes.values()
+                if route.prefix.split('/')[0] == address]
+
+    def route(self, prefix):
+        routes = self.lookup(prefix)
+        return routes[0] if routes else None
+
+    def has_route(self, prefix, next_hop=''):
+        return any(route.has_next_hop(next_hop)
+                   for route in self.lookup(prefix))
+
+    def update(self, other):
+        for prefix, route in other.routes.items():
+            for path in route.paths:
+                self.add_path(prefix, path)
+        if self.router_id is None:
+            self.router_id = other.router_id
+        return self
+
+    def __contains__(self, prefix):
+        return self.route(prefix) is not None
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __iter__(self):
+        return iter(self.routes.values())
+
+
+def is_route_line(line):
+    return len(line) > 3 and line[0] != ' ' and \
+        all(c in BGP_STATUS_CODES for c in line[:3])
+
+
+def header_columns(line):
+    columns = {}
+    for name, title in (('metric', 'Metric'), ('locprf', 'LocPrf'),
+                        ('weight', 'Weight')):
+        pos = line.find(title)
+        if pos < 0:
+            return None
+        columns[name] = pos + len(title)
+    return columns
+
+
+# Parse the attributes that follow the next hop on a route line. The
+# Metric and LocPrf columns may be blank, so the numbers are assigned to
+# columns by where they end, like they are right aligned in the table.
+def parse_path_attributes(line, start, columns):
+    names = ['metric', 'locprf', 'weight']
+    attrs = dict.fromkeys(names)
+    as_path = []
+    for match in re.finditer(r'\S+', line[start:]):
+        token = match.group()
+        end = start + match.end()
+        if names and not as_path and token.isdigit() and \
+                start + match.start() < columns['weight']:
+            name = min(names, key=lambda n: abs(columns[n] - end))
+            attrs[name] = int(token)
+            names = names[names.index(name) + 1:]
+        else:
+            as_path.append(token)
+
+    origin = None
+    if as_path and as_path[-1] in BGP_ORIGIN_CODES:
+        origin = as_path.pop()
+    return attrs, as_path, origin
+
+
+# Parse the output of 'show ip bgp' or 'show ipv6 bgp', as printed by
+# either OpenSwitch or Quagga, into a BgpRouteTable.
+def parse_bgp_table(output):
+    table = BgpRouteTable()
+    columns = dict(BGP_DEFAULT_COLUMNS)
+    prefix = None
+    pending = None
+
+    for line in output.splitlines():
+        line = line.rstrip('\r')
+        words = line.split()
+
+        match = re.search(r'router[- ]ID is (\S+)|router-id (\S+)', line,
+                          re.IGNORECASE)
+        if match:
+            table.router_id = match.group(1) or match.group(2)
+            continue
+
+        if 'Network' in line and 'Next Hop' in line:
+            columns = header_columns(line) or columns
+            continue
+
+        # Quagga moves the rest of a route to the next line after a long
+        # network or next hop.
+        if pending is not None and words and line.startswith(' '):
+            status, prefix, next_hop = pending
+            pending = None
+            start = 0
+            if next_hop is None:
+                next_hop = words[0]
+                start = line.find(next_hop) + len(next_hop)
+                if len(words) == 1:
+                    pending = (status, prefix, next_hop)
+                    continue
+            attrs, as_path, origin = parse_path_attributes(line, start,
+                                                           columns)
+            table.add_path(prefix, BgpPath(next_hop, status, as_path=as_path,
+                                           origin=origin, **attrs))
+            continue
+        pending = None
+
+        if not is_route_line(line):
+            continue
+
+        status = line[:3]
+        fields = line[3:].split()
+        if line[3] == ' ':
+            # Another path of the previous network.
+            if prefix is None:
+                continue
+            start = 3
+        else:
+            prefix = fields.pop(0)
+            start = 3 + len(prefix)
+
+        if not fields:
+            pending = (status, prefix, None)
+            continue
+        next_hop = fields[0]
+        start = line.find(next_hop, start) + len(next_hop)
+        if len(fields) == 1:
+            pending = (status, prefix, next_hop)
+            continue
+
+        attrs, as_path, origin = parse_path_attributes(line, start, columns)
+        table.add_path(prefix, BgpPath(next_hop, status, as_path=as_path,
+                                       origin=origin, **attrs))
+
+    return table
+
+
+# Parse the detailed output of 'show ip bgp <prefix>' into a
+# BgpRouteTable holding that one route.
+def parse_bgp_route_detail(output):
+    table = BgpRouteTable()
+    prefix = None
+    as_path = []
+    path = None
+
+    for line in output.splitlines():
+        line = line.rstrip('\r')
+        match = re.match(r'^BGP routing table entry for (\S+)', line)
+        if match:
+            prefix = match.group(1).rstrip(',')
+            continue
+        if prefix is None:
+            continue
+
+        match = BGP_DETAIL_PATH.match(line)
+        if match:
+            path = BgpPath(match.group(1), as_path=as_path)
+            path.peer = match.group(2)
+            path.router_id = match.group(3)
+            table.add_path(prefix, path)
+            continue
+
+        words = line.strip().rstrip(',').split(', ')
+        if path is not None and words[0].startswith('Origin '):
+            path.origin = words[0].split()[1]
+            for word in words[1:]:
+                name, _, value = word.partition(' ')
+                if name in ('metric', 'localpref', 'weight') and \
+                        value.isdigit():
+                    setattr(path, 'locprf' if name == 'localpref' else name,
+                            int(value))
+                else:
+                    path.flags.append(word)
+            path = None
+            continue
+
+        # The AS path of the next path, e.g. "  2 1", "  Local" or "AS: 1".
+        stripped = line.strip()
+        if stripped.startswith('AS:'):
+            stripped = stripped[3:].strip()
+        if stripped == 'Local':
+            as_path = []
+        elif stripped and all(w.isdigit() or w.startswith('{')
+                              for w in stripped.split()):
+            as_path = stripped.split()
+
+    return table
@@ -0,0 +1,124 @@
+#!/usr/bin/python
+
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Parser for the 'show running-config' output of OpenSwitch and Quagga
+# vtysh. The configuration is turned into a tree of contexts following its
+# indentation, e.g. "router bgp 1" > "neighbor 1.1.1.1 remote-as 2", with
+# an index of the words of every line.
+
+from collections import OrderedDict
+
+# Lines of the output that are not part of the configuration.
+CONFIG_IGNORED_LINES = ('!', 'end', 'Current configuration:',
+                        'Building configuration...')
+
+
+class ConfigNode(object):
+    def __init__(self, line, parent=None):
+        self.line = ' '.join(line.split())
+        self.words = self.line.split()
+        self.parent = parent
+        self.children = OrderedDict()
+
+    # The child context with exactly this line, e.g. "router bgp 1".
+    def child(self, line):
+        return self.children.get(' '.join(line.split()))
+
+    # Child contexts whose line starts with the given words, e.g.
+    # children_with("neighbor", "1.1.1.1").
+    def children_with(self, *words):
+        words = ' '.join(words).split()
+        return [node for node in self.children.values()
+                if node.words[:len(words)] == words]
+
+    # The lines of the contexts from the top of the configuration down to
+    # this one.
+    @property
+    def path(self):
+        path = []
+        node = self
+        while node.parent is not None:
+            path.insert(0, node.line)
+            node = node.parent
+        return path
+
+    def __iter__(self):
+        return iter(self.children.values())
+
+    def __repr__(self):
+        return "ConfigNode(%r)" % ' > '.join(self.path)
+
+
+class RunningConfig(ConfigNode):
+    def __init__(self, output):
+        super(RunningConfig, self).__init__('')
+        self.output = output
+        # Every word of the configuration, mapped to the lines it is in.
+        self.index = {}
+
+        # Stack of (indentation, context) of the enclosing contexts.
+        stack = [(-1, self)]
+        for line in output.splitlines():
+            line = line.rstrip('\r').rstrip()
+            stripped = line.strip()
+            if not stripped or stripped in CONFIG_IGNORED_LINES:
+                continue
+
+            indent = len(line) - len(line.lstrip())
+            while stack[-1][0] >= indent:
+                stack.pop()
+            parent = stack[-1][1]
+
+            node = parent.child(stripped)
+            if node is None:
+                node = ConfigNode(stripped, parent)
+                parent.children[node.line] = node
+                for word in set(node.words):
+                    self.index.setdefault(word, []).append(node)
+            stack.append((indent, node))
+
+    # Follow a path of context lines from the top, e.g.
+    # context("router bgp 1", "address-family ipv6").
+    def context(self, *lines):
+        node = self
+        for line in lines:
+            node = node.child(line)
+            if node is None:
+                return None
+        return node
+
+    # All the lines, in any context, that contain every one of the given
+    # words or phrases as whole words.
+    def search(self, *phrases):
+        phrases = [' '.join(str(p).split()) for p in phrases]
+        words = set(' '.join(phrases).split())
+        if not words:
+            return []
+
+        # Only the lines that have the rarest of the words can match.
+        candidates = min((self.index.get(word, []) for word in words),
+                         key=len)
+        return [node for node in candidates
+                if all((' %s ' % phrase) in (' %s ' % node.line)
+                       for phrase in phrases if phrase)]
+
+    def has(self, *phrases):
+        return len(self.search(*phrases)) > 0
+
+
+def parse_running_config(output):
+    return RunningConfig(output)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# Asynchronous REST client. The framework runs on python 2, which has no
+# asyncio, so requests are run by a pool of worker threads over the
+# keep-alive connection pool of restutils. Every call returns right away
+# with a future (a multiprocessing AsyncResult); gather() waits for a list
+# of them. Any number of requests to any number of switches can be in
+# flight at once, up to the number of workers.
+
+from opsvsiutils.restutils import utils
+from opsvsiutils.restutils.utils import *
+
+# Number of requests an AsyncRestClient has in flight at once.
+REST_ASYNC_WORKERS = 32
+
+
+def wait_result(future, timeout=None):
+    # AsyncResult.get() without a timeout can't be interrupted in python 2.
+    if timeout is None:
+        while not future.ready():
+            future.wait(3600)
+        return future.get()
+    return future.get(timeout)
+
+
+def gather(futures, timeout=None):
+    """
+    Wait for all the futures and return their results, in order. The first
+    failed request raises its exception.
+    """
+    deadline = None
+    if timeout is not None:
+        deadline = time.time() + timeout
+    results = []
+    for future in futures:
+        if deadline is not None:
+            timeout = max(deadline - time.time(), 0)
+        results.append(wait_result(future, timeout))
+    return results
+
+
+class AsyncRestClient(object):
+    """
+    Same calls as execute_request, query_object and login, returning
+    futures. Requests without a cookie header go through the cached
+    session of the default user, like the restutils helpers.
+
+    The shared connection pool keeps up to workers connections alive per
+    switch until the client is closed, or as many as another open client
+    needs.
+    """
+
+    def __init__(self, workers=REST_ASYNC_WORKERS):
+        self.workers = workers
+        self.pool = ThreadPool(workers)
+        # Keep as many connections alive as there can be requests in
+        # flight to a switch.
+        self.rest_pool = utils.rest_pool
+        self.rest_pool.acquire(workers)
+
+    def submit(self, func, *args, **kwargs):
+        return self.pool.apply_async(func, args, kwargs)
+
+    def execute_request(self, path, http_method, data, ip,
+                        full_response=False, xtra_header=None):
+        return self.submit(execute_request, path, http_method, data, ip,
+                           full_response, xtra_header)
+
+    def session_request(self, path, http_method, data, ip,
+                        full_response=False, cookie_header=None):
+        return self.submit(session_request, path, http_method, data, ip,
+                           full_response, cookie_header)
+
+    def query_object(self, switch_ip, path, cookie_header=None):
+        return self.submit(query_object, switch_ip, path, cookie_header)
+
+    def login(self, switch_ip, username=None, password=None):
+        return self.submit(login, switch_ip, username, password)
+
+    def query_collections(self, switch_ips, paths, depth=1,
+                          cookie_header=None, timeout=None):
+        """
+        Fetch collections (e.g. /rest/v1/system/ports) from all the
+        switches at once. With depth, each collection is a single request
+        returning all of its objects. With depth=0 the collections are
+        fetched first, and then all of their objects at once.
+
+        Returns {switch_ip: {path: result}}, where the result is the
+        objects of the collection with depth, and {uri: object} without.
+        """
+        targets = [(ip, path) for ip in switch_ips for path in paths]
+
+        if depth:
+            futures = [self.query_object(ip, "%s?depth=%d" % (path, depth),
+                                         cookie_header)
+                       for ip, path in targets]
+            results = gather(futures, timeout)
+        else:
+            uris = gather([self.query_object(ip, path, cookie_header)
+                           for ip, path in targets], timeout)
+            objects = gather([self.query_object(ip, uri, cookie_header)
+                              for (ip, path), collection in
+                              zip(targets, uris) for uri in collection],
+                             timeout)
+            results = []
+            objects = iter(objects)
+            for collection in uris:
+                results.append(OrderedDict((uri, next(objects))
+                                           for uri in collection))
+
+        collections = dict((ip, {}) for ip in switch_ips)
+        for (ip, path), result in zip(targets, results):
+            collections[ip][path] = result
+        return collections
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        rest_pool, self.rest_pool = self.rest_pool, None
+        if rest_pool is not None:
+            rest_pool.release(self.workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2016 Hewlett Packard Enterprise Development LP
+# All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+# REST load generator. RestBenchmark drives a weighted mix of requests
+# against restd at a given concurrency, optionally paced to a target rate,
+# and reports latency percentiles, throughput and error rates. The
+# StandInRestServer is a small in-memory restd look-alike to try it (and
+# the restutils helpers) without a switch.
+
+import BaseHTTPServer
+import SocketServer
+import random
+import socket
+import ssl
+import sys
+import urlparse
+
+from opsvsiutils.restutils.utils import *
+
+# Upper bounds, in milliseconds, of the latency histogram buckets.
+BENCHMARK_LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000,
+                                2000, 5000]
+
+# Number of requests of a benchmark with neither requests nor duration.
+BENCHMARK_DEFAULT_REQUESTS = 1000
+
+BENCHMARK_EXPECTED_STATUS = {"GET": httplib.OK,
+                             "POST": httplib.CREATED,
+                             "PUT": httplib.OK,
+                             "DELETE": httplib.NO_CONTENT}
+
+
+class RestOperation(object):
+    """
+    A request of the benchmark mix, picked with a probability proportional
+    to its weight. path and data may be functions of the request number,
+    e.g. to create objects with unique names.
+    """
+
+    def __init__(self, method, path, data=None, weight=1, expected=None,
+                 name=None):
+        self.method = method
+        self.path = path
+        self.data = data
+        self.weight = weight
+        self.expected = expected or BENCHMARK_EXPECTED_STATUS.get(method,
+                                                                 httplib.OK)
+        if name is None:
+            name = path if isinstance(path, basestring) else \
+                getattr(path, '__name__', 'path')
+        self.name = "%s %s" % (method, name)
+
+    def request(self, number):
+        path = self.path(number) if callable(self.path) else self.path
+        data = self.data(number) if callable(self.data) else self.data
+        if isinstance(data, dict):
+            data = json.dumps(data)
+        return path, data
+
+
+# min, mean, percentiles and max of latencies given in milliseconds.
+def latency_summary(ms):
+    return {'min': min(ms),
+            'mean': sum(ms) / len(ms),
+            'p50': percentile(ms, 50),
+            'p95': percentile(ms, 95),
+            'p99': percentile(ms, 99),
+            'max': max(ms)}
+
+
+class LatencyStats(object):
+    # The latency of a request is from when it was due to when its reply
+    # came back, its service time from when it was actually sent.
+    def __init__(self):
+        self.latencies = []
+        self.service_times = []
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, latency, status, ok, service_time=None):
+        self.latencies.append(latency)
+        if service_time is None:
+            service_time = latency
+        self.service_times.append(service_time)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if not ok:
+            self.errors += 1
+
+    def summary(self):
+        count = len(self.latencies)
+        report = {'count': count,
+                  'errors': self.errors,
+                  'error_rate': float(self.errors) / count if count else 0.0,
+                  'statuses': self.statuses}
+        if not count:
+            return report
+
+        ms = [latency * 1000 for latency in self.latencies]
+        report['latency_ms'] = latency_summary(ms)
+        report['service_time_ms'] = latency_summary(
+            [service_time * 1000 for service_time in self.service_times])
+
+        histogram = OrderedDict()
+        for bound in BENCHMARK_LATENCY_BUCKETS_MS:
+            histogram["<=%d" % bound] = 0
+        histogram[">%d" % BENCHMARK_LATENCY_BUCKETS_MS[-1]] = 0
+        for value in ms:
+            for bound in BENCHMARK_LATENCY_BUCKETS_MS:
+                if value <= bound:
+                    histogram["<=%d" % bound] += 1
+                    break
+            else:
+                histogram[">%d" % BENCHMARK_LATENCY_BUCKETS_MS[-1]] += 1
+        report['histogram_ms'] = histogram
+        return report
+
+
+class RestBenchmark(object):
+    """
+    Runs the operations (a list of RestOperation) against switch_ip with
+    concurrency requests in flight. With rate, requests are started at
+    that many per second overall (open loop), otherwise each worker sends
+    its next request as soon as the previous one completes. The benchmark
+    stops after requests requests or duration seconds, whichever comes
+    first.
+
+    Paced requests that are sent late, because the workers were all busy,
+    get the delay in their latency. The report gives the time the requests
+    took once sent as the service time.
+
+    Requests go through the cached session of the default user, or with
+    cookie_header when one is given.
+    """
+
+    def __init__(self, switch_ip, operations, concurrency=8, rate=None,
+                 requests=None, duration=None, cookie_header=None, seed=0,
+                 name="rest_benchmark"):
+        self.switch_ip = switch_ip
+        self.operations = operations
+        self.concurrency = concurrency
+        self.rate = rate
+        if requests is None and duration is None:
+            requests = BENCHMARK_DEFAULT_REQUESTS
+        self.requests = requests
+        self.duration = duration
+        self.cookie_header = cookie_header
+        self.random = random.Random(seed)
+        self.name = name
+        self.lock = threading.Lock()
+        self.report = None
+
+    def pick(self):
+        total = sum(op.weight for op in self.operations)
+        point = self.random.uniform(0, total)
+        for op in self.operations:
+            point -= op.weight
+            if point <= 0:
+                return op
+        return self.operations[-1]
+
+    # The next request to send: its number, operation and when to send it,
+    # or None once the benchmark is over.
+    def next_request(self):
+        with self.lock:
+            number = self.sent
+            when = None
+            if self.rate:
+                when = self.start + number / float(self.rate)
+            if self.requests is not None and number >= self.requests:
+                return None
+            # Unpaced requests are sent right away.
+            if self.deadline is not None and \
+                    (when or time.time()) >= self.deadline:
+                return None
+            self.sent += 1
+            op = self.pick()
+
+        return number, op, when
+
+    def worker(self, index):
+        while True:
+            request = self.next_request()
+            if request is None:
+                return
+            number, op, when = request
+            if when is not None:
+                delay = when - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            path, data = op.request(number)
+            sent = time.time()
+            try:
+                status, response_data = session_request(
+                    path, op.method, data, self.switch_ip,
+                    cookie_header=self.cookie_header)
+            except Exception as e:
+                status = type(e).__name__
+            done = time.time()
+
+            # A paced request counts from when it was due, so that the
+            # requests held up behind a stalled one show the stall too.
+            latency = done - (when or sent)
+            ok = status == op.expected
+            with self.lock:
+                self.stats.record(latency, status, ok, done - sent)
+                self.op_stats[op.name].record(latency, status, ok,
+                                              done - sent)
+
+    def run(self):
+        self.sent = 0
+        self.stats = LatencyStats()
+        self.op_stats = OrderedDict((op.name, LatencyStats())
+                                    for op in self.operations)
+
+        # Log in before the clock starts.
+        if self.cookie_header is None:
+            get_session(self.switch_ip).cookie_header()
+
+        self.start = time.time()
+        self.deadline = None
+        if self.duration is not None:
+            self.deadline = self.start + self.duration
+        runConcurrently(self.worker, range(self.concurrency),
+                        self.concurrency)
+        elapsed = time.time() - self.start
+
+        report = self.stats.summary()
+        report.update({'name': self.name,
+                       'switch': self.switch_ip,
+                       'concurrency': self.concurrency,
+                       'target_rate': self.rate,
+                       'duration': elapsed,
+                       'throughput': report['count'] / elapsed
+                       if elapsed > 0 else 0.0,
+                       'operations': dict((name, stats.summary())
+                                          for name, stats in
+                                          self.op_stats.items())})
+        self.report = report
+
+        info("%s: %d requests in %.2f seconds, %.1f requests/s, "
+             "%d errors\n" % (self.name, report['count'], elapsed,
+                              report['throughput'], report['errors']))
+        if 'latency_ms' in report:
+            info("%s: latency p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, "
+                 "max %.1f ms\n" % ((self.name,) +
+                                    tuple(report['latency_ms'][p] for p in
+                                          ('p50', 'p95', 'p99', 'max'))))
+        return report
+
+    # Write the report to <name>.json in testdir. Returns its path.
+    def save(self, testdir):
+        path = os.path.join(testdir, "%s.json" % self.name)
+        f = open(path, 'w')
+        json.dump(self.report, f, indent=4, sort_keys=True)
+        f.close()
+        return path
+
+
+class StandInRestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, status, body='', headers={}):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        # The client asked for it with a 'Connection: close' header.
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def body(self):
+        return self.rfile.read(int(self.headers.getheader('Content-Length',
+                                                          0)))
+
+    def authenticated(self):
+        cookie = self.headers.getheader('Cookie', '')
+        return cookie.split(';')[0].strip() in self.server.sessions
+
+    def handle_request(self, method):
+        url = urlparse.urlparse(self.path)
+        path = url.path.rstrip('/')
+        # Collections are returned as the list of their objects with a
+        # depth, and as the list of their URIs without.
+        depth = int(urlparse.parse_qs(url.query).get('depth', ['0'])[0])
+        data = self.body()
+        with self.server.lock:
+            self.server.requests.append((method, self.path))
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if path == LOGIN_URI:
+            if method == 'POST':
+                self.reply(httplib.OK, headers={
+                    'Set-Cookie': '%s; Path=/' % self.server.login()})
+            else:
+                self.reply(httplib.OK if self.authenticated() else
+                           httplib.UNAUTHORIZED)
+            return
+        if not self.authenticated():
+            self.reply(httplib.UNAUTHORIZED)
+            return
+
+        objects = self.server.objects
+        with self.server.lock:
+            if method == 'GET':
+                if path in objects:
+                    self.reply(httplib.OK, json.dumps(objects[path]))
+                    return
+                children = [uri for uri in objects
+                            if uri.rpartition('/')[0] == path]
+                if children and depth:
+                    self.reply(httplib.OK, json.dumps(
+                        [objects[uri] for uri in sorted(children)]))
+                elif children:
+                    self.reply(httplib.OK, json.dumps(sorted(children)))
+                else:
+                    self.reply(httplib.NOT_FOUND)
+            elif method == 'POST':
+                try:
+                    name = json.loads(data)['configuration']['name']
+                except (ValueError, KeyError, TypeError):
+                    self.reply(httplib.BAD_REQUEST)
+                    return
+                uri = "%s/%s" % (path, name)
+                if uri in objects:
+                    self.reply(httplib.BAD_REQUEST)
+                else:
+                    objects[uri] = json.loads(data)
+                    self.reply(httplib.CREATED)
+            elif method == 'PUT':
+                if path in objects:
+                    objects[path] = json.loads(data)
+                    self.reply(httplib.OK)
+                else:
+                    self.reply(httplib.NOT_FOUND)
+            elif method == 'DELETE':
+                if objects.pop(path, None) is not None:
+                    self.reply(httplib.NO_CONTENT)
+                else:
+                    self.reply(httplib.NOT_FOUND)
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def log_message(self, *args):
+        pass
+
+
+class StandInRestServer(SocketServer.ThreadingMixIn,
+                        BaseHTTPServer.HTTPServer):
+    """
+    In-memory stand-in for restd, over HTTPS with the certificate (and
+    key) in certfile. Objects are created by POSTing them to their
+    collection, named after their configuration name. Every request but
+    the login needs the session cookie. latency adds a delay in seconds to
+    every reply.
+
+    Use address (ip:port) as the switch IP of the restutils helpers, with
+    certfile as the SSL_CONFIG CA certificates.
+
+    The logins, connections and requests (method, path) are counted, for
+    tests to check. Session cookies get a Max-Age when session_max_age is
+    set, and clearing sessions logs everyone out, like a restart of restd.
+    """
+
+    daemon_threads = True
+    # Many clients may connect at once.
+    request_queue_size = 128
+
+    def __init__(self, certfile, ip='127.0.0.1', port=0, latency=0):
+        BaseHTTPServer.HTTPServer.__init__(self, (ip, port),
+                                           StandInRestHandler)
+        self.certfile = certfile
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.session_max_age = None
+        self.logins = 0
+        self.connections = 0
+        self.requests = []
+        self.objects = {"/rest/v1/system": {"configuration": {}},
+                        "/rest/v1/system/bridges/bridge_normal":
+                        {"configuration": {"name": DEFAULT_BRIDGE}}}
+        self.thread = None
+
+    @property
+    def address(self):
+        return "%s:%d" % self.server_address
+
+    # Log in a new session, returns its Set-Cookie header value.
+    def login(self):
+        with self.lock:
+            cookie = "user=%s" % uuid.uuid4().hex
+            self.sessions.add(cookie)
+            self.logins += 1
+        if self.session_max_age is not None:
+            cookie += "; Max-Age=%d" % self.session_max_age
+        return cookie
+
+    def get_request(self):
+        sock, addr = self.socket.accept()
+        with self.lock:
+            self.connections += 1
+        return ssl.wrap_socket(sock, certfile=self.certfile,
+                               server_side=True), addr
+
+    def handle_error(self, request, client_address):
+        # Clients closing their idle keep-alive connections.
+        if isinstance(sys.exc_info()[1], (ssl.SSLError, socket.error)):
+            return
+        BaseHTTPServer.HTTPServer.handle_error(self, request,
+                                               client_address)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
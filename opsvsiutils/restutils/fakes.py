@@ -18,7 +18,7 @@
 import pytest
 
 from opsvsi.opsvsitest import *
-from opsvsiutils.restutils.utils import login
+from opsvsiutils.restutils.utils import login, session_request, bulk_create
 
 from utils import *
 
@@ -87,17 +87,14 @@ FAKE_BRIDGE_DATA = """
 
 
 def create_fake_port(path, switch_ip, port_index, cookie_header=None):
-    if cookie_header is None:
-        cookie_header = login(switch_ip)
-
     data = FAKE_PORT_DATA % {"index": port_index}
 
     info("\n---------- Creating fake port (%s) ----------\n" %
          port_index)
     info("Testing path: %s\nTesting data: %s\n" % (path, data))
 
-    response_status, response_data = execute_request(
-        path, "POST", data, switch_ip, xtra_header=cookie_header)
+    response_status, response_data = session_request(
+        path, "POST", data, switch_ip, cookie_header=cookie_header)
 
     assert response_status == httplib.CREATED, \
         "Response status received: %s\n" % response_status
@@ -112,17 +109,14 @@ def create_fake_port(path, switch_ip, port_index, cookie_header=None):
 
 def create_fake_vlan(path, switch_ip, fake_vlan_name, vlan_id,
                      cookie_header=None):
-    if cookie_header is None:
-        cookie_header = login(switch_ip)
-
     data = FAKE_VLAN_DATA % {"name": fake_vlan_name, "id": vlan_id}
 
     info("\n---------- Creating fake vlan (%s) ----------\n" %
          fake_vlan_name)
     info("Testing Path: %s\nTesting Data: %s\n" % (path, data))
 
-    response_status, response_data = execute_request(
-        path, "POST", data, switch_ip, xtra_header=cookie_header)
+    response_status, response_data = session_request(
+        path, "POST", data, switch_ip, cookie_header=cookie_header)
 
     assert response_status == httplib.CREATED, \
         "Response status received: %s\n" % response_status
@@ -135,18 +129,15 @@ def create_fake_vlan(path, switch_ip, fake_vlan_name, vlan_id,
          fake_vlan_name)
 
 
-def create_fake_bridge(path, switch_ip, fake_bridge_name, cooie_header=None):
-    if cookie_header is None:
-        cookie_header = login(switch_ip)
-
+def create_fake_bridge(path, switch_ip, fake_bridge_name, cookie_header=None):
     data = FAKE_BRIDGE_DATA % fake_bridge_name
 
     info("\n---------- Creating fake bridge (%s) ----------\n" %
          fake_bridge_name)
     info("Testing path: %s\nTesting data: %s\n" % (path, data))
 
-    response_status, response_data = execute_request(
-        path, "POST", data, switch_ip, xtra_header=cookie_header)
+    response_status, response_data = session_request(
+        path, "POST", data, switch_ip, cookie_header=cookie_header)
 
     assert response_status == httplib.CREATED, \
         "Response status: %s\n" % response_status
@@ -157,3 +148,40 @@ def create_fake_bridge(path, switch_ip, fake_bridge_name, cooie_header=None):
     info("Response data received: %s\n" % response_data)
     info("---------- Creating fake bridge (%s) DONE ----------\n" %
          fake_bridge_name)
+
+
+# Bulk versions of the creators above. They create all the objects
+# concurrently, through utils.bulk_create, and assert that every one of
+# them was created. They return the BulkResult.
+def create_fake_ports(path, switch_ip, port_indexes, cookie_header=None,
+                      workers=REST_BULK_WORKERS):
+    ports = [(index, FAKE_PORT_DATA % {"index": index})
+             for index in port_indexes]
+    return assert_bulk_created(bulk_create(switch_ip, path, ports,
+                                           cookie_header, workers), "port")
+
+
+# vlans is a list of (name, id) pairs.
+def create_fake_vlans(path, switch_ip, vlans, cookie_header=None,
+                      workers=REST_BULK_WORKERS):
+    vlans = [(name, FAKE_VLAN_DATA % {"name": name, "id": vlan_id})
+             for name, vlan_id in vlans]
+    return assert_bulk_created(bulk_create(switch_ip, path, vlans,
+                                           cookie_header, workers), "VLAN")
+
+
+def create_fake_bridges(path, switch_ip, fake_bridge_names,
+                        cookie_header=None, workers=REST_BULK_WORKERS):
+    bridges = [(name, FAKE_BRIDGE_DATA % name) for name in fake_bridge_names]
+    return assert_bulk_created(bulk_create(switch_ip, path, bridges,
+                                           cookie_header, workers), "bridge")
+
+
+def assert_bulk_created(result, kind):
+    info("Fake %ss: %s\n" % (kind, result))
+    for name, status, data in result.failed:
+        info("Fake %s \"%s\" not created, status %s: %s\n" %
+             (kind, name, status, data))
+    assert not result.failed, \
+        "%d fake %ss not created\n" % (len(result.failed), kind)
+    return result
@@ -38,13 +38,11 @@ from opsvsi.opsvsitest import *
 ##############################################################################
 def get_json_file(container_id):
     info("container_id_swagger %s\n" % container_id)
-    copy_from_docker = 'docker cp ' + container_id + \
-                       ':/srv/www/api/ops-restapi.json /tmp'
-
     try:
-        res = subprocess.check_output(['docker', 'cp', container_id + ':/srv/www/api/ops-restapi.json', '/tmp'])
-    except subprocess.CalledProcessError as e:
-        info("Error in subprocess docker cp command\n")
+        get_docker_client().copy_from_container(
+            container_id, '/srv/www/api/ops-restapi.json', '/tmp')
+    except DockerApiError as e:
+        info("Error copying ops-restapi.json from container: %s\n" % e)
 
 ##############################################################################
 ######  Read the ops-restapi.json file and get the json data            ######
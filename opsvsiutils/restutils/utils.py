@@ -18,11 +18,15 @@
 import json
 import httplib
 import random
+import email.utils
 import urllib
 import ssl
 import os
 import time
+import select
+import socket
 import subprocess
+import threading
 
 from opsvsi.opsvsitest import *
 from copy import deepcopy
@@ -90,12 +94,26 @@ SSL_CONFIG = {
     SSL_CFG_CA_CERTS: CERT_FILE_TMP
 }
 
+REST_PORT = 443
+
+# Number of idle keep-alive connections kept per switch.
+REST_POOL_SIZE = 8
+
+# Methods that can be sent again when their connection fails, whether the
+# switch got them or not.
+REST_IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "OPTIONS")
+
+# Number of requests bulk_create() has in flight at once.
+REST_BULK_WORKERS = 8
+
+# Seconds before the expiry of a session cookie at which it is renewed.
+REST_SESSION_MARGIN = 30
+
 
 def get_container_id(switch):
-    container_name = switch.testid + "_" + switch.name
-    container_id = subprocess.check_output(["docker", "ps", "-a",
-                                            "-q", "-f", "name=" +
-                                            container_name]).strip()
+    containers = get_docker_client().list_containers(
+        name=switch.container_name)
+    container_id = '\n'.join(c['Id'][:12] for c in containers)
     return container_id
 
 
@@ -107,29 +125,25 @@ def get_switch_ip(switch):
 
 
 def create_test_port(ip, cookie_header=None):
-    if cookie_header is None:
-        cookie_header = login(ip)
     path = "/rest/v1/system/ports"
 
-    status_code, response_data = execute_request("/rest/v1/system/bridges/bridge_normal/vlans",
+    status_code, response_data = session_request("/rest/v1/system/bridges/bridge_normal/vlans",
                                                  "POST",
                                                  json.dumps(VLAN_DATA_413),
-                                                 ip, xtra_header=cookie_header)
-    status_code, response_data = execute_request("/rest/v1/system/bridges/bridge_normal/vlans",
+                                                 ip, cookie_header=cookie_header)
+    status_code, response_data = session_request("/rest/v1/system/bridges/bridge_normal/vlans",
                                                  "POST",
                                                  json.dumps(VLAN_DATA_654),
-                                                 ip, xtra_header=cookie_header)
+                                                 ip, cookie_header=cookie_header)
 
-    status_code, response_data = execute_request(path,
+    status_code, response_data = session_request(path,
                                                  "POST",
                                                  json.dumps(PORT_DATA),
-                                                 ip, xtra_header=cookie_header)
+                                                 ip, cookie_header=cookie_header)
     return status_code, response_data
 
 
 def update_test_field(switch_ip, path, field, new_value, cookie_header=None):
-    if cookie_header is None:
-        cookie_header = login(switch_ip)
     """
     Update field from existing table:
         - Perform a GET request to an existing path defined in path
@@ -137,11 +151,11 @@ def update_test_field(switch_ip, path, field, new_value, cookie_header=None):
         - Update field with new_value
         - Perform a PUT request
     """
-    status_code, response_data = execute_request(path,
+    status_code, response_data = session_request(path,
                                                  "GET",
                                                  None,
                                                  switch_ip,
-                                                 xtra_header=cookie_header)
+                                                 cookie_header=cookie_header)
 
     assert status_code is httplib.OK, \
         "Wrong status code, received: %s\n" % status_code
@@ -161,11 +175,11 @@ def update_test_field(switch_ip, path, field, new_value, cookie_header=None):
     # update value
     port_info["configuration"][field] = new_value
 
-    status_code, response_data = execute_request(path,
+    status_code, response_data = session_request(path,
                                                  "PUT",
                                                  json.dumps(port_info),
                                                  switch_ip,
-                                                 xtra_header=cookie_header)
+                                                 cookie_header=cookie_header)
     assert status_code == httplib.OK, \
         "Wrong status code, received: %s\n" % status_code
     assert response_data is "", \
@@ -201,9 +215,6 @@ def compare_dict(dict1, dict2):
 
 def execute_port_operations(data, port_name, http_method, operation_uri,
                             switch_ip, cookie_header=None):
-    if cookie_header is None:
-        cookie_header = login(switch_ip)
-
     results = []
 
     for attribute in data:
@@ -220,9 +231,9 @@ def execute_port_operations(data, port_name, http_method, operation_uri,
 
             # Create a test port
             status_code, response_data = \
-                execute_request(operation_uri, "POST",
+                session_request(operation_uri, "POST",
                                 json.dumps(request_data), switch_ip,
-                                xtra_header=cookie_header)
+                                cookie_header=cookie_header)
 
             if status_code != httplib.CREATED:
                 return []
@@ -243,11 +254,11 @@ def execute_port_operations(data, port_name, http_method, operation_uri,
         # Change value for specified attribute
         request_data['configuration'][attribute_name] = attribute_value
         # Execute request
-        status_code, response_data = execute_request(port_uri,
+        status_code, response_data = session_request(port_uri,
                                                      http_method,
                                                      json.dumps(request_data),
                                                      switch_ip,
-                                                     xtra_header=cookie_header)
+                                                     cookie_header=cookie_header)
 
         # Check if status code was as expected
 
@@ -259,7 +270,7 @@ def execute_port_operations(data, port_name, http_method, operation_uri,
     return results
 
 
-def get_ssl_context():
+def build_ssl_context():
     ssl_context = ssl.SSLContext(SSL_CONFIG[SSL_CFG_VERSION])
     ssl_context.verify_mode = SSL_CONFIG[SSL_CFG_VERIFY_MODE]
     ssl_context.check_hostname = SSL_CONFIG[SSL_CFG_CHECK_HOSTNAME]
@@ -268,6 +279,137 @@ def get_ssl_context():
     return ssl_context
 
 
+class HTTPSConnectionPool(object):
+    """
+    Keep-alive HTTPS connections to the switches, with a single SSL
+    context shared by all of them. The context is only rebuilt when
+    SSL_CONFIG or the CA certificate file changes (get_server_crt fetches
+    a new one for each switch), which also drops the pooled connections.
+
+    Up to maxsize connections are kept alive per switch, more while
+    clients that need them have acquired a bigger size.
+    """
+
+    def __init__(self, maxsize=REST_POOL_SIZE):
+        self.basesize = maxsize
+        self.maxsize = maxsize
+        self.sizes = []
+        self.idle = {}
+        self.lock = threading.Lock()
+        self.context = None
+        self.context_key = None
+
+    def ssl_context(self):
+        ca_certs = SSL_CONFIG[SSL_CFG_CA_CERTS]
+        try:
+            st = os.stat(ca_certs)
+            ca_key = (st.st_ino, st.st_size, st.st_mtime)
+        except OSError:
+            ca_key = None
+        key = (tuple(sorted(SSL_CONFIG.items())), ca_key)
+
+        with self.lock:
+            if key != self.context_key:
+                self.context = build_ssl_context()
+                self.context_key = key
+                idle, self.idle = self.idle, {}
+            else:
+                idle = {}
+            context = self.context
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+        return context
+
+    def get(self, ip, port):
+        context = self.ssl_context()
+        with self.lock:
+            conns = self.idle.get((ip, port), [])
+            while conns:
+                conn = conns.pop()
+                if not connection_closed(conn):
+                    return conn, True
+                conn.close()
+        return httplib.HTTPSConnection(ip, port, context=context), False
+
+    def put(self, ip, port, conn):
+        with self.lock:
+            conns = self.idle.setdefault((ip, port), [])
+            if len(conns) < self.maxsize:
+                conns.append(conn)
+                return
+        conn.close()
+
+    # Keep up to size connections alive per switch, until release(size).
+    def acquire(self, size):
+        with self.lock:
+            self.sizes.append(size)
+            self.maxsize = max([self.basesize] + self.sizes)
+
+    def release(self, size):
+        with self.lock:
+            self.sizes.remove(size)
+            self.maxsize = max([self.basesize] + self.sizes)
+            closed = []
+            for conns in self.idle.values():
+                closed += conns[self.maxsize:]
+                del conns[self.maxsize:]
+        for conn in closed:
+            conn.close()
+
+    def request(self, ip, port, method, url, data, headers):
+        while True:
+            conn, reused = self.get(ip, port)
+            sent = False
+            try:
+                conn.request(method, url, data, headers)
+                sent = True
+                response = conn.getresponse()
+                response_data = response.read()
+                break
+            except (httplib.HTTPException, socket.error):
+                conn.close()
+                # The switch may have closed the connection while it was
+                # idle in the pool, try again on a new one. Once sent, a
+                # request that isn't idempotent may have been carried out
+                # already.
+                if not reused or \
+                        (sent and method not in REST_IDEMPOTENT_METHODS):
+                    raise
+
+        if response.will_close:
+            conn.close()
+        else:
+            self.put(ip, port, conn)
+        return response, response_data
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+# Whether the switch closed an idle connection: its socket is readable
+# with nothing to read.
+def connection_closed(conn):
+    if conn.sock is None:
+        return True
+    try:
+        return bool(select.select([conn.sock], [], [], 0)[0])
+    except (select.error, socket.error):
+        return True
+
+
+rest_pool = HTTPSConnectionPool()
+
+
+def get_ssl_context():
+    return rest_pool.ssl_context()
+
+
 def execute_request(path, http_method, data, ip, full_response=False,
                     xtra_header=None):
 
@@ -277,11 +419,16 @@ def execute_request(path, http_method, data, ip, full_response=False,
     if xtra_header:
         headers.update(xtra_header)
 
-    conn = httplib.HTTPSConnection(ip, 443, context=get_ssl_context())
-    conn.request(http_method, url, data, headers)
-    response = conn.getresponse()
-    status_code, response_data = response.status, response.read()
-    conn.close()
+    # The switch may also be given as "ip:port", e.g. a local stand-in
+    # server.
+    port = REST_PORT
+    if ip.count(':') == 1:
+        ip, port = ip.split(':')
+        port = int(port)
+
+    response, response_data = rest_pool.request(ip, port, http_method, url,
+                                                data, headers)
+    status_code = response.status
 
     if full_response:
         return response, response_data
@@ -289,38 +436,85 @@ def execute_request(path, http_method, data, ip, full_response=False,
         return status_code, response_data
 
 
-def create_test_ports(ip, num_ports, cookie_header=None):
-    if cookie_header is None:
-        cookie_header = login(ip)
+class BulkResult(object):
+    """
+    Outcome of a bulk_create(): the (name, status, response data) of each
+    object, in the order they were given, and how long it all took.
+    """
 
-    path = "/rest/v1/system/ports"
+    def __init__(self, results, elapsed, expected=httplib.CREATED):
+        self.results = results
+        self.elapsed = elapsed
+        self.expected = expected
 
-    status_code, response_data = execute_request("/rest/v1/system/bridges/bridge_normal/vlans",
-                                                 "POST",
-                                                 json.dumps(VLAN_DATA_413),
-                                                 ip, xtra_header=cookie_header)
-    status_code, response_data = execute_request("/rest/v1/system/bridges/bridge_normal/vlans",
-                                                 "POST",
-                                                 json.dumps(VLAN_DATA_654),
-                                                 ip, xtra_header=cookie_header)
+    @property
+    def created(self):
+        return [name for name, status, data in self.results
+                if status == self.expected]
 
-    status_code, response_data = execute_request("/rest/v1/system/bridges/bridge_normal/vlans",
+    @property
+    def failed(self):
+        return [(name, status, data) for name, status, data in self.results
+                if status != self.expected]
+
+    @property
+    def rate(self):
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.created) / self.elapsed
+
+    def __str__(self):
+        return "Created %d/%d objects in %.2f seconds (%.1f objects/s)" % \
+            (len(self.created), len(self.results), self.elapsed, self.rate)
+
+
+def bulk_create(switch_ip, path, objects, cookie_header=None,
+                workers=REST_BULK_WORKERS):
+    """
+    POST objects to path, up to workers at a time over the keep-alive
+    connection pool. objects is a list of (name, JSON body) pairs.
+    Returns a BulkResult. An exception from a request (e.g. the switch
+    going away) is raised once the requests in flight are done, as a
+    serial loop over the objects would.
+    """
+    def create(obj):
+        name, body = obj
+        status, data = session_request(path, "POST", body, switch_ip,
+                                       cookie_header=cookie_header)
+        return name, status, data
+
+    start = time.time()
+    results = runConcurrently(create, objects, workers)
+    result = BulkResult(results, time.time() - start)
+    info("%s: %s\n" % (path, result))
+    return result
+
+
+def create_test_ports(ip, num_ports, cookie_header=None,
+                      workers=REST_BULK_WORKERS):
+    path = "/rest/v1/system/ports"
+
+    status_code, response_data = session_request("/rest/v1/system/bridges/bridge_normal/vlans",
                                                  "POST",
                                                  json.dumps(VLAN_DATA_413),
-                                                 ip, xtra_header=cookie_header)
-    status_code, response_data = execute_request("/rest/v1/system/bridges/bridge_normal/vlans",
+                                                 ip, cookie_header=cookie_header)
+    status_code, response_data = session_request("/rest/v1/system/bridges/bridge_normal/vlans",
                                                  "POST",
                                                  json.dumps(VLAN_DATA_654),
-                                                 ip, xtra_header=cookie_header)
+                                                 ip, cookie_header=cookie_header)
 
-    data = deepcopy(PORT_DATA)
+    ports = []
     for port in range(num_ports):
-        data["configuration"]["name"] = "Port%s" % port
-        status_code, response_data = execute_request(
-            path, "POST", json.dumps(data), ip, xtra_header=cookie_header)
+        name = "Port%s" % port
+        data = dict(PORT_DATA)
+        data["configuration"] = dict(PORT_DATA["configuration"], name=name)
+        ports.append((name, json.dumps(data)))
+
+    result = bulk_create(ip, path, ports, cookie_header, workers)
 
-        if status_code != httplib.CREATED:
-            return status_code
+    # The status of the first port that couldn't be created, if any.
+    for name, status_code, response_data in result.failed:
+        return status_code
 
     return httplib.CREATED
 
@@ -329,10 +523,8 @@ def query_object(switch_ip, path, cookie_header=None):
     """
     Query a port
     """
-    if cookie_header is None:
-        cookie_header = login(switch_ip)
-    status_code, response_data = execute_request(path, "GET", None, switch_ip,
-                                                 xtra_header=cookie_header)
+    status_code, response_data = session_request(path, "GET", None, switch_ip,
+                                                 cookie_header=cookie_header)
     assert status_code == httplib.OK, "Wrong status code %s " % status_code
 
     assert response_data is not None, "Response data is empty"
@@ -413,6 +605,110 @@ def login(switch_ip, username=None, password=None):
     return cookie_header
 
 
+class RestSession(object):
+    """
+    Logged in REST session of a user on a switch. The cookie is kept until
+    it expires, and the session logs in again once if a request is
+    rejected with 401 Unauthorized.
+    """
+
+    def __init__(self, switch_ip, username=None, password=None):
+        self.switch_ip = switch_ip
+        self.username = username
+        self.password = password
+        self.cookie = None
+        self.expires = None
+        self.lock = threading.Lock()
+
+    def cookie_header(self):
+        with self.lock:
+            if self.cookie is None or \
+                    (self.expires is not None and
+                     time.time() > self.expires - REST_SESSION_MARGIN):
+                self.cookie = login(self.switch_ip, self.username,
+                                    self.password)
+                self.expires = cookie_expiry(self.cookie['Cookie'])
+            return self.cookie
+
+    def invalidate(self, cookie=None):
+        with self.lock:
+            # Another thread may have logged in again already.
+            if cookie is None or cookie is self.cookie:
+                self.cookie = None
+
+    def request(self, path, http_method, data=None, full_response=False,
+                xtra_header=None):
+        for attempt in range(2):
+            cookie = self.cookie_header()
+            headers = dict(cookie)
+            if xtra_header:
+                headers.update(xtra_header)
+            response, response_data = execute_request(path, http_method,
+                                                      data, self.switch_ip,
+                                                      True, headers)
+            if response.status != httplib.UNAUTHORIZED:
+                break
+            self.invalidate(cookie)
+
+        if full_response:
+            return response, response_data
+        else:
+            return response.status, response_data
+
+
+rest_sessions = {}
+rest_sessions_lock = threading.Lock()
+
+
+def cookie_expiry(set_cookie):
+    """
+    Expiry time of a Set-Cookie header value, from its Max-Age or Expires
+    attribute. None when it has neither.
+    """
+    for attr in set_cookie.split(';')[1:]:
+        name, _, value = attr.strip().partition('=')
+        if name.lower() == 'max-age' and value.isdigit():
+            return time.time() + int(value)
+        if name.lower() == 'expires':
+            parsed = email.utils.parsedate_tz(value)
+            if parsed is not None:
+                return email.utils.mktime_tz(parsed)
+    return None
+
+
+def get_session(switch_ip, username=None, password=None):
+    """
+    The cached RestSession of the user (the default user if none is given)
+    on the switch.
+    """
+    key = (switch_ip, username or DEFAULT_USER)
+    with rest_sessions_lock:
+        session = rest_sessions.get(key)
+        if session is None or session.password != password:
+            session = RestSession(switch_ip, username, password)
+            rest_sessions[key] = session
+    return session
+
+
+def clear_sessions(switch_ip=None):
+    with rest_sessions_lock:
+        for key in list(rest_sessions):
+            if switch_ip is None or key[0] == switch_ip:
+                del rest_sessions[key]
+
+
+def session_request(path, http_method, data, ip, full_response=False,
+                    cookie_header=None):
+    """
+    execute_request() for the helpers: with the given cookie header, or
+    through the cached session of the default user when there is none.
+    """
+    if cookie_header is not None:
+        return execute_request(path, http_method, data, ip, full_response,
+                               cookie_header)
+    return get_session(ip).request(path, http_method, data, full_response)
+
+
 def get_json(response_data):
     json_data = {}
     try:
@@ -479,16 +775,13 @@ def get_server_crt(switch):
         info("\n Getting SSL cert from server container %s, try %d" % (container_id,
              count))
         try:
-            res = subprocess.check_output(['docker', 'cp', container_id + \
-                                           ':' + CERT_FILE, \
-                                           CERT_FILE_TMP])
-            time.sleep(1)
+            get_docker_client().copy_from_container(container_id, CERT_FILE,
+                                                    CERT_FILE_TMP)
             if os.path.exists(CERT_FILE_TMP):
                 info("SSL cert successfully fetched")
                 break
-        except subprocess.CalledProcessError as e:
-            info("Error in subprocess docker cp command\n")
-            pass
+        except DockerApiError as e:
+            info("Error copying SSL cert from container: %s\n" % e)
         count += 1
         time.sleep(1)
 
@@ -16,16 +16,30 @@
 # under the License.
 
 from opsvsi.opsvsitest import *
+from opsvsi.quagga import *
+from opsvsiutils.bgputils import *
+from opsvsiutils.configutils import *
 
 VTYSH_CR = '\r\n'
 ROUTE_MAX_WAIT_TIME = 300
 
+# wait_for_routes() polls again after ROUTE_MIN_POLL_INTERVAL seconds while
+# routes keep showing up, and backs off up to ROUTE_MAX_POLL_INTERVAL
+# seconds while nothing changes.
+ROUTE_MIN_POLL_INTERVAL = 0.1
+ROUTE_MAX_POLL_INTERVAL = 2
+ROUTE_POLL_WORKERS = 16
+
 
 class SwitchVtyshUtils(object):
     @staticmethod
     def vtysh_cmd(switch, cmd):
         if isinstance(switch, VsiOpenSwitch):
             return switch.cmdCLI(cmd)
+        elif isinstance(switch, QuaggaSwitch) and switch.cli is not None:
+            # Same line endings as the node shell gives, callers split
+            # the output on VTYSH_CR.
+            return switch.cmdCLI(cmd).replace('\n', VTYSH_CR)
         else:
             return switch.cmd("vtysh -c \"%s\"" % cmd)
 
@@ -33,6 +47,19 @@ class SwitchVtyshUtils(object):
     def vtysh_get_running_cfg(switch):
         return SwitchVtyshUtils.vtysh_cmd(switch, "sh running-config")
 
+    # The running-config of the switch parsed into a RunningConfig tree.
+    # It is fetched once and kept on the switch until a configuration
+    # command goes through vtysh_cfg_cmd, cmdCLI or the node shell.
+    # Changes made any other way (e.g. REST) need refresh=True.
+    @staticmethod
+    def vtysh_get_running_cfg_tree(switch, refresh=False):
+        config = getattr(switch, 'runningConfig', None)
+        if config is None or refresh:
+            config = parse_running_config(
+                SwitchVtyshUtils.vtysh_get_running_cfg(switch))
+            switch.runningConfig = config
+        return config
+
     @staticmethod
     def vtysh_print_running_cfg(switch):
         info(SwitchVtyshUtils.vtysh_get_running_cfg(switch))
@@ -43,6 +70,7 @@ class SwitchVtyshUtils(object):
     @staticmethod
     def vtysh_cfg_cmd(switch, cfg_array, show_running_cfg=False,
                       show_results=False):
+        switch.runningConfig = None
         if isinstance(switch, VsiOpenSwitch):
             SwitchVtyshUtils.vtysh_cfg_cmd_ops(switch, cfg_array, show_results)
         else:
@@ -54,6 +82,14 @@ class SwitchVtyshUtils(object):
 
     @staticmethod
     def vtysh_cfg_cmd_quagga(switch, cfg_array, show_results):
+        if isinstance(switch, QuaggaSwitch) and switch.cli is not None:
+            result = ''
+            for cfg in ['configure term'] + list(cfg_array) + ['end']:
+                result += switch.cmdCLI(cfg)
+            if show_results:
+                info("### Config results: %s ###\n" % result)
+            return
+
         exec_cmd = ' -c "configure term"'
 
         for cfg in cfg_array:
@@ -65,14 +101,17 @@ class SwitchVtyshUtils(object):
 
     @staticmethod
     def vtysh_cfg_cmd_ops(switch, cfg_array, show_results):
-        switch.cmdCLI('configure term')
+        results = switch.cmdCLI_batch(['configure term'] + list(cfg_array) +
+                                      ['end'])
 
-        for cfg in cfg_array:
-            result = switch.cmdCLI(cfg)
+        for result in results[1:-1]:
             if show_results:
-                info("### Config results: %s ###\n" % result)
+                info("### Config results: %s ###\n" % result.output)
+            for err in result.errors:
+                info("### Config error for '%s': %s ###\n" %
+                     (result.command, err))
 
-        switch.cmdCLI('end')
+        return results
 
     # This method takes in an array of the config that we're verifying the
     # value for. For example, if we are trying to verify the remote-as of
@@ -84,12 +123,14 @@ class SwitchVtyshUtils(object):
     # verify the remote-as value for a specific router-id, however, then the
     # user can construct the cfg_array as:
     #   ["neighbor", <router-id>, "remote-as"]
+    #
+    # A line matches when it contains any item of cfg_array and the value,
+    # as substrings. See verify_cfg_line() for exact matching.
     @staticmethod
-    def verify_cfg_value(switch, cfg_array, value):
-        running_cfg = SwitchVtyshUtils.vtysh_get_running_cfg(switch)
-        running_cfg = running_cfg.split(VTYSH_CR)
+    def verify_cfg_value(switch, cfg_array, value, refresh=True):
+        config = SwitchVtyshUtils.vtysh_get_running_cfg_tree(switch, refresh)
 
-        for rc in running_cfg:
+        for rc in config.output.splitlines():
 
             for c in cfg_array:
                 if (c in rc) and (str(value) in rc):
@@ -110,66 +151,148 @@ class SwitchVtyshUtils(object):
     # following array can be passed-in:
     #   ["neighbor", "remote-as"]
     @staticmethod
-    def verify_cfg_exist(switch, cfg_array):
-        return SwitchVtyshUtils.verify_cfg_value(switch, cfg_array, '')
+    def verify_cfg_exist(switch, cfg_array, refresh=True):
+        return SwitchVtyshUtils.verify_cfg_value(switch, cfg_array, '',
+                                                 refresh)
+
+    # Stricter verify_cfg_value(): a line matches when it has all the items
+    # of cfg_array and the value as whole words, in any context of the
+    # running-config. ["neighbor", "1.1.1.1", "remote-as"] with the value 2
+    # matches "neighbor 1.1.1.1 remote-as 2", but not
+    # "neighbor 1.1.1.10 remote-as 20".
+    #
+    # With refresh=False, the running-config parsed by an earlier call is
+    # reused, unless a configuration command went through vtysh or the node
+    # shell since. Changes made any other way (e.g. REST) aren't seen then.
+    @staticmethod
+    def verify_cfg_line(switch, cfg_array, value='', refresh=True):
+        config = SwitchVtyshUtils.vtysh_get_running_cfg_tree(switch, refresh)
+        return config.has(*(list(cfg_array) + [value]))
 
     # Method for waiting for a route for ROUTE_MAX_WAIT_TIME seconds.
     # The caller may define condition as True or False to look for
     # the existence or non-existence, correspondingly, of a route.
-    # This function polls per second
     @staticmethod
     def wait_for_route(switch, network, next_hop, condition=True,
                        print_routes=False):
-        for i in range(ROUTE_MAX_WAIT_TIME):
-            attempt = i + 1
-            found = SwitchVtyshUtils.verify_bgp_route(switch, network,
-                                                      next_hop, attempt,
-                                                      print_routes)
-
-            if found == condition:
-                if condition:
-                    result = "Route was found"
-                else:
-                    result = "Route was not found"
+        info("### Waiting for route on switch %s - Network: %s, "
+             "Next-Hop: %s ###\n" % (switch.name, network, next_hop))
 
-                info("### %s ###\n" % result)
-                return found
+        converged, elapsed = SwitchVtyshUtils.wait_for_routes(
+            [(switch, network, next_hop, condition)], ROUTE_MAX_WAIT_TIME,
+            print_routes)
 
-            sleep(1)
+        if not converged:
+            return not condition
 
-        info("### Condition not met after %s seconds ###\n" %
-             ROUTE_MAX_WAIT_TIME)
-        return found
+        if condition:
+            result = "Route was found"
+        else:
+            result = "Route was not found"
 
-    @staticmethod
-    def verify_bgp_route(switch, network, next_hop, attempt=1,
-                         print_routes=False):
-        info("### Verifying route on switch %s [attempt #%d] - Network: %s, "
-             "Next-Hop: %s ###\n" %
-             (switch.name, attempt, network, next_hop))
+        info("### %s ###\n" % result)
+        return condition
 
-        routes = SwitchVtyshUtils.vtysh_cmd(switch, "sh ip bgp")
+    # Wait until a set of routes has converged, on any number of switches.
+    # The expectations are (switch, network, next_hop) tuples, with an
+    # optional fourth item set to False to wait for the route to be gone
+    # instead. An empty next_hop matches any next hop.
+    #
+    # Each round fetches the BGP tables of all the switches that still have
+    # pending routes concurrently, once per address family, and checks all
+    # of their routes against them. Returns whether everything converged
+    # within timeout seconds, and the time it took.
+    @staticmethod
+    def wait_for_routes(expectations, timeout=ROUTE_MAX_WAIT_TIME,
+                        print_routes=False,
+                        workers=ROUTE_POLL_WORKERS):
+        pending = OrderedDict()
+        for expectation in expectations:
+            switch, network, next_hop = expectation[:3]
+            present = expectation[3] if len(expectation) > 3 else True
+            pending.setdefault(switch, []).append((network, next_hop,
+                                                   present))
+
+        def poll(switch):
+            routes = pending[switch]
+            tables = {}
+            for ipv6 in set(':' in network for network, _, _ in routes):
+                tables[ipv6] = SwitchVtyshUtils.get_bgp_routes(switch, ipv6,
+                                                               print_routes)
+            return [route for route in routes
+                    if tables[':' in route[0]].has_route(route[0],
+                                                         route[1]) !=
+                    route[2]]
+
+        start = time.time()
+        deadline = start + timeout
+        interval = ROUTE_MIN_POLL_INTERVAL
+        attempt = 0
+        while True:
+            attempt += 1
+            switches = list(pending)
+            left = runConcurrently(poll, switches, workers)
+
+            progress = False
+            for switch, routes in zip(switches, left):
+                if len(routes) < len(pending[switch]):
+                    progress = True
+                if routes:
+                    pending[switch] = routes
+                else:
+                    del pending[switch]
+
+            elapsed = time.time() - start
+            if not pending:
+                info("### Routes converged after %.2f seconds, %d "
+                     "attempts ###\n" % (elapsed, attempt))
+                return True, elapsed
+
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+
+            # Poll fast while routes are converging, slow down when
+            # nothing is happening.
+            if progress:
+                interval = ROUTE_MIN_POLL_INTERVAL
+            else:
+                interval = min(interval * 2, ROUTE_MAX_POLL_INTERVAL)
+            sleep(min(interval, remaining))
+
+        info("### Condition not met after %s seconds ###\n" % timeout)
+        for switch, routes in pending.items():
+            for network, next_hop, present in routes:
+                info("### %s: route %s via %s still %s ###\n" %
+                     (switch.name, network, next_hop or 'any next hop',
+                      'missing' if present else 'present'))
+        return False, time.time() - start
+
+    # Fetch and parse the BGP table of the switch, 'show ip bgp' or with
+    # ipv6 'show ipv6 bgp'. A single table can answer any number of route
+    # checks, see BgpRouteTable.
+    @staticmethod
+    def get_bgp_routes(switch, ipv6=False, print_routes=False):
+        cmd = "sh ipv6 bgp" if ipv6 else "sh ip bgp"
+        routes = SwitchVtyshUtils.vtysh_cmd(switch, cmd)
 
         if print_routes:
             info("### Routes for switch %s ###\n" % switch.name)
             info("%s\n" % routes)
 
-        routes = routes.split(VTYSH_CR)
-
-        for rte in routes:
-            if (network in rte) and (next_hop in rte):
-                return True
-
-        routes = SwitchVtyshUtils.vtysh_cmd(switch, "sh ipv6 bgp")
-
-        if print_routes:
-            info("### Routes for switch %s ###\n" % switch.name)
-            info("%s\n" % routes)
+        return parse_bgp_table(routes)
 
-        routes = routes.split(VTYSH_CR)
+    @staticmethod
+    def verify_bgp_route(switch, network, next_hop, attempt=1,
+                         print_routes=False):
+        info("### Verifying route on switch %s [attempt #%d] - Network: %s, "
+             "Next-Hop: %s ###\n" %
+             (switch.name, attempt, network, next_hop))
 
-        for rte in routes:
-            if (network in rte) and (next_hop in rte):
+        for ipv6 in (False, True):
+            routes = SwitchVtyshUtils.get_bgp_routes(switch, ipv6,
+                                                     print_routes)
+            if routes.has_route(network, next_hop):
                 return True
 
         return False
@@ -179,18 +302,9 @@ class SwitchVtyshUtils(object):
         info("### Verifying - show ip bgp route/show ipv6 bgp - Network: %s, "
              "Next-Hop: %s ###\n" % (network, next_hop))
 
-        cmd = "sh ip bgp %s" % network
-        routes = SwitchVtyshUtils.vtysh_cmd(switch, cmd).split(VTYSH_CR)
-
-        for rte in routes:
-            if (network in rte) and (next_hop in rte):
-                return True
-
-        cmd = "sh ipv6 bgp %s" % network
-        routes = SwitchVtyshUtils.vtysh_cmd(switch, cmd).split(VTYSH_CR)
-
-        for rte in routes:
-            if (network in rte) and (next_hop in rte):
+        for cmd in ("sh ip bgp %s", "sh ipv6 bgp %s"):
+            route = SwitchVtyshUtils.vtysh_cmd(switch, cmd % network)
+            if parse_bgp_route_detail(route).has_route(network, next_hop):
                 return True
 
         return False
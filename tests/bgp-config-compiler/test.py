@@ -0,0 +1,122 @@
+#!/usr/bin/python
+
+# Renders BgpConfigs and diffs them against sample running-configs, no
+# switch needed.
+
+from opsvsiutils.bgpconfig import *
+
+RUNNING_CONFIG = """\
+ip prefix-list p1 seq 5 permit 11.0.0.0/8
+!
+router bgp 1
+ bgp router-id 8.0.0.1
+ network 9.0.0.0
+ network 12.0.0.0/8
+ neighbor 8.0.0.2 remote-as 2
+ neighbor 8.0.0.2 route-map foo out
+ neighbor 8.0.0.3 remote-as 3
+!
+router bgp 5
+!
+"""
+
+
+def bgp_config():
+    bgp1 = BgpConfig("1", "8.0.0.1", "9.0.0.0")
+    bgp2 = BgpConfig("2", "8.0.0.2", "11.0.0.0/8")
+    bgp1.addNeighbor(bgp2)
+    bgp1.prefixLists.append(PrefixList("p1", 5, "permit", "11.0.0.0", 8))
+    bgp1.addRouteMap(bgp2, "p1", "in", "permit", 100)
+    return bgp1
+
+
+def test_render():
+    ops = BgpConfigCompiler(ops=True).render(bgp_config())
+    assert ops == ["ip prefix-list p1 seq 5 permit 11.0.0.0/8",
+                   "route-map rm_8.0.0.2_in permit 10",
+                   "match ip address prefix-list p1",
+                   "set metric 100",
+                   "exit",
+                   "router bgp 1",
+                   "bgp router-id 8.0.0.1",
+                   "network 9.0.0.0/8",
+                   "neighbor 8.0.0.2 remote-as 2",
+                   "neighbor 8.0.0.2 route-map rm_8.0.0.2_in in",
+                   "exit"]
+
+    # Quagga shows classful networks without their length.
+    quagga = BgpConfigCompiler(ops=False).render(bgp_config())
+    assert "network 9.0.0.0" in quagga
+
+
+def test_diff_only_missing_lines():
+    compiler = BgpConfigCompiler(ops=True)
+    running = parse_running_config(RUNNING_CONFIG)
+    assert compiler.diff(bgp_config(), running) == \
+        ["route-map rm_8.0.0.2_in permit 10",
+         "match ip address prefix-list p1",
+         "set metric 100",
+         "exit",
+         "router bgp 1",
+         "neighbor 8.0.0.2 route-map rm_8.0.0.2_in in",
+         "exit"]
+
+    # Once applied, there is nothing left to push.
+    running = parse_running_config(RUNNING_CONFIG.replace(
+        " neighbor 8.0.0.2 route-map foo out",
+        " neighbor 8.0.0.2 route-map rm_8.0.0.2_in in") +
+        "route-map rm_8.0.0.2_in permit 10\n"
+        "    match ip address prefix-list p1\n"
+        "    set metric 100\n")
+    assert compiler.diff(bgp_config(), running) == []
+
+
+def test_diff_prune():
+    compiler = BgpConfigCompiler(ops=True)
+    running = parse_running_config(RUNNING_CONFIG)
+    delta = compiler.diff(bgp_config(), running, prune=True)
+    assert delta[0] == "no router bgp 5"
+    bgp = delta[delta.index("router bgp 1"):]
+    assert bgp == ["router bgp 1",
+                   "no network 12.0.0.0/8",
+                   "no neighbor 8.0.0.2 route-map foo out",
+                   "no neighbor 8.0.0.3",
+                   "neighbor 8.0.0.2 route-map rm_8.0.0.2_in in",
+                   "exit"]
+
+
+class FakeSwitch(object):
+    """
+    Quagga-like switch answering vtysh through its shell. Its running
+    config can change behind the cached tree, as with REST.
+    """
+
+    name = 'q1'
+
+    def __init__(self, config):
+        self.config = config
+        self.runningConfig = None
+        self.pushed = []
+
+    def cmd(self, cmd):
+        if cmd == 'vtysh -c "sh running-config"':
+            return self.config
+        self.pushed.append(cmd)
+        return ''
+
+
+def test_apply_fetches_the_running_config():
+    switch = FakeSwitch("router bgp 5\n!\n")
+    SwitchVtyshUtils.vtysh_get_running_cfg_tree(switch)
+    # Changed behind the cached tree.
+    switch.config = RUNNING_CONFIG
+
+    compiler = BgpConfigCompiler(ops=False)
+    delta = compiler.apply(switch, bgp_config())
+    assert "bgp router-id 8.0.0.1" not in delta
+    assert len(switch.pushed) == 1
+
+    # Trusting the cached tree.
+    switch.runningConfig = parse_running_config("router bgp 5\n!\n")
+    assert "bgp router-id 8.0.0.1" in \
+        compiler.apply(switch, bgp_config(), refresh=False)
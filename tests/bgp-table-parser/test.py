@@ -0,0 +1,177 @@
+#!/usr/bin/python
+
+# Parses sample 'show ip bgp' and 'show ipv6 bgp' outputs of OpenSwitch and
+# Quagga, no switch needed.
+
+from opsvsiutils.bgputils import *
+
+QUAGGA_SHOW_IP_BGP = """\
+BGP table version is 0, local router ID is 9.0.0.1\r
+Status codes: s suppressed, d damped, h history, * valid, > best, = multipath,\r
+              i internal, r RIB-failure, S Stale, R Removed\r
+Origin codes: i - IGP, e - EGP, ? - incomplete\r
+\r
+   Network          Next Hop            Metric LocPrf Weight Path\r
+*> 9.0.0.0          0.0.0.0                  0         32768 i\r
+*> 10.0.0.0/8       20.0.0.2                 0             0 2 1 i\r
+*                   30.0.0.2                10             0 3 1 i\r
+*>i10.0.0.10/32     1.1.1.1                  0    100      0 ?\r
+\r
+Total number of prefixes 3\r
+"""
+
+QUAGGA_SHOW_IPV6_BGP = """\
+BGP table version is 0, local router ID is 9.0.0.1
+   Network          Next Hop            Metric LocPrf Weight Path
+*> 2001:db8:0:1::/64
+                    ::                       0         32768 i
+*> 2001:db8:0:2::/64
+                    2001:db8:0:12::2
+                                             0             0 2 i
+"""
+
+OPS_SHOW_IP_BGP = """\
+Status codes: s suppressed, d damped, h history, * valid, > best, = multipath,
+              i internal, S Stale, R Removed
+Origin codes: i - IGP, e - EGP, ? - incomplete
+
+Local router-id 8.0.0.1
+   Network          Next Hop            Metric LocPrf Weight Path
+*> 11.0.0.0/8       0.0.0.0                  0      0  32768  i
+*> 12.0.0.0/8       20.0.0.2                 0      0      0 2 i
+Total number of entries 2
+"""
+
+QUAGGA_SHOW_IP_BGP_DETAIL = """\
+BGP routing table entry for 10.0.0.0/8
+Paths: (2 available, best #1, table Default-IP-Routing-Table)
+  Advertised to non peer-group peers:
+  30.0.0.2
+  2 1
+    20.0.0.2 from 20.0.0.2 (2.2.2.2)
+      Origin IGP, metric 0, localpref 100, valid, external, best
+      Last update: Thu Jan  1 00:00:00 2016
+
+  3 1
+    30.0.0.2 from 30.0.0.2 (3.3.3.3)
+      Origin IGP, metric 10, localpref 100, valid, external
+"""
+
+OPS_SHOW_IP_BGP_DETAIL = """\
+BGP routing table entry for 12.0.0.0/8
+Paths: (1 available, best #1)
+AS: 2
+    20.0.0.2 from 20.0.0.2 (2.2.2.2)
+      Origin IGP, metric 0, localpref 0, weight 0, valid, external, best
+"""
+
+
+def test_quagga_table():
+    table = parse_bgp_table(QUAGGA_SHOW_IP_BGP)
+    assert table.router_id == '9.0.0.1'
+    assert len(table) == 3
+
+    # Classful networks are printed without their length.
+    assert table.has_route('9.0.0.0/8', '0.0.0.0')
+    assert table.route('9.0.0.0').best.weight == 32768
+
+    route = table.route('10.0.0.0/8')
+    assert [p.next_hop for p in route.paths] == ['20.0.0.2', '30.0.0.2']
+    assert route.best.next_hop == '20.0.0.2'
+    assert route.best.as_path == ['2', '1']
+    assert route.best.origin == 'i'
+    assert route.best.locprf is None
+    second = route.path('30.0.0.2')
+    assert not second.best and second.valid
+    assert second.metric == 10 and second.weight == 0
+
+    internal = table.route('10.0.0.10/32').best
+    assert internal.internal and internal.locprf == 100
+    assert internal.as_path == [] and internal.origin == '?'
+
+
+def test_next_hops_are_plain_addresses():
+    table = parse_bgp_table(QUAGGA_SHOW_IP_BGP)
+    # A local route, the next hop is not a network.
+    assert table.route('9.0.0.0/8').best.next_hop == '0.0.0.0'
+    assert BgpPath('10.0.0.0').next_hop == '10.0.0.0'
+    assert BgpPath('2001:DB8:0::1').next_hop == '2001:db8::1'
+
+
+def test_normalize_prefix():
+    assert normalize_prefix('10.0.0.0') == '10.0.0.0/8'
+    assert normalize_prefix('172.16.0.0') == '172.16.0.0/16'
+    assert normalize_prefix('192.168.1.0') == '192.168.1.0/24'
+    assert normalize_prefix('10.0.0.1') == '10.0.0.1/32'
+    assert normalize_prefix('10.1.0.0/16') == '10.1.0.0/16'
+    assert normalize_prefix('2001:DB8::') == '2001:db8::/128'
+    assert normalize_address('10.0.0.0') == '10.0.0.0'
+
+
+def test_exact_matching():
+    table = parse_bgp_table(QUAGGA_SHOW_IP_BGP)
+    assert not table.has_route('10.0.0.1', '1.1.1.1')
+    assert not table.has_route('10.0.0.10/32', '1.1.1.10')
+    assert not table.has_route('10.0.0.0/8', '20.0.0.20')
+    assert table.has_route('10.0.0.10', '1.1.1.1')
+
+
+def test_network_without_length():
+    table = parse_bgp_table(QUAGGA_SHOW_IP_BGP +
+                            "*> 10.10.10.0/24    20.0.0.2                 0"
+                            "             0 2 i\r\n"
+                            "*> 10.10.10.0/26    30.0.0.2                 0"
+                            "             0 3 i\r\n")
+    assert table.has_route('10.10.10.0', '20.0.0.2')
+    assert table.has_route('10.10.10.0', '30.0.0.2')
+    assert table.route('10.10.10.0').prefix == '10.10.10.0/24'
+    assert not table.has_route('10.10.10.0/25', '20.0.0.2')
+    # Classful first, like the table prints them.
+    assert table.route('10.0.0.0').prefix == '10.0.0.0/8'
+    assert table.route('9.0.0.0').prefix == '9.0.0.0/8'
+    assert '10.10.0.0' not in table
+    assert len(table) == 5
+
+
+def test_quagga_ipv6_wrapped_lines():
+    table = parse_bgp_table(QUAGGA_SHOW_IPV6_BGP)
+    assert len(table) == 2
+    assert table.has_route('2001:db8:0:1::/64', '::')
+    assert table.route('2001:0db8:0000:0001::/64').best.weight == 32768
+
+    path = table.route('2001:db8:0:2::/64').best
+    assert path.next_hop == '2001:db8:0:12::2'
+    assert path.metric == 0 and path.weight == 0
+    assert path.as_path == ['2'] and path.origin == 'i'
+
+
+def test_ops_table():
+    table = parse_bgp_table(OPS_SHOW_IP_BGP)
+    assert table.router_id == '8.0.0.1'
+    assert len(table) == 2
+    path = table.route('11.0.0.0/8').best
+    assert (path.metric, path.locprf, path.weight) == (0, 0, 32768)
+    assert path.as_path == [] and path.origin == 'i'
+    assert table.route('12.0.0.0/8').path('20.0.0.2').as_path == ['2']
+
+
+def test_route_detail():
+    table = parse_bgp_route_detail(QUAGGA_SHOW_IP_BGP_DETAIL)
+    route = table.route('10.0.0.0/8')
+    assert len(route.paths) == 2
+    assert route.best.next_hop == '20.0.0.2'
+    assert route.best.peer == '20.0.0.2'
+    assert route.best.router_id == '2.2.2.2'
+    assert route.best.as_path == ['2', '1']
+    assert route.best.origin == 'IGP' and route.best.locprf == 100
+    assert route.path('30.0.0.2').as_path == ['3', '1']
+    assert not route.path('30.0.0.2').best
+
+    table = parse_bgp_route_detail(OPS_SHOW_IP_BGP_DETAIL)
+    path = table.route('12.0.0.0/8').best
+    assert path.as_path == ['2'] and path.weight == 0
+
+
+def test_no_routes():
+    assert len(parse_bgp_table('')) == 0
+    assert len(parse_bgp_route_detail('% Network not in table\n')) == 0
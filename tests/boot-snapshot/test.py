@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+# Drives the boot snapshot save and restore of DockerNode against a fake
+# docker client, so that it can run without docker or CRIU.
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import opsvsi.docker
+from opsvsi.docker import *
+
+IMAGE_ID = 'sha256:0123456789abcdef0123'
+
+BINDS = ["/tmp/openswitch-test/t1/s1/shared:/shared",
+         "/dev/log:/dev/log",
+         "/lib/modules:/lib/modules",
+         "/sys/fs/cgroup:/sys/fs/cgroup"]
+
+
+class FakeDocker(object):
+    def __init__(self, events):
+        self.events = events
+        self.fail_checkpoint = False
+        self.fail_start = False
+
+    def inspect_image(self, image):
+        return {'Id': IMAGE_ID}
+
+    def checkpoint_container(self, name, checkpoint, checkpoint_dir=None,
+                             exit=False):
+        self.events.append(('checkpoint', name, checkpoint, checkpoint_dir))
+        if self.fail_checkpoint:
+            raise DockerApiError(500, 'criu failed')
+        os.makedirs(os.path.join(checkpoint_dir, checkpoint))
+
+    def create_container(self, name, image, **config):
+        self.events.append(('create', name, image, config))
+        return name + '-id'
+
+    def start_container(self, name, checkpoint=None, checkpoint_dir=None):
+        self.events.append(('start', name, checkpoint, checkpoint_dir))
+        if self.fail_start:
+            raise DockerApiError(500, 'restore failed')
+
+    def remove_container(self, name, force=True):
+        self.events.append(('remove', name))
+        return True
+
+
+@pytest.fixture
+def events(monkeypatch):
+    snapshot_dir = tempfile.mkdtemp()
+    monkeypatch.setattr(opsvsi.docker, 'DOCKER_SNAPSHOT_DIR', snapshot_dir)
+    yield []
+    shutil.rmtree(snapshot_dir)
+
+
+def make_node(events, name, binds=BINDS):
+    node = DockerNode.__new__(DockerNode)
+    node.docker = FakeDocker(events)
+    node.image = 'openswitch/genericx86-64'
+    node.image_id = None
+    node.container_name = name
+    node.snapshot = True
+    node.restored = False
+    node.binds = binds
+    node.detachShell = lambda: events.append(('detach', name))
+    node.attachShell = lambda: events.append(('attach', name))
+    return node
+
+
+def config(binds):
+    return {'cmd': ['/sbin/init'], 'hostname': 'h', 'binds': binds,
+            'privileged': True, 'tty': False}
+
+
+def test_save_detaches_the_shell(events):
+    make_node(events, 't1_s1').saveSnapshot()
+
+    checkpoint_dir = snapshotDir(IMAGE_ID)
+    assert events == [('detach', 't1_s1'),
+                      ('checkpoint', 't1_s1', 'booted-t1_s1', checkpoint_dir),
+                      ('attach', 't1_s1')]
+    assert os.listdir(checkpoint_dir) == [DOCKER_SNAPSHOT_NAME]
+
+    # Only the first node of an image saves one.
+    del events[:]
+    make_node(events, 't1_s2').saveSnapshot()
+    assert events == []
+
+
+def test_failed_save_reattaches_the_shell(events):
+    node = make_node(events, 't1_s1')
+    node.docker.fail_checkpoint = True
+    node.saveSnapshot()
+    assert [e[0] for e in events] == ['detach', 'checkpoint', 'attach']
+    assert not os.path.exists(os.path.join(snapshotDir(IMAGE_ID),
+                                           DOCKER_SNAPSHOT_NAME))
+
+
+def test_restore_with_the_same_binds(events):
+    make_node(events, 't1_s1').saveSnapshot()
+    del events[:]
+
+    # Same binds, except for the /shared of the new node.
+    binds = ["/tmp/openswitch-test/t2/s1/shared:/shared"] + BINDS[1:]
+    node = make_node(events, 't2_s1', binds)
+    assert node.restoreSnapshot(config(binds))
+    assert node.restored
+    assert events == [('create', 't2_s1', node.image, config(binds)),
+                      ('start', 't2_s1-id', DOCKER_SNAPSHOT_NAME,
+                       snapshotDir(IMAGE_ID))]
+
+
+def test_no_restore_with_other_binds(events):
+    make_node(events, 't1_s1').saveSnapshot()
+    del events[:]
+
+    binds = BINDS + ["/tmp/data:/data"]
+    node = make_node(events, 't2_s1', binds)
+    assert not node.restoreSnapshot(config(binds))
+    assert events == []
+
+
+def test_failed_restore_boots(events):
+    make_node(events, 't1_s1').saveSnapshot()
+    del events[:]
+
+    node = make_node(events, 't2_s1')
+    node.docker.fail_start = True
+    assert not node.restoreSnapshot(config(BINDS))
+    assert not node.restored
+    assert [e[0] for e in events] == ['create', 'start', 'remove']
+
+
+def test_no_snapshot_yet(events):
+    node = make_node(events, 't1_s1')
+    assert not node.restoreSnapshot(config(BINDS))
+    node.snapshot = False
+    assert not node.restoreSnapshot(config(BINDS))
+    assert events == []
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+
+# Checks the boot phase timing of the docker nodes and the boot_timing.json
+# report, with nodes that are not backed by containers.
+
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from opsvsi.opsvsitest import *
+
+
+def make_node(cls, name, times):
+    node = cls.__new__(cls)
+    node.name = name
+    node.bootTimes = OrderedDict(times)
+    return node
+
+
+def test_percentile():
+    values = range(1, 101)
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 100) == 100
+    assert percentile(values, 0) == 1
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([5, 1, 4, 2, 3], 50) == 3
+
+
+def test_boot_phase():
+    node = make_node(DockerNode, 's1', [])
+    with node.bootPhase('docker_run'):
+        time.sleep(0.1)
+    with pytest.raises(ValueError):
+        with node.bootPhase('tuntap'):
+            raise ValueError()
+
+    assert node.bootTimes.keys() == ['docker_run', 'tuntap']
+    assert 0.1 <= node.bootTimes['docker_run'] < 1
+    assert node.bootTimes['tuntap'] < 0.1
+
+
+def test_write_boot_timing():
+    testdir = tempfile.mkdtemp()
+    test = OpsVsiTest.__new__(OpsVsiTest)
+    test.testdir = testdir
+    test.boot_times = OrderedDict()
+    for i in range(1, 5):
+        test.boot_times['s%d' % i] = (
+            "VsiOpenSwitch", OrderedDict([('docker_run', float(i)),
+                                          ('tuntap', 0.5)]))
+    test.boot_times['h1'] = ("OpsVsiHost",
+                             OrderedDict([('docker_run', 7.0)]))
+    try:
+        test.writeBootTiming()
+        report = json.load(open(os.path.join(testdir, 'boot_timing.json')))
+    finally:
+        shutil.rmtree(testdir)
+
+    assert sorted(report['switches']) == ['s1', 's2', 's3', 's4']
+    assert report['switches']['s3'] == {'docker_run': 3.0, 'tuntap': 0.5,
+                                        'total': 3.5}
+    assert report['hosts'] == {'h1': {'docker_run': 7.0, 'total': 7.0}}
+
+    # Only the switches are summarized.
+    summary = report['summary']
+    assert sorted(summary) == ['docker_run', 'total', 'tuntap']
+    assert summary['docker_run'] == {'p50': 2.0, 'p95': 4.0, 'max': 4.0,
+                                     'count': 4}
+    assert summary['total']['max'] == 4.5
+
+
+class FailingBootTest(OpsVsiTest):
+    # A switch timing out in wait_for_openswitch.
+    def setupNet(self):
+        self.boot_times['s1'] = ("VsiOpenSwitch",
+                                 OrderedDict([('docker_run', 1.0),
+                                              ('wait_for_openswitch', 2.0)]))
+        raise ContainerStartError("s1: OpenSwitch not ready")
+
+
+def test_boot_timing_of_a_failed_boot():
+    test_id = 'boot-timing-%d' % os.getpid()
+    testdir = '/tmp/openswitch-test/test_' + test_id
+    try:
+        with pytest.raises(ContainerStartError):
+            FailingBootTest(test_id=test_id)
+        report = json.load(open(os.path.join(testdir, 'boot_timing.json')))
+    finally:
+        shutil.rmtree(testdir, ignore_errors=True)
+    assert report['switches'] == {'s1': {'docker_run': 1.0,
+                                         'wait_for_openswitch': 2.0,
+                                         'total': 3.0}}
+
+
+def test_node_options_share_the_boot_times():
+    test = OpsVsiTest.__new__(OpsVsiTest)
+    test.id = 'id'
+    test.testdir = '/tmp'
+    test.boot_times = OrderedDict()
+    test.switchmounts = []
+    test.hostmounts = []
+    test.hostimage = 'host'
+    test.switch_pool = None
+    assert test.getSwitchOpts()['boot_times'] is test.boot_times
+    assert test.getHostOpts()['boot_times'] is test.boot_times
@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+# Drives VsiOpenSwitch.cmdCLI_batch against a fake vtysh behind a pair of
+# pipes, so that it can run without docker.
+
+import os
+import threading
+
+import pytest
+
+from opsvsi.opsvsitest import *
+
+BIG_OUTPUT = ''.join("Port %d is up\n" % i for i in range(2000))
+
+
+# Answers every command line like vtysh -t does: its output, then the
+# prompt ending with the chr(127) sentinel.
+def fake_vtysh(stdin, stdout):
+    for line in iter(stdin.readline, ''):
+        cmd = line.strip()
+        if cmd == 'show big':
+            output = BIG_OUTPUT
+        elif cmd.startswith('bad'):
+            output = "% Unknown command.\n"
+        else:
+            output = "ok %s\n" % cmd
+        stdout.write(output + "switch# " + chr(127))
+        stdout.flush()
+    stdout.close()
+
+
+@pytest.fixture
+def switch():
+    cmd_read, cmd_write = os.pipe()
+    out_read, out_write = os.pipe()
+    vtysh = threading.Thread(target=fake_vtysh,
+                             args=(os.fdopen(cmd_read),
+                                   os.fdopen(out_write, 'w')))
+    vtysh.daemon = True
+    vtysh.start()
+
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.cliTimeout = 10
+    switch.lazyPorts = False
+    switch.runningConfig = None
+    switch.cliStdin = os.fdopen(cmd_write, 'w')
+    switch.cliStdout = os.fdopen(out_read)
+    yield switch
+    switch.cliStdin.close()
+    vtysh.join()
+    switch.cliStdout.close()
+
+
+def test_outputs_are_split_per_command(switch):
+    commands = ["configure terminal", "show big", "router bgp 1",
+                "show big", "end"]
+    results = switch.cmdCLI_batch(commands)
+
+    assert [r.command for r in results] == commands
+    assert results[0].output == "ok configure terminal\nswitch# "
+    assert results[1].output == BIG_OUTPUT + "switch# "
+    assert results[3].output == results[1].output
+    assert results[4].output == "ok end\nswitch# "
+    assert all(r.errors == [] for r in results)
+
+
+def test_error_in_the_middle(switch):
+    results = switch.cmdCLI_batch(["configure terminal", "bad command",
+                                   "router bgp 1", "end"])
+    assert [r.errors for r in results] == [[], ["% Unknown command."],
+                                           [], []]
+    assert results[2].output == "ok router bgp 1\nswitch# "
+
+
+def test_more_commands_than_the_window(switch):
+    commands = ["show big" if i % 7 == 0 else "cmd %d" % i
+                for i in range(3 * CLI_PIPELINE_WINDOW + 5)]
+
+    # Commands written and not answered yet, at most.
+    counts = {'written': 0, 'read': 0, 'ahead': 0}
+    write = switch.writeCLI
+    read = switch.readCLIRaw
+
+    def writeCLI(fd, inp):
+        counts['written'] += 1
+        counts['ahead'] = max(counts['ahead'],
+                              counts['written'] - counts['read'])
+        write(fd, inp)
+
+    def readCLIRaw(fd, buflen=1024, timeout=None):
+        out = read(fd, buflen, timeout)
+        counts['read'] += out.count(chr(127))
+        return out
+
+    switch.writeCLI = writeCLI
+    switch.readCLIRaw = readCLIRaw
+    results = switch.cmdCLI_batch(commands)
+
+    assert len(results) == len(commands)
+    for command, result in zip(commands, results):
+        assert result.command == command
+        if command == "show big":
+            assert result.output == BIG_OUTPUT + "switch# "
+        else:
+            assert result.output == "ok %s\nswitch# " % command
+    assert 1 < counts['ahead'] <= CLI_PIPELINE_WINDOW
+
+    results = switch.cmdCLI_batch(commands[:10], window=1)
+    assert [r.command for r in results] == commands[:10]
+
+
+def test_config_commands_drop_the_running_config(switch):
+    switch.runningConfig = object()
+    switch.cmdCLI_batch(["show running-config", "do show version"])
+    assert switch.runningConfig is not None
+    switch.cmdCLI_batch(["show version", "configure terminal", "end"])
+    assert switch.runningConfig is None
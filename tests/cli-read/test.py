@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+# Reads vtysh-like output from pipes with readCLIUntil and
+# VsiOpenSwitch.readCLI, so that it can run without docker.
+
+import os
+import threading
+import time
+
+import pytest
+
+from opsvsi.opsvsitest import *
+
+SENTINEL = chr(127)
+
+
+@pytest.fixture
+def pipe():
+    read_fd, write_fd = os.pipe()
+    fds = {'read': read_fd, 'write': write_fd}
+    yield fds
+    for fd in fds.values():
+        if fd is not None:
+            os.close(fd)
+
+
+def close_write(pipe):
+    os.close(pipe['write'])
+    pipe['write'] = None
+
+
+def at_sentinel(out):
+    return out[-1] == 127
+
+
+def test_output_across_reads(pipe):
+    def write():
+        for chunk in ("show ", "version\n", "switch# ", SENTINEL):
+            os.write(pipe['write'], chunk)
+            time.sleep(0.05)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    out = readCLIUntil('s1', pipe['read'], at_sentinel, 10)
+    writer.join()
+    assert out == "show version\nswitch# " + SENTINEL
+
+
+def test_big_output(pipe):
+    output = "x" * (4 * CLI_MAX_READ) + SENTINEL
+    writer = threading.Thread(target=os.write,
+                              args=(pipe['write'], output))
+    writer.start()
+    assert readCLIUntil('s1', pipe['read'], at_sentinel, 10, 16) == output
+    writer.join()
+
+
+def test_silent_cli_times_out(pipe):
+    os.write(pipe['write'], "partial output")
+    start = time.time()
+    with pytest.raises(CLITimeoutError) as e:
+        readCLIUntil('s1', pipe['read'], at_sentinel, 0.5)
+    assert 0.5 <= time.time() - start < 1
+    assert "no vtysh prompt after" in str(e.value)
+    assert "partial output" in str(e.value)
+
+
+def test_eof_before_the_sentinel(pipe):
+    os.write(pipe['write'], "switch# ")
+    close_write(pipe)
+    start = time.time()
+    with pytest.raises(CLITimeoutError) as e:
+        readCLIUntil('s1', pipe['read'], at_sentinel, 10)
+    assert time.time() - start < 1
+    assert "vtysh exited" in str(e.value)
+
+
+def test_switch_read_cli(pipe):
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.cliTimeout = 0.5
+
+    os.write(pipe['write'], "ok\nswitch# " + SENTINEL)
+    assert switch.readCLI(pipe['read']) == "ok\nswitch# "
+
+    # The switch timeout applies unless one is given.
+    start = time.time()
+    with pytest.raises(CLITimeoutError):
+        switch.readCLI(pipe['read'])
+    assert 0.5 <= time.time() - start < 1
+    start = time.time()
+    with pytest.raises(CLITimeoutError):
+        switch.readCLI(pipe['read'], timeout=0.1)
+    assert time.time() - start < 0.5
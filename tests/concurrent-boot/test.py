@@ -0,0 +1,104 @@
+#!/usr/bin/python
+
+# Builds an OpsVsiNet with concurrent node boot from a topology of fake
+# node classes, so that it can run without docker.
+
+import threading
+import time
+
+import pytest
+
+from mininet.net import Mininet
+from mininet.topo import Topo
+from opsvsi.opsvsitest import *
+
+
+class FakeNode(object):
+    # Constructions in flight, and the most there were at once.
+    lock = threading.Lock()
+    active = 0
+    overlap = 0
+    constructed = []
+    terminated = []
+
+    def __init__(self, name, **params):
+        cls = FakeNode
+        with cls.lock:
+            cls.active += 1
+            cls.overlap = max(cls.overlap, cls.active)
+        time.sleep(0.2)
+        with cls.lock:
+            cls.active -= 1
+            cls.constructed.append(name)
+        if params.get('fail'):
+            raise ContainerStartError("%s: no container" % name)
+        self.name = name
+        self.params = params
+
+    def terminate(self):
+        FakeNode.terminated.append(self.name)
+
+
+class FakeHost(FakeNode):
+    pass
+
+
+class FakeSwitch(FakeNode):
+    pass
+
+
+class FakeTopo(Topo):
+    def build(self, failing=None):
+        for i in range(1, 3):
+            self.addHost('h%d' % i, cls=FakeHost, color='red')
+        for i in range(1, 4):
+            self.addSwitch('s%d' % i, cls=FakeSwitch,
+                           fail=('s%d' % i == failing))
+
+
+@pytest.fixture(autouse=True)
+def fake_nodes(monkeypatch):
+    # No root or system limits needed for fake nodes.
+    monkeypatch.setattr(Mininet, 'inited', True)
+    FakeNode.overlap = 0
+    FakeNode.constructed = []
+    FakeNode.terminated = []
+
+
+def build(topo, bootWorkers):
+    net = OpsVsiNet(topo=topo, bootWorkers=bootWorkers, controller=None,
+                    build=False)
+    net.buildFromTopo(topo)
+    return net
+
+
+def test_nodes_boot_concurrently():
+    start = time.time()
+    net = build(FakeTopo(), 5)
+    assert time.time() - start < 0.6
+    assert FakeNode.overlap == 5
+    assert sorted(FakeNode.constructed) == ['h1', 'h2', 's1', 's2', 's3']
+
+    # Adopted by Mininet in topology order, with its parameters merged.
+    assert [h.name for h in net.hosts] == ['h1', 'h2']
+    assert [s.name for s in net.switches] == ['s1', 's2', 's3']
+    assert all(isinstance(h, FakeHost) for h in net.hosts)
+    assert net.hosts[1].params['color'] == 'red'
+    assert net.hosts[1].params['ip'] == '10.0.0.2/8'
+    assert 'inNamespace' in net.switches[0].params
+    assert net['s2'] is net.switches[1]
+    assert net.bootedNodes == {}
+
+
+def test_one_worker_boots_in_order():
+    net = build(FakeTopo(), 1)
+    assert FakeNode.overlap == 1
+    assert FakeNode.constructed == ['h1', 'h2', 's1', 's2', 's3']
+    assert net.hosts[0].params['ip'] == '10.0.0.1/8'
+
+
+def test_failed_boot_terminates_the_others():
+    with pytest.raises(ContainerStartError):
+        build(FakeTopo(failing='s2'), 5)
+    assert sorted(FakeNode.constructed) == ['h1', 'h2', 's1', 's2', 's3']
+    assert sorted(FakeNode.terminated) == ['h1', 'h2', 's1', 's3']
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+
+# Fixtures shared by the REST tests: a self-signed certificate and the
+# stand-in restd of opsvsiutils.restutils.benchmark, so that they can run
+# without a switch. restutils is only imported by the fixtures, for the
+# other tests not to need it.
+
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+
+@pytest.fixture(scope='session')
+def rest_certfile():
+    tmpdir = tempfile.mkdtemp()
+    certfile = os.path.join(tmpdir, 'server.pem')
+    subprocess.check_call(['openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                           '-nodes', '-days', '1', '-subj', '/CN=127.0.0.1',
+                           '-keyout', certfile, '-out', certfile],
+                          stdout=open(os.devnull, 'w'),
+                          stderr=subprocess.STDOUT)
+    yield certfile
+    shutil.rmtree(tmpdir)
+
+
+# A fresh connection pool and session cache, trusting rest_certfile.
+@pytest.fixture
+def rest_client(monkeypatch, rest_certfile):
+    from opsvsiutils.restutils import utils
+
+    monkeypatch.setitem(utils.SSL_CONFIG, utils.SSL_CFG_CA_CERTS,
+                        rest_certfile)
+    monkeypatch.setattr(utils, 'rest_pool', utils.HTTPSConnectionPool())
+    utils.clear_sessions()
+    yield
+    utils.rest_pool.close()
+    utils.clear_sessions()
+
+
+# Starts stand-in restd servers on demand, all stopped after the test.
+@pytest.fixture
+def rest_servers(rest_client, rest_certfile):
+    from opsvsiutils.restutils.benchmark import StandInRestServer
+
+    servers = []
+
+    def start(**kwargs):
+        server = StandInRestServer(rest_certfile, **kwargs).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def rest_server(rest_servers):
+    return rest_servers()
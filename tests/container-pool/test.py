@@ -0,0 +1,230 @@
+#!/usr/bin/python
+
+# Exercises the switch container pool with fake docker clients and nodes,
+# so that it can run without docker.
+
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+import opsvsi.docker
+from opsvsi.opsvsitest import *
+
+
+class FakeDocker(object):
+    def __init__(self):
+        self.pids = {}
+        self.removed = []
+
+    def inspect_container(self, name):
+        if name not in self.pids:
+            raise DockerApiError(404, 'No such container')
+        return {'State': {'Pid': self.pids[name]}}
+
+    def remove_container(self, name):
+        self.removed.append(name)
+        self.pids.pop(name, None)
+        return True
+
+
+class FakeProcess(object):
+    def __init__(self):
+        self.closed = False
+
+    def poll(self):
+        return 0
+
+    def wait(self):
+        return 0
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_docker(monkeypatch):
+    docker = FakeDocker()
+    monkeypatch.setattr(opsvsi.docker, 'get_docker_client', lambda: docker)
+    return docker
+
+
+@pytest.fixture
+def pool(fake_docker):
+    pooldir = tempfile.mkdtemp()
+    pool = ContainerPool(1, pooldir)
+    yield pool
+    pool.drain()
+    shutil.rmtree(pooldir)
+
+
+def pooled(pool, docker, pid, image='img', mounts=[]):
+    name, shareddir = pool.allocate()
+    docker.pids[name] = pid
+    return PooledContainer(name, shareddir, pid, image, mounts)
+
+
+def test_lease_and_release(pool, fake_docker):
+    assert pool.lease('img', []) is None
+
+    container = pooled(pool, fake_docker, 10)
+    assert pool.hasRoom('img', [])
+    assert pool.release(container)
+    assert not pool.hasRoom('img', [])
+    assert not pool.release(pooled(pool, fake_docker, 11))
+    assert pool.hasRoom('img', ['/tmp:/tmp'])
+
+    assert pool.lease('img', ['/tmp:/tmp']) is None
+    assert pool.lease('img', []) is container
+    assert pool.lease('img', []) is None
+
+
+def test_lease_skips_dead_containers(pool, fake_docker):
+    pool.size = 3
+    alive = pooled(pool, fake_docker, 10)
+    restarted = pooled(pool, fake_docker, 11)
+    gone = pooled(pool, fake_docker, 12)
+    for container in (alive, restarted, gone):
+        pool.release(container)
+    # Restarted since it was given back, and removed behind the pool's back.
+    fake_docker.pids[restarted.container_name] = 99
+    del fake_docker.pids[gone.container_name]
+
+    assert pool.lease('img', []) is alive
+    assert fake_docker.removed == [restarted.container_name]
+
+
+def test_drain(pool, fake_docker):
+    container = pooled(pool, fake_docker, 10)
+    pool.release(container)
+    pool.drain()
+    assert fake_docker.removed == [container.container_name]
+    assert pool.lease('img', []) is None
+
+
+def node_to_release(pool, fake_docker, reset):
+    node = DockerNode.__new__(DockerNode)
+    node.pool = pool
+    node.image = 'img'
+    node.mounts = []
+    node.container_name, node.shareddir = pool.allocate()
+    node.docker_pid = 10
+    node.shell = FakeProcess()
+    node.resetContainer = reset
+    fake_docker.pids[node.container_name] = 10
+    return node
+
+
+def test_release_container(pool, fake_docker):
+    node = node_to_release(pool, fake_docker, lambda: True)
+    assert node.releaseContainer()
+    leased = pool.lease('img', [])
+    assert leased.container_name == node.container_name
+    assert leased.pid == 10
+
+    # No room left for a second one.
+    pool.release(leased)
+    other = node_to_release(pool, fake_docker, lambda: True)
+    assert not other.releaseContainer()
+
+
+def test_release_container_failed_reset(pool, fake_docker):
+    def failing_reset():
+        raise OSError("no such file")
+
+    assert not node_to_release(pool, fake_docker,
+                               lambda: False).releaseContainer()
+    assert not node_to_release(pool, fake_docker,
+                               failing_reset).releaseContainer()
+    assert pool.lease('img', []) is None
+
+
+class FakeSwitch(object):
+    def __init__(self, services_active=True, logs="Script Run : Success"):
+        self.services_active = services_active
+        self.logs = logs
+        self.cmds = []
+
+    def cmd(self, cmd):
+        self.cmds.append(cmd)
+        if cmd.endswith('ls /sys/class/net'):
+            return "1  2  49-1  bridge_normal  eth0  lo\r\n"
+        if cmd == "cat /shared/logs":
+            return self.logs + "\r\n"
+        return ''
+
+    def wait_for_services(self, services, timeout=30, start=False):
+        self.cmds.append(('wait_for_services', services, start))
+        return self.services_active
+
+
+def switch_to_reset(fake):
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.switchd_failed = switch.cur_hw_failed = False
+    switch.tuntap_failed = False
+    switch.cli = switch.cliStdin = FakeProcess()
+    switch.cmd = fake.cmd
+    switch.wait_for_services = fake.wait_for_services
+    return switch
+
+
+def test_reset_waits_for_the_switch():
+    fake = FakeSwitch()
+    switch = switch_to_reset(fake)
+    assert switch.resetContainer()
+    assert switch.cliStdin.closed
+
+    deleted = [c.split()[-1] for c in fake.cmds
+               if isinstance(c, str) and 'link del' in c]
+    assert set(deleted) == set(['1', '2', '49-1'])
+
+    steps = [c for c in fake.cmds
+             if not isinstance(c, str) or 'ovsdb' in c or
+             'wait_for_openswitch' in c]
+    assert steps == ["systemctl stop ovsdb-server",
+                     "cp " + OVSDB_BOOT_SNAPSHOT + " " + OVSDB_FILE,
+                     ('wait_for_services', ['ovsdb-server'], True),
+                     "rm -f /shared/logs /shared/switchd "
+                     "/shared/switch_ready; /shared/wait_for_openswitch"]
+
+
+def test_reset_fails_if_not_ready():
+    fake = FakeSwitch(logs="Switchd Failure\r\nCUR_HW column: 1")
+    assert not switch_to_reset(fake).resetContainer()
+
+    fake = FakeSwitch(services_active=False)
+    assert not switch_to_reset(fake).resetContainer()
+    assert not [c for c in fake.cmds
+                if isinstance(c, str) and 'wait_for_openswitch' in c]
+
+
+def test_failed_switches_are_not_reset():
+    fake = FakeSwitch()
+    switch = switch_to_reset(fake)
+    switch.cur_hw_failed = True
+    assert not switch.resetContainer()
+    assert fake.cmds == []
+
+
+def test_concurrent_release(pool, fake_docker):
+    pool.size = 2
+
+    # All of them find room before any is reset.
+    def slow_reset():
+        time.sleep(0.1)
+        return True
+
+    nodes = [node_to_release(pool, fake_docker, slow_reset)
+             for i in range(8)]
+    results = runConcurrently(lambda node: node.releaseContainer(), nodes,
+                              len(nodes))
+    assert results.count(True) == 2
+    assert len(pool.idle[ContainerPool.key('img', [])]) == 2
+
+    pool.drain()
+    assert sorted(fake_docker.removed) == \
+        sorted(node.container_name
+               for node, released in zip(nodes, results) if released)
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+
+# Exercises the Docker Engine API client against a fake docker daemon
+# listening on a local unix socket, so that it can run without docker.
+
+import BaseHTTPServer
+import SocketServer
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+from StringIO import StringIO
+
+import pytest
+
+from opsvsi.dockerapi import *
+
+
+class FakeDockerHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # unix socket peers have no address to log
+    def address_string(self):
+        return 'fake-docker'
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def reply(self, status, body=None, raw=None):
+        data = raw if raw is not None else ''
+        if body is not None:
+            data = json.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.getheader('Content-Length') or 0)
+        body = self.rfile.read(length)
+        self.server.requests.append(('POST', self.path, body))
+        if self.path.startswith('/containers/create'):
+            config = json.loads(body)
+            if config['Image'] not in self.server.images:
+                self.reply(404, {'message': 'No such image'})
+                return
+            self.server.containers['c1'] = {'State': {'Pid': 0}}
+            self.reply(201, {'Id': 'c1' * 32})
+        elif self.path.startswith('/images/create'):
+            self.server.images.add('openswitch/genericx86-64')
+            self.reply(200, raw='{"status": "Downloaded"}\r\n')
+        elif self.path.startswith('/containers/'):
+            self.server.containers['c1']['State']['Pid'] = 1234
+            self.reply(204)
+
+    def do_GET(self):
+        self.server.requests.append(('GET', self.path, None))
+        if self.path.startswith('/events'):
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.flush()
+            event = self.server.next_event
+            if event is None:
+                # Hold the stream open without events
+                self.rfile.read()
+                return
+            self.server.containers['c1']['State'].update(event[1])
+            data = json.dumps({'status': event[0], 'id': 'c1'}) + '\n'
+            self.wfile.write('%x\r\n%s\r\n0\r\n\r\n' % (len(data), data))
+        elif self.path.startswith('/containers/json'):
+            self.reply(200, [{'Id': 'a' * 64, 'Image': 'img',
+                              'Status': 'Up', 'Names': ['/t_s1']}])
+        elif self.path.endswith('/json'):
+            self.reply(200, self.server.containers['c1'])
+        elif '/archive' in self.path:
+            out = StringIO()
+            archive = tarfile.open(fileobj=out, mode='w')
+            info = tarfile.TarInfo('server.crt')
+            info.size = len('CERT')
+            archive.addfile(info, StringIO('CERT'))
+            archive.close()
+            self.reply(200, raw=out.getvalue())
+
+    def do_DELETE(self):
+        self.server.requests.append(('DELETE', self.path, None))
+        self.reply(404, {'message': 'No such container'})
+
+
+class FakeDockerServer(SocketServer.ThreadingMixIn,
+                       SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        SocketServer.UnixStreamServer.__init__(self, path, FakeDockerHandler)
+        self.connections = 0
+        self.requests = []
+        self.images = set()
+        self.containers = {}
+        self.next_event = None
+
+
+@pytest.fixture
+def fake_docker():
+    tmpdir = tempfile.mkdtemp()
+    server = FakeDockerServer(os.path.join(tmpdir, 'docker.sock'))
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(tmpdir)
+
+
+def test_run_pulls_missing_image_over_one_connection(fake_docker):
+    client = DockerApiClient(fake_docker.server_address)
+    client.run_container('t_s1', 'openswitch/genericx86-64',
+                         cmd=['/sbin/init'], privileged=True,
+                         binds=['/tmp:/shared'])
+    assert client.inspect_container('t_s1')['State']['Pid'] == 1234
+    assert fake_docker.connections == 1
+
+    methods = [(m, p.split('?')[0]) for m, p, b in fake_docker.requests]
+    assert methods == [('POST', '/containers/create'),
+                       ('POST', '/images/create'),
+                       ('POST', '/containers/create'),
+                       ('POST', '/containers/' + 'c1' * 32 + '/start'),
+                       ('GET', '/containers/t_s1/json')]
+    config = json.loads(fake_docker.requests[0][2])
+    assert config['Cmd'] == ['/sbin/init']
+    assert config['HostConfig'] == {'Privileged': True,
+                                    'Binds': ['/tmp:/shared']}
+
+
+def test_start_from_checkpoint(fake_docker):
+    fake_docker.containers['c1'] = {'State': {'Pid': 0}}
+    client = DockerApiClient(fake_docker.server_address)
+    client.start_container('t_s1', checkpoint='booted',
+                           checkpoint_dir='/tmp/vsi-snapshots/0123')
+    client.start_container('t_s2')
+
+    method, path, body = fake_docker.requests[0]
+    assert (method, path.split('?')[0]) == ('POST', '/containers/t_s1/start')
+    params = dict(p.split('=') for p in path.split('?')[1].split('&'))
+    assert params == {'checkpoint': 'booted',
+                      'checkpoint-dir': '%2Ftmp%2Fvsi-snapshots%2F0123'}
+    assert fake_docker.requests[1][1] == '/containers/t_s2/start'
+
+
+def test_wait_for_container_start_event(fake_docker):
+    fake_docker.containers['c1'] = {'State': {'Pid': 0}}
+    fake_docker.next_event = ('start', {'Pid': 42})
+    client = DockerApiClient(fake_docker.server_address)
+    assert client.wait_for_container('t_s1', 5)['Pid'] == 42
+
+
+def test_wait_for_container_die_event(fake_docker):
+    fake_docker.containers['c1'] = {'State': {'Pid': 0}}
+    fake_docker.next_event = ('die', {'Status': 'exited', 'ExitCode': 1})
+    client = DockerApiClient(fake_docker.server_address)
+    with pytest.raises(ContainerStartError):
+        client.wait_for_container('t_s1', 5)
+
+
+def test_wait_for_container_deadline(fake_docker):
+    fake_docker.containers['c1'] = {'State': {'Pid': 0}}
+    client = DockerApiClient(fake_docker.server_address)
+    with pytest.raises(ContainerStartError):
+        client.wait_for_container('t_s1', 0.5)
+
+
+def test_remove_missing_container(fake_docker):
+    client = DockerApiClient(fake_docker.server_address)
+    assert client.remove_container('t_s1') is False
+
+
+def test_errors_are_raised(fake_docker):
+    client = DockerApiClient(fake_docker.server_address)
+    with pytest.raises(DockerApiError) as err:
+        client.request('DELETE', '/containers/t_s1')
+    assert err.value.status == 404
+    assert err.value.reason == 'No such container'
+
+
+def test_list_and_copy(fake_docker):
+    client = DockerApiClient(fake_docker.server_address)
+    containers = client.list_containers(name='t_s1')
+    assert 't_s1' in format_container_list(containers)
+
+    dest = os.path.join(os.path.dirname(fake_docker.server_address),
+                        'server.crt')
+    client.copy_from_container('t_s1', '/etc/ssl/certs/server.crt', dest)
+    assert open(dest).read() == 'CERT'
+
+
+def test_split_image_tag():
+    assert split_image_tag('openswitch/quagga') == ('openswitch/quagga',
+                                                    'latest')
+    assert split_image_tag('host:5000/ops:1.0') == ('host:5000/ops', '1.0')
+    assert split_image_tag('host:5000/ops') == ('host:5000/ops', 'latest')
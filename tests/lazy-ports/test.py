@@ -0,0 +1,95 @@
+#!/usr/bin/python
+
+# Checks the lazy port mode of VsiOpenSwitch on a switch whose container
+# and vtysh session are faked, so that it can run without docker.
+
+import pytest
+
+from opsvsi.opsvsitest import *
+
+
+class FakeFile(object):
+    def fileno(self):
+        return -1
+
+
+def make_switch(lazy=True, failing=False):
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.lazyPorts = lazy
+    switch.nameToIntf = {'1': None, '2': None}
+    switch.tuntapPorts = set()
+    switch.runningConfig = None
+    switch.cliStdin = switch.cliStdout = FakeFile()
+    switch.written = []
+    switch.batches = []
+
+    def tuntap_batch(ports):
+        switch.batches.append(list(ports))
+        return failing
+
+    switch.tuntap_batch = tuntap_batch
+    switch.writeCLI = lambda fd, inp: switch.written.append(inp)
+    switch.readCLI = lambda fd, buflen=1024, timeout=None: ''
+    return switch
+
+
+def test_interface_command_creates_the_port_once():
+    switch = make_switch()
+    for i in range(3):
+        switch.cmdCLI("interface 5")
+    switch.cmdCLI("interface 49-2")
+    switch.cmdCLI("  interface 5  ")
+
+    assert switch.batches == [['5'], ['49-2']]
+    assert switch.tuntapPorts == set(['5', '49-2'])
+    assert switch.written.count("interface 5") == 3
+
+
+def test_other_commands_create_nothing():
+    switch = make_switch()
+    for cmd in ("interface 1", "interface vlan 10", "interface lag 1",
+                "show interface 5", "no interface 7", "configure terminal"):
+        switch.cmdCLI(cmd)
+    assert switch.batches == []
+
+
+def test_ports_are_created_up_front_without_lazy_mode():
+    switch = make_switch(lazy=False)
+    switch.cmdCLI("interface 5")
+    assert switch.ensure_ports(['5', '6'])
+    assert switch.batches == []
+
+
+def test_ensure_ports_batches_the_missing_ones():
+    switch = make_switch()
+    assert switch.ensure_ports([1, 3, '4', 3, 4])
+    assert switch.ensure_ports([3, 4])
+    assert switch.ensure_port('4')
+    assert switch.batches == [['3', '4']]
+
+
+def test_failed_ports_are_retried():
+    switch = make_switch(failing=True)
+    assert not switch.ensure_port('5')
+    assert not switch.ensure_port('5')
+    assert switch.batches == [['5'], ['5']]
+    assert switch.tuntapPorts == set()
+
+
+def test_cli_batch_creates_the_ports():
+    switch = make_switch()
+    switch.read = []
+
+    # A prompt for every command written so far.
+    def read(fd, buflen=1024, timeout=None):
+        count = len(switch.written) - len(switch.read)
+        switch.read.extend(switch.written[len(switch.read):])
+        return chr(127) * count
+
+    switch.readCLIRaw = read
+    results = switch.cmdCLI_batch(["configure terminal", "interface 7",
+                                   "no shutdown", "interface 7", "exit",
+                                   "interface 8"])
+    assert len(results) == 6
+    assert switch.batches == [['7'], ['8']]
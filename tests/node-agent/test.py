@@ -0,0 +1,97 @@
+#!/usr/bin/python
+
+# Runs the in-container command agent locally and drives it with the
+# AgentClient, and checks the node fallback to its shell, so that it can
+# run without docker.
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import pytest
+
+from opsvsi.agent import *
+from opsvsi.docker import DockerNode, DockerApiError
+
+
+@pytest.fixture
+def agent_sock():
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'vsi_agent.sock')
+    agent = subprocess.Popen([sys.executable, AGENT_SCRIPT, path])
+    yield path
+    agent.kill()
+    agent.wait()
+    shutil.rmtree(tmpdir)
+
+
+def test_separate_status_stdout_stderr(agent_sock):
+    client = AgentClient(agent_sock)
+    status, out, err = client.run("echo out; echo err >&2; exit 3", 10)
+    assert (status, out, err) == (3, "out\n", "err\n")
+    client.close()
+
+
+def test_concurrent_commands(agent_sock):
+    client = AgentClient(agent_sock)
+    start = time.time()
+    results = client.runAll(["sleep 1; echo %d" % i for i in range(5)], 10)
+    assert time.time() - start < 3
+    assert [out for status, out, err in results] == \
+        ["%d\n" % i for i in range(5)]
+    client.close()
+
+
+def test_binary_output(agent_sock):
+    client = AgentClient(agent_sock)
+    status, out, err = client.run("printf '\\177\\000\\n'", 10)
+    assert out == "\x7f\x00\n"
+    client.close()
+
+
+def test_restart_replaces_previous_agent(agent_sock):
+    AgentClient(agent_sock).close()
+    old_pid = int(open(agent_sock + '.pid').read())
+    os.unlink(agent_sock)
+    agent = subprocess.Popen([sys.executable, AGENT_SCRIPT, agent_sock])
+    try:
+        client = AgentClient(agent_sock)
+        assert client.run("echo ok", 10) == (0, "ok\n", "")
+        assert int(open(agent_sock + '.pid').read()) == agent.pid
+        client.close()
+    finally:
+        agent.kill()
+        agent.wait()
+    assert old_pid != agent.pid
+
+
+class FailingDocker(object):
+    def exec_detached(self, container, cmd):
+        raise DockerApiError(500, "exec failed")
+
+
+def test_node_falls_back_to_the_shell():
+    node = DockerNode.__new__(DockerNode)
+    node.container_name = 'test-s1'
+    node.shareddir = tempfile.mkdtemp()
+    node.bootTimes = OrderedDict()
+    node.docker = FailingDocker()
+    node.cmds = []
+
+    def cmd(command):
+        node.cmds.append(command)
+        return "0" if command == "echo $?" else "out\n"
+
+    node.cmd = cmd
+    try:
+        node.startAgent()
+    finally:
+        shutil.rmtree(node.shareddir)
+    assert node.agent is None
+    assert 'agent' in node.bootTimes
+    assert node.execCmd("true") == (0, "out\n", '')
+    assert node.cmds == ["true", "echo $?"]
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+# Feeds canned runtime_CLI outputs to VsiOpenSwitch.p4_port_add, with the
+# node shell faked, so that it can run without docker.
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+import opsvsi.opsvsitest
+from opsvsi.opsvsitest import *
+
+BANNER = "Obtaining JSON from switch...\r\nDone\r\n" \
+         "Control utility for runtime P4 table manipulation\r\n"
+
+
+@pytest.fixture
+def errors(monkeypatch):
+    errors = []
+    monkeypatch.setattr(opsvsi.opsvsitest, 'error', errors.append)
+    return errors
+
+
+@pytest.fixture
+def switch():
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.shareddir = tempfile.mkdtemp()
+    switch.cmds = []
+    yield switch
+    shutil.rmtree(switch.shareddir)
+
+
+def fake_cmd(switch, output):
+    def cmd(command):
+        switch.cmds.append(command)
+        return output
+    switch.cmd = cmd
+
+
+def test_all_ports_added(switch, errors):
+    # A prompt per command, and one more at the end of the input.
+    fake_cmd(switch, BANNER + "RuntimeCmd: " * 4 + "\r\n")
+    assert switch.p4_port_add(['1', '2', '3']) == []
+
+    batch = open(os.path.join(switch.shareddir, 'p4_port_add')).read()
+    assert batch == "port_add 1 0\nport_add 2 1\nport_add 3 2\n"
+    assert switch.cmds == [NS_EXEC + P4_RUNTIME_CLI +
+                           " < /shared/p4_port_add"]
+    assert errors == []
+
+
+def test_failed_port(switch, errors):
+    fake_cmd(switch, BANNER + "RuntimeCmd: "
+             "RuntimeCmd: Error: Port 2 already in use\r\n"
+             "RuntimeCmd: RuntimeCmd: \r\n")
+    assert switch.p4_port_add(['1', '2', '3']) == ['2']
+    assert errors == ["P4 port_add 2 failed: Error: Port 2 already in "
+                      "use\n"]
+
+
+def test_invalid_command(switch):
+    fake_cmd(switch, BANNER + "RuntimeCmd: Invalid port number\r\n"
+             "RuntimeCmd: RuntimeCmd: \r\n")
+    assert switch.p4_port_add(['1', '2']) == ['1']
+
+
+def test_cli_exits_early(switch, errors):
+    # No prompt for the ports after the first: runtime_CLI died.
+    fake_cmd(switch, BANNER + "RuntimeCmd: \r\nTraceback (most recent "
+             "call last):\r\n")
+    assert switch.p4_port_add(['1', '2', '3']) == ['2', '3']
+    assert errors[-1] == "P4 port_add 3 failed: no result\n"
+
+
+def test_no_ports(switch):
+    fake_cmd(switch, '')
+    assert switch.p4_port_add([]) == []
+    assert switch.cmds == []
@@ -0,0 +1,146 @@
+#!/usr/bin/python
+
+# Tears down a network of fake nodes with deleteLinks and parallelStop,
+# recording the commands they get, so that it can run without docker.
+
+import threading
+import time
+
+from opsvsi.opsvsitest import *
+
+
+class Recorder(object):
+    lock = threading.Lock()
+    calls = []
+
+    def record(self, call):
+        with Recorder.lock:
+            Recorder.calls.append((self.name, call))
+
+
+def make_node(cls, name):
+    node = cls.__new__(cls)
+    node.name = name
+    node.intfs = []
+    node.cmd = lambda cmd: Recorder.record(node, cmd)
+    node.delIntf = lambda intf: Recorder.record(node, 'del ' + intf.name)
+    node.stop = lambda: Recorder.record(node, 'stop')
+    node.terminate = lambda: Recorder.record(node, 'terminate')
+    return node
+
+
+class FakeHost(Recorder):
+    pass
+
+
+class FakeSwitch(VsiOpenSwitch, Recorder):
+    pass
+
+
+class FakeIntf(object):
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+
+
+class FakeLink(object):
+    def __init__(self, node1, name1, node2, name2):
+        self.intf1 = FakeIntf(node1, name1)
+        self.intf2 = FakeIntf(node2, name2)
+
+
+class FakeController(Recorder):
+    name = 'c0'
+
+    def stop(self):
+        self.record('stop')
+
+
+class FakeNet(object):
+    def __init__(self, hosts, switches, links):
+        self.hosts = hosts
+        self.switches = switches
+        self.links = links
+        self.controllers = [FakeController()]
+        self.terms = []
+
+
+def topology():
+    Recorder.calls = []
+    h1, h2 = [make_node(FakeHost, 'h%d' % i) for i in (1, 2)]
+    s1, s2 = [make_node(FakeSwitch, 's%d' % i) for i in (1, 2)]
+    links = [FakeLink(h1, 'h1-eth0', s1, '1'),
+             FakeLink(s1, '2', h2, 'h2-eth0'),
+             FakeLink(h1, 'h1-eth1', s2, '1'),
+             FakeLink(s1, '3', s2, '2')]
+    return FakeNet([h1, h2], [s1, s2], links)
+
+
+def cmds(name):
+    return [call for node, call in Recorder.calls
+            if node == name and not call.startswith('del ')]
+
+
+def test_delete_links():
+    net = topology()
+    links = list(net.links)
+    deleteLinks(net.links)
+
+    # One batch per node, from the end outside of the switch namespace
+    # when there is one.
+    assert cmds('h1') == ["printf 'link del h1-eth0\\nlink del h1-eth1\\n' "
+                          "| /sbin/ip -force -batch -"]
+    assert cmds('h2') == ["printf 'link del h2-eth0\\n' "
+                          "| /sbin/ip -force -batch -"]
+    assert cmds('s1') == []
+    assert cmds('s2') == ["printf 'link del 2\\n' | %s/sbin/ip -force "
+                          "-batch -" % NS_EXEC]
+
+    # Both ends are dropped from their nodes.
+    assert sorted(call for node, call in Recorder.calls
+                  if node == 's1' and call.startswith('del ')) == \
+        ['del 1', 'del 2', 'del 3']
+    assert all(link.intf1 is None and link.intf2 is None for link in links)
+
+
+def test_parallel_stop():
+    net = topology()
+    times = parallelStop(net)
+
+    assert sorted(times) == ['controllers', 'links', 'nodes']
+    assert all(t >= 0 for t in times.values())
+    assert ('c0', 'stop') in Recorder.calls
+    for switch in ('s1', 's2'):
+        assert cmds(switch)[-2:] == ['stop', 'terminate']
+    for host in ('h1', 'h2'):
+        assert cmds(host)[-1] == 'terminate'
+        assert 'stop' not in cmds(host)
+
+
+def test_nodes_stop_concurrently():
+    net = topology()
+
+    def slow_terminate(node):
+        time.sleep(0.3)
+        Recorder.record(node, 'terminate')
+
+    for node in net.hosts + net.switches:
+        node.terminate = lambda node=node: slow_terminate(node)
+    start = time.time()
+    times = parallelStop(net)
+    assert time.time() - start < 0.6
+    assert 0.3 <= times['nodes'] < 0.6
+
+
+def test_stop_net_keeps_the_network_teardown():
+    class PlainNet(object):
+        stopped = False
+
+        def stop(self):
+            self.stopped = True
+
+    test = OpsVsiTest.__new__(OpsVsiTest)
+    test.net = PlainNet()
+    test.stopNet()
+    assert test.net.stopped
+    assert test.stop_times is None
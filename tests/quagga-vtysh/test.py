@@ -0,0 +1,118 @@
+#!/usr/bin/python
+
+# Drives the persistent vtysh session of QuaggaSwitch against a fake vtysh
+# behind a pair of pipes, so that it can run without docker.
+
+import os
+import threading
+import time
+
+import pytest
+
+from opsvsi.quagga import *
+from opsvsiutils.vtyshutils import SwitchVtyshUtils, VTYSH_CR
+
+BANNER = "\nHello, this is Quagga (version 0.99.24.1).\n" \
+         "Copyright 1996-2005 Kunihiro Ishiguro, et al.\n\n"
+
+CONTEXTS = {'configure terminal': '(config)',
+            'router bgp 1': '(config-router)',
+            'end': ''}
+
+
+# Answers like vtysh without a terminal: the command echoed back by
+# readline, its output and the prompt of the current context, written in
+# small pieces so that the prompt is split across reads.
+def fake_vtysh(stdin, stdout):
+    def write(data):
+        for i in range(0, len(data), 5):
+            os.write(stdout, data[i:i + 5])
+            time.sleep(0.001)
+
+    context = ''
+    write(BANNER + "quagga# ")
+    for line in iter(stdin.readline, ''):
+        cmd = line.strip()
+        if cmd == 'hang':
+            continue
+        if cmd == 'exit':
+            break
+        context = CONTEXTS.get(cmd, context)
+        if cmd.startswith('show'):
+            output = "BGP table version is 0\nquagga# not a prompt\n"
+        else:
+            output = ''
+        write("%s\n%squagga%s# " % (cmd, output, context))
+    os.close(stdout)
+
+
+@pytest.fixture
+def switch():
+    cmd_read, cmd_write = os.pipe()
+    out_read, out_write = os.pipe()
+    vtysh = threading.Thread(target=fake_vtysh,
+                             args=(os.fdopen(cmd_read), out_write))
+    vtysh.daemon = True
+    vtysh.start()
+
+    switch = QuaggaSwitch.__new__(QuaggaSwitch)
+    switch.name = 'q1'
+    switch.cliTimeout = 10
+    switch.runningConfig = None
+    switch.cli = object()
+    switch.cliStdin = os.fdopen(cmd_write, 'w')
+    switch.cliStdout = os.fdopen(out_read)
+    yield switch
+    switch.cliStdin.close()
+    vtysh.join()
+    switch.cliStdout.close()
+
+
+def test_prompt():
+    assert atQuaggaPrompt("quagga# ")
+    assert atQuaggaPrompt(BANNER + "quagga# ")
+    assert atQuaggaPrompt("output\nbgpd(config-router)# ")
+    assert atQuaggaPrompt(bytearray("output\nq-1.lab> "))
+    assert not atQuaggaPrompt("quagga# \n")
+    assert not atQuaggaPrompt("quag")
+    assert not atQuaggaPrompt("output\nquagga# not a prompt")
+
+
+def test_banner_and_commands(switch):
+    # What startCLI() does once vtysh is running.
+    assert switch.readCLI(switch.cliStdout.fileno()) == BANNER
+    assert switch.cmdCLI("terminal length 0") == ''
+    assert switch.cmdCLI("show ip bgp") == \
+        "BGP table version is 0\nquagga# not a prompt\n"
+
+
+def test_config_context_prompts(switch):
+    switch.readCLI(switch.cliStdout.fileno())
+    switch.runningConfig = object()
+    for cmd in ["configure terminal", "router bgp 1", "neighbor 1.1.1.1",
+                "end"]:
+        assert switch.cmdCLI(cmd) == ''
+    assert switch.runningConfig is None
+    assert switch.cmdCLI("show running-config") != ''
+
+
+def test_vtysh_cmd_line_endings(switch):
+    switch.readCLI(switch.cliStdout.fileno())
+    assert SwitchVtyshUtils.vtysh_cmd(switch, "show ip bgp") == \
+        "BGP table version is 0" + VTYSH_CR + "quagga# not a prompt" + \
+        VTYSH_CR
+
+
+def test_timeout(switch):
+    switch.readCLI(switch.cliStdout.fileno())
+    start = time.time()
+    with pytest.raises(CLITimeoutError):
+        switch.cmdCLI("hang", timeout=0.5)
+    assert 0.5 <= time.time() - start < 1.5
+
+
+def test_vtysh_exits(switch):
+    switch.readCLI(switch.cliStdout.fileno())
+    with pytest.raises(CLITimeoutError) as e:
+        switch.cmdCLI("exit")
+    assert "vtysh exited" in str(e.value)
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+
+# Drives the AsyncRestClient against two local stand-in restd servers, so
+# that it can run without switches.
+
+import time
+
+import pytest
+
+from opsvsiutils.restutils import utils
+from opsvsiutils.restutils.asyncclient import *
+
+
+@pytest.fixture
+def servers(rest_servers):
+    httpds = [rest_servers(latency=0.05) for i in range(2)]
+    for i, httpd in enumerate(httpds):
+        for port in range(20):
+            name = 'Port%d' % port
+            httpd.objects['/rest/v1/system/ports/' + name] = \
+                {'configuration': {'name': name, 'switch': i}}
+        for vlan in range(1, 11):
+            name = 'VLAN%d' % vlan
+            httpd.objects['/rest/v1/system/bridges/bridge_normal/vlans/' +
+                          name] = {'configuration': {'name': name,
+                                                     'id': vlan}}
+    return httpds
+
+
+def test_futures(servers):
+    ip = servers[0].address
+    with AsyncRestClient() as client:
+        futures = [client.query_object(ip, '/rest/v1/system/ports/Port%d' % i)
+                   for i in range(20)]
+        start = time.time()
+        ports = gather(futures)
+        # All in flight at once, not one 50ms reply after the other.
+        assert time.time() - start < 0.5
+        assert [p['configuration']['name'] for p in ports] == \
+            ['Port%d' % i for i in range(20)]
+
+        cookie_header = wait_result(client.login(ip))
+        status, data = wait_result(client.execute_request(
+            '/rest/v1/system', 'GET', None, ip, xtra_header=cookie_header))
+        assert status == 200
+
+        with pytest.raises(AssertionError):
+            gather([client.query_object(ip, '/rest/v1/system/missing')])
+
+
+def test_query_collections(servers):
+    ips = [httpd.address for httpd in servers]
+    paths = ['/rest/v1/system/ports',
+             '/rest/v1/system/bridges/bridge_normal/vlans']
+    with AsyncRestClient() as client:
+        collections = client.query_collections(ips, paths)
+        for i, ip in enumerate(ips):
+            ports = collections[ip]['/rest/v1/system/ports']
+            assert len(ports) == 20
+            assert all(p['configuration']['switch'] == i for p in ports)
+            vlans = collections[ip][paths[1]]
+            assert sorted(v['configuration']['id'] for v in vlans) == \
+                range(1, 11)
+
+        start = time.time()
+        collections = client.query_collections(ips, paths, depth=0)
+        # The collections, then all of their objects: two rounds.
+        assert time.time() - start < 0.5
+        ports = collections[ips[1]]['/rest/v1/system/ports']
+        assert ports['/rest/v1/system/ports/Port7']['configuration'] == \
+            {'name': 'Port7', 'switch': 1}
+        assert len(collections[ips[0]][paths[1]]) == 10
+
+
+def test_pool_size_is_restored(rest_client):
+    maxsize = utils.rest_pool.maxsize
+    with AsyncRestClient(workers=maxsize + 8):
+        assert utils.rest_pool.maxsize == maxsize + 8
+    assert utils.rest_pool.maxsize == maxsize
+
+    client = AsyncRestClient(workers=1)
+    assert utils.rest_pool.maxsize == maxsize
+    client.close()
+    assert utils.rest_pool.maxsize == maxsize
+
+
+def test_overlapping_clients(rest_client):
+    maxsize = utils.rest_pool.maxsize
+    a = AsyncRestClient(workers=maxsize + 8)
+    b = AsyncRestClient(workers=maxsize + 16)
+    assert utils.rest_pool.maxsize == maxsize + 16
+    a.close()
+    assert utils.rest_pool.maxsize == maxsize + 16
+    b.close()
+    assert utils.rest_pool.maxsize == maxsize
+
+    a = AsyncRestClient(workers=maxsize + 8)
+    b = AsyncRestClient(workers=maxsize + 16)
+    b.close()
+    assert utils.rest_pool.maxsize == maxsize + 8
+    a.close()
+    a.close()
+    assert utils.rest_pool.maxsize == maxsize
+
+
+def test_idle_connections_above_the_size_are_closed(servers):
+    ip = servers[0].address
+    maxsize = utils.rest_pool.maxsize
+    with AsyncRestClient(workers=maxsize + 4) as client:
+        gather([client.query_object(ip, '/rest/v1/system/ports/Port%d' % i)
+                for i in range(maxsize + 4)])
+        assert max(len(conns) for conns in
+                   utils.rest_pool.idle.values()) > maxsize
+    assert max(len(conns) for conns in
+               utils.rest_pool.idle.values()) == maxsize
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+
+# Runs the REST benchmark, and the restutils helpers, against the local
+# stand-in restd so that it can run without a switch.
+
+import json
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from opsvsiutils.restutils.benchmark import *
+
+
+def port_data(number):
+    data = dict(PORT_DATA)
+    data['configuration'] = dict(PORT_DATA['configuration'],
+                                 name='Port%d' % number)
+    return data
+
+
+def test_helpers_against_stand_in(rest_server):
+    assert create_test_ports(rest_server.address, 10) == httplib.CREATED
+    ports = query_object(rest_server.address, '/rest/v1/system/ports')
+    assert len(ports) == 10
+    update_test_field(rest_server.address, '/rest/v1/system/ports/Port3',
+                      'admin', 'down')
+    port = query_object(rest_server.address, '/rest/v1/system/ports/Port3')
+    assert port['configuration']['admin'] == 'down'
+
+
+def test_benchmark_mix(rest_server):
+    operations = [RestOperation('GET', '/rest/v1/system', weight=3),
+                  RestOperation('POST', '/rest/v1/system/ports',
+                                data=port_data, name='port'),
+                  RestOperation('GET', '/rest/v1/system/missing',
+                                name='missing', weight=0.5)]
+    benchmark = RestBenchmark(rest_server.address, operations, concurrency=4,
+                              requests=200)
+    report = benchmark.run()
+
+    assert report['count'] == 200
+    ops = report['operations']
+    assert sum(op['count'] for op in ops.values()) == 200
+    assert ops['GET /rest/v1/system']['errors'] == 0
+    assert ops['POST port']['statuses'] == {'201': ops['POST port']['count']}
+    assert ops['GET missing']['errors'] == ops['GET missing']['count'] > 0
+    assert report['errors'] == ops['GET missing']['count']
+    assert report['throughput'] > 0
+
+    latency = report['latency_ms']
+    assert latency['min'] <= latency['p50'] <= latency['p95'] <= \
+        latency['p99'] <= latency['max']
+    assert sum(report['histogram_ms'].values()) == 200
+
+    testdir = tempfile.mkdtemp()
+    try:
+        path = benchmark.save(testdir)
+        assert json.load(open(path))['count'] == 200
+    finally:
+        shutil.rmtree(testdir)
+
+
+def test_benchmark_rate_and_duration(rest_server):
+    rest_server.latency = 0.01
+    operations = [RestOperation('GET', '/rest/v1/system')]
+    report = RestBenchmark(rest_server.address, operations, concurrency=4,
+                           rate=50, duration=1).run()
+    # Paced at 50 requests/s over a second.
+    assert 45 <= report['count'] <= 55
+    assert report['latency_ms']['p50'] >= 10
+
+
+def test_stand_in(rest_server):
+    rest_server.session_max_age = 600
+    cookie_header = login(rest_server.address)
+    assert 'Max-Age=600' in cookie_header['Cookie']
+    assert create_test_ports(rest_server.address, 3, cookie_header) == \
+        httplib.CREATED
+
+    # Collections list their URIs, or their objects with a depth.
+    assert query_object(rest_server.address, '/rest/v1/system/ports',
+                        cookie_header) == \
+        ['/rest/v1/system/ports/Port%d' % i for i in range(3)]
+    ports = query_object(rest_server.address,
+                         '/rest/v1/system/ports?depth=1', cookie_header)
+    assert [p['configuration']['name'] for p in ports] == \
+        ['Port%d' % i for i in range(3)]
+    assert rest_server.requests[-1] == ('GET',
+                                        '/rest/v1/system/ports?depth=1')
+    assert rest_server.logins == 1
+
+    # Like a restart of restd.
+    rest_server.sessions.clear()
+    status, data = execute_request('/rest/v1/system', 'GET', None,
+                                   rest_server.address,
+                                   xtra_header=cookie_header)
+    assert status == httplib.UNAUTHORIZED
+
+
+def test_benchmark_duration_unpaced(rest_server):
+    rest_server.latency = 0.01
+    operations = [RestOperation('GET', '/rest/v1/system')]
+    start = time.time()
+    report = RestBenchmark(rest_server.address, operations, concurrency=2,
+                           duration=0.5).run()
+    assert 0.5 <= time.time() - start < 1
+    assert report['count'] > 10
+
+
+def test_benchmark_rate_counts_queueing(rest_server):
+    # One request at a time taking 200ms, due every 100ms.
+    rest_server.latency = 0.2
+    operations = [RestOperation('GET', '/rest/v1/system')]
+    report = RestBenchmark(rest_server.address, operations, concurrency=1,
+                           rate=10, duration=0.5).run()
+    assert report['count'] == 5
+    assert 200 <= report['service_time_ms']['max'] < 300
+    # Each request waits 100ms longer than the previous one.
+    assert report['latency_ms']['max'] >= 550
+    assert report['latency_ms']['p95'] > 2 * report['service_time_ms']['p95']
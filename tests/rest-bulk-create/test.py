@@ -0,0 +1,78 @@
+#!/usr/bin/python
+
+# Drives the bulk creation helpers against the local stand-in restd, so
+# that it can run without a switch.
+
+import socket
+
+import pytest
+
+from opsvsiutils.restutils import utils
+from opsvsiutils.restutils.utils import *
+from opsvsiutils.restutils.fakes import *
+
+
+@pytest.fixture
+def server(rest_server):
+    # Already there, its creation fails.
+    rest_server.objects['/rest/v1/system/ports/Port-13'] = {}
+    return rest_server
+
+
+# The names of the objects in the collection at path.
+def posted(server, path):
+    return [uri.rpartition('/')[2] for uri in server.objects
+            if uri.rpartition('/')[0] == path]
+
+
+def test_create_test_ports(server):
+    assert create_test_ports(server.address, 200) == 201
+    vlans = posted(server, '/rest/v1/system/bridges/bridge_normal/vlans')
+    assert sorted(vlans) == ['VLAN413', 'VLAN654']
+    ports = posted(server, '/rest/v1/system/ports')
+    assert sorted(ports) == sorted(['Port-13'] +
+                                   ['Port%d' % i for i in range(200)])
+    assert server.connections <= REST_BULK_WORKERS
+    # The port data template is left alone.
+    assert PORT_DATA['configuration']['name'] == 'Port1'
+
+
+def test_bulk_result(server):
+    objects = [('Port-%d' % i, '{"configuration": {"name": "Port-%d"}}' % i)
+               for i in range(20)]
+    result = bulk_create(server.address, '/rest/v1/system/ports', objects,
+                         workers=4)
+    assert len(result.results) == 20
+    assert [r[0] for r in result.results] == [o[0] for o in objects]
+    assert len(result.created) == 19
+    assert [(name, status) for name, status, data in result.failed] == \
+        [('Port-13', 400)]
+    assert result.rate > 0
+
+
+def test_request_exception(server, monkeypatch):
+    session_request = utils.session_request
+
+    def failing_request(path, http_method, data, ip, **kwargs):
+        if '"Port7"' in data:
+            raise socket.error('connection reset')
+        return session_request(path, http_method, data, ip, **kwargs)
+
+    monkeypatch.setattr(utils, 'session_request', failing_request)
+    with pytest.raises(socket.error):
+        create_test_ports(server.address, 20)
+    # The others still went through.
+    assert len(posted(server, '/rest/v1/system/ports')) == 20
+
+
+def test_fakes(server):
+    result = create_fake_vlans('/rest/v1/system/bridges/bridge_normal/vlans',
+                               server.address,
+                               [('VLAN%d' % i, i) for i in range(1, 51)])
+    assert len(result.created) == 50
+    create_fake_bridges('/rest/v1/system/bridges', server.address,
+                        ['br%d' % i for i in range(10)])
+    assert server.requests.count(('POST', '/rest/v1/system/bridges')) == 10
+    with pytest.raises(AssertionError):
+        create_fake_ports('/rest/v1/system/ports', server.address, range(20))
+    assert server.requests.count(('POST', '/rest/v1/system/ports')) == 20
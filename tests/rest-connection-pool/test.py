@@ -0,0 +1,116 @@
+#!/usr/bin/python
+
+# Drives execute_request against the local stand-in restd, so that it can
+# run without a switch.
+
+import json
+import socket
+
+import pytest
+
+from opsvsiutils.restutils import utils
+from opsvsiutils.restutils.utils import *
+
+
+@pytest.fixture
+def server(rest_server):
+    rest_server.cookie_header = login(rest_server.address)
+    return rest_server
+
+
+def get(server, path, full_response=False, xtra_header={}):
+    return execute_request(path, 'GET', None, server.address, full_response,
+                           dict(server.cookie_header, **xtra_header))
+
+
+def test_keep_alive(server):
+    for i in range(20):
+        status, data = get(server, '/rest/v1/system/ports/Port%d' % i)
+        assert status == 404
+    assert [r for r in server.requests if r[1] != LOGIN_URI] == \
+        [('GET', '/rest/v1/system/ports/Port%d' % i) for i in range(20)]
+    assert server.connections == 1
+
+
+def test_full_response(server):
+    response, data = get(server, '/rest/v1/system', True)
+    assert response.status == 200
+    assert response.getheader('content-length') == str(len(data))
+
+
+def test_connection_close(server):
+    get(server, '/rest/v1/system', xtra_header={'Connection': 'close'})
+    get(server, '/rest/v1/system', xtra_header={'Connection': 'close'})
+    get(server, '/rest/v1/system')
+    assert server.connections == 3
+
+
+def test_context_is_cached(server):
+    assert get_ssl_context() is get_ssl_context()
+
+
+def test_stale_connection_is_replaced(server):
+    get(server, '/rest/v1/system')
+    # Close the pooled connection behind the pool's back, like a server
+    # timing out an idle connection.
+    for conns in utils.rest_pool.idle.values():
+        for conn in conns:
+            conn.sock.shutdown(socket.SHUT_RDWR)
+    status, data = get(server, '/rest/v1/system')
+    assert status == 200
+    assert server.connections == 2
+
+
+class DroppedConnection(object):
+    """
+    A pooled connection that looks alive, but drops before the reply, as
+    when the switch closes it just as the request goes out.
+    """
+
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.requests = []
+
+    def request(self, method, url, data, headers):
+        self.requests.append((method, url))
+
+    def getresponse(self):
+        raise httplib.BadStatusLine('')
+
+    def close(self):
+        self.sock.close()
+        self.peer.close()
+
+
+def pool_dropped_connection(server):
+    conn = DroppedConnection()
+    ip, port = server.address.split(':')
+    utils.rest_pool.idle[(ip, int(port))] = [conn]
+    return conn
+
+
+def test_idempotent_request_is_retried(server):
+    conn = pool_dropped_connection(server)
+    status, data = get(server, '/rest/v1/system')
+    assert status == 200
+    assert conn.requests == [('GET', '/rest/v1/system')]
+
+
+def test_post_is_not_retried_once_sent(server):
+    conn = pool_dropped_connection(server)
+    with pytest.raises(httplib.BadStatusLine):
+        execute_request('/rest/v1/system/ports', 'POST',
+                        json.dumps(PORT_DATA), server.address,
+                        xtra_header=server.cookie_header)
+    assert conn.requests == [('POST', '/rest/v1/system/ports')]
+    assert ('POST', '/rest/v1/system/ports') not in server.requests
+
+
+def test_closed_connection_is_not_used(server):
+    conn = pool_dropped_connection(server)
+    conn.peer.close()
+    status, data = execute_request('/rest/v1/system/ports', 'POST',
+                                   json.dumps(PORT_DATA), server.address,
+                                   xtra_header=server.cookie_header)
+    assert status == 201
+    assert conn.requests == []
@@ -0,0 +1,55 @@
+#!/usr/bin/python
+
+# Drives the restutils session cache against the local stand-in restd,
+# so that it can run without a switch.
+
+import time
+
+import pytest
+
+from opsvsiutils.restutils.utils import *
+
+
+@pytest.fixture
+def server(rest_server):
+    rest_server.session_max_age = 3600
+    return rest_server
+
+
+def test_login_once(server):
+    for i in range(10):
+        query_object(server.address, '/rest/v1/system')
+    assert server.logins == 1
+    assert get_session(server.address) is \
+        get_session(server.address, DEFAULT_USER)
+
+
+def test_relogin_on_unauthorized(server):
+    query_object(server.address, '/rest/v1/system')
+    # The switch forgets the session, e.g. after a restart of restd.
+    server.sessions.clear()
+    query_object(server.address, '/rest/v1/system')
+    assert server.logins == 2
+
+
+def test_relogin_on_expiry(server):
+    server.session_max_age = REST_SESSION_MARGIN - 1
+    query_object(server.address, '/rest/v1/system')
+    query_object(server.address, '/rest/v1/system')
+    assert server.logins == 2
+
+
+def test_explicit_cookie_is_used_as_is(server):
+    cookie_header = login(server.address)
+    assert create_test_ports(server.address, 3, cookie_header) == 201
+    assert server.logins == 1
+
+    server.sessions.clear()
+    assert create_test_ports(server.address, 3, cookie_header) == 401
+
+
+def test_cookie_expiry():
+    assert cookie_expiry('user=1') is None
+    assert cookie_expiry('user=1; Path=/; Expires=Thu, 01 Jan 2037 '
+                         '00:00:00 GMT') == 2114380800
+    assert 99 < cookie_expiry('user=1; max-age=100') - time.time() <= 100
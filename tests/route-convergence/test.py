@@ -0,0 +1,130 @@
+#!/usr/bin/python
+
+# Drives SwitchVtyshUtils.wait_for_routes against fake switches whose BGP
+# tables change from one poll to the next, no switch needed.
+
+import threading
+import time
+
+import pytest
+
+import opsvsiutils.vtyshutils
+from opsvsiutils.vtyshutils import *
+
+TABLE_HEADER = """\
+BGP table version is 0, local router ID is 9.0.0.1\r
+   Network          Next Hop            Metric LocPrf Weight Path\r
+"""
+
+ROUTES = {
+    '10.0.0.0/8': "*> 10.0.0.0/8       20.0.0.2                 0"
+                  "             0 2 1 i\r\n",
+    '11.0.0.0/8': "*> 11.0.0.0/8       20.0.0.2                 0"
+                  "             0 2 i\r\n",
+    '2001:db8:0:1::/64': "*> 2001:db8:0:1::/64\r\n"
+                         "                    2001:db8:0:12::2\r\n"
+                         "                                             0"
+                         "             0 2 i\r\n",
+}
+
+
+class FakeSwitch(object):
+    """
+    Answers 'sh ip bgp' and 'sh ipv6 bgp' through the vtysh -c path. Each
+    route is in the table from the poll given in 'appear' (counting from
+    1) and until the poll given in 'gone', if any.
+    """
+
+    def __init__(self, name, appear={}, gone={}):
+        self.name = name
+        self.appear = appear
+        self.gone = gone
+        self.polls = {'sh ip bgp': 0, 'sh ipv6 bgp': 0}
+        self.lock = threading.Lock()
+
+    def cmd(self, cmd):
+        show = cmd.split('"')[1]
+        with self.lock:
+            self.polls[show] += 1
+            poll = self.polls[show]
+        table = TABLE_HEADER
+        for prefix, line in ROUTES.items():
+            if (':' in prefix) != (show == 'sh ipv6 bgp'):
+                continue
+            if self.appear.get(prefix, 1) <= poll < \
+                    self.gone.get(prefix, poll + 1):
+                table += line
+        return table
+
+
+@pytest.fixture
+def intervals(monkeypatch):
+    intervals = []
+
+    def sleep(seconds):
+        intervals.append(seconds)
+        time.sleep(seconds)
+
+    monkeypatch.setattr(opsvsiutils.vtyshutils, 'sleep', sleep)
+    return intervals
+
+
+def test_returns_once_the_routes_are_present(intervals):
+    s1 = FakeSwitch('s1', appear={'10.0.0.0/8': 3})
+    converged, elapsed = SwitchVtyshUtils.wait_for_routes(
+        [(s1, '10.0.0.0/8', '20.0.0.2')], timeout=10)
+    assert converged
+    assert s1.polls == {'sh ip bgp': 3, 'sh ipv6 bgp': 0}
+    # Backing off while nothing changes.
+    assert intervals == [2 * ROUTE_MIN_POLL_INTERVAL,
+                         4 * ROUTE_MIN_POLL_INTERVAL]
+    assert elapsed >= sum(intervals)
+
+
+def test_polls_fast_while_routes_show_up(intervals):
+    s1 = FakeSwitch('s1', appear={'10.0.0.0/8': 3, '11.0.0.0/8': 4})
+    converged, elapsed = SwitchVtyshUtils.wait_for_routes(
+        [(s1, '10.0.0.0/8', ''), (s1, '11.0.0.0/8', '20.0.0.2')],
+        timeout=10)
+    assert converged
+    assert intervals == [2 * ROUTE_MIN_POLL_INTERVAL,
+                         4 * ROUTE_MIN_POLL_INTERVAL,
+                         ROUTE_MIN_POLL_INTERVAL]
+
+
+def test_several_switches_and_families(intervals):
+    s1 = FakeSwitch('s1')
+    s2 = FakeSwitch('s2', appear={'11.0.0.0/8': 2,
+                                  '2001:db8:0:1::/64': 3})
+    converged, elapsed = SwitchVtyshUtils.wait_for_routes(
+        [(s1, '10.0.0.0/8', '20.0.0.2'),
+         (s2, '11.0.0.0/8', '20.0.0.2'),
+         (s2, '2001:db8:0:1::/64', '2001:db8:0:12::2')], timeout=10)
+    assert converged
+    # Switches are no longer polled once all their routes are there.
+    assert s1.polls == {'sh ip bgp': 1, 'sh ipv6 bgp': 0}
+    assert s2.polls['sh ipv6 bgp'] == 3
+
+
+def test_wait_for_withdrawal(intervals):
+    s1 = FakeSwitch('s1', gone={'10.0.0.0/8': 2})
+    assert SwitchVtyshUtils.wait_for_routes(
+        [(s1, '10.0.0.0/8', '20.0.0.2', False)], timeout=10)[0]
+    assert s1.polls['sh ip bgp'] == 2
+
+    s1 = FakeSwitch('s1', gone={'10.0.0.0/8': 2})
+    assert SwitchVtyshUtils.wait_for_route(s1, '10.0.0.0/8', '20.0.0.2',
+                                           condition=False) is False
+
+
+def test_timeout(intervals):
+    s1 = FakeSwitch('s1')
+    start = time.time()
+    converged, elapsed = SwitchVtyshUtils.wait_for_routes(
+        [(s1, '10.0.0.0/8', '20.0.0.2'), (s1, '12.0.0.0/8', '20.0.0.2')],
+        timeout=1)
+    assert not converged
+    assert 1 <= elapsed < 1.5
+    assert time.time() - start < 1.5
+    assert max(intervals) <= ROUTE_MAX_POLL_INTERVAL
+    assert s1.polls['sh ip bgp'] == len(intervals) + 1
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+
+# Parses sample running-configs of OpenSwitch and Quagga, no switch needed.
+
+from opsvsiutils.configutils import *
+from opsvsiutils.vtyshutils import SwitchVtyshUtils
+
+OPS_RUNNING_CONFIG = """\
+Current configuration:\r
+!\r
+!\r
+router bgp 1\r
+     bgp router-id 8.0.0.1\r
+     network 9.0.0.0/8\r
+     neighbor 8.0.0.2 remote-as 2\r
+     neighbor 8.0.0.2 route-map rm1 out\r
+     neighbor 8.0.0.3 remote-as 12\r
+!\r
+interface 1\r
+    no shutdown\r
+    ip address 8.0.0.1/8\r
+"""
+
+QUAGGA_RUNNING_CONFIG = """\
+Building configuration...
+
+Current configuration:
+!
+hostname bgpd
+log stdout
+!
+router bgp 2
+ bgp router-id 9.0.0.1
+ network 11.0.0.0/8
+ neighbor 8.0.0.1 remote-as 1
+ !
+ address-family ipv6
+  network 2001::/64
+ exit-address-family
+!
+line vty
+!
+end
+"""
+
+
+def test_context_tree():
+    config = parse_running_config(OPS_RUNNING_CONFIG)
+    assert [node.line for node in config] == ['router bgp 1', 'interface 1']
+
+    bgp = config.context('router bgp 1')
+    assert bgp.child('bgp router-id 8.0.0.1') is not None
+    neighbors = bgp.children_with('neighbor', '8.0.0.2')
+    assert [n.line for n in neighbors] == \
+        ['neighbor 8.0.0.2 remote-as 2', 'neighbor 8.0.0.2 route-map rm1 out']
+    assert neighbors[0].path == ['router bgp 1', 'neighbor 8.0.0.2 remote-as 2']
+    assert config.context('interface 1', 'no shutdown') is not None
+    assert config.context('router bgp 2') is None
+
+
+def test_nested_quagga_contexts():
+    config = parse_running_config(QUAGGA_RUNNING_CONFIG)
+    assert [node.line for node in config] == \
+        ['hostname bgpd', 'log stdout', 'router bgp 2', 'line vty']
+    family = config.context('router bgp 2', 'address-family ipv6')
+    assert family.child('network 2001::/64') is not None
+    assert config.context('router bgp 2', 'exit-address-family') is not None
+
+
+def test_search_whole_words():
+    config = parse_running_config(OPS_RUNNING_CONFIG)
+    assert config.has('neighbor', 'remote-as', '2')
+    assert config.has('neighbor', '8.0.0.3', 'remote-as', '12')
+    assert not config.has('neighbor', '8.0.0.3', 'remote-as', '2')
+    assert not config.has('neighbor', '8.0.0.2', 'remote-as', '1')
+    assert config.has('router bgp')
+    assert config.has('route-map rm1 out')
+    assert not config.has('rm1 in')
+    assert config.has('neighbor', 'remote-as', '')
+    assert config.has('ip address', '8.0.0.1/8')
+    assert not config.has('ip address', '8.0.0.1')
+    assert not config.has()
+
+
+# Serves the running-config through the vtysh -c path of the node shell.
+class FakeSwitch(object):
+    def __init__(self, running_config):
+        self.running_config = running_config
+        self.fetches = 0
+
+    def cmd(self, cmd):
+        assert cmd == 'vtysh -c "sh running-config"'
+        self.fetches += 1
+        return self.running_config
+
+
+def test_verify_cfg_value():
+    switch = FakeSwitch(OPS_RUNNING_CONFIG)
+    # Any item and the value, as substrings.
+    assert SwitchVtyshUtils.verify_cfg_value(switch, ['neighbor'], '1')
+    assert SwitchVtyshUtils.verify_cfg_value(switch, ['8.0.0.3', 'rm9'], 12)
+    assert not SwitchVtyshUtils.verify_cfg_value(switch, ['neighbor'], '13')
+    assert SwitchVtyshUtils.verify_cfg_exist(switch, ['route-map'])
+    assert not SwitchVtyshUtils.verify_cfg_exist(switch, ['ospf'])
+    # Always on the current running-config.
+    assert switch.fetches == 5
+
+
+def test_verify_cfg_line():
+    switch = FakeSwitch(OPS_RUNNING_CONFIG)
+    assert SwitchVtyshUtils.verify_cfg_line(switch, ['neighbor', '8.0.0.3',
+                                                     'remote-as'], 12)
+    assert not SwitchVtyshUtils.verify_cfg_line(switch, ['neighbor'], '1')
+    assert not SwitchVtyshUtils.verify_cfg_line(switch, ['8.0.0.3', 'rm1'])
+    assert switch.fetches == 3
+
+    # The parsed running-config is reused, until it changes.
+    switch.running_config = QUAGGA_RUNNING_CONFIG
+    assert SwitchVtyshUtils.verify_cfg_line(switch, ['router bgp'], 1,
+                                            refresh=False)
+    assert switch.fetches == 3
+    assert SwitchVtyshUtils.verify_cfg_line(switch, ['router bgp'], 2)
+    assert switch.fetches == 4
@@ -0,0 +1,73 @@
+#!/usr/bin/python
+
+# Checks how VsiOpenSwitch.tuntap_batch reports failed ports, with the
+# command execution of the node faked, so that it can run without docker.
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from opsvsi.opsvsitest import *
+
+FAILED_PORT_OUTPUT = "ioctl(TUNSETIFF): Device or resource busy\r\n" \
+                     "Command failed /shared/tuntap_batch:2\r\n"
+
+
+@pytest.fixture
+def switch():
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.shareddir = tempfile.mkdtemp()
+    switch.cmds = []
+    yield switch
+    shutil.rmtree(switch.shareddir)
+
+
+def fake_exec(switch, result):
+    def execCmd(cmd):
+        switch.cmds.append(cmd)
+        return result
+    switch.execCmd = execCmd
+
+
+def test_batch_file(switch, capsys):
+    fake_exec(switch, (0, '', ''))
+    assert not switch.tuntap_batch(['1', '2', '49-1'])
+
+    batch = open(os.path.join(switch.shareddir, 'tuntap_batch')).read()
+    assert batch == "tuntap add dev 1 mode tap\n" \
+                    "tuntap add dev 2 mode tap\n" \
+                    "tuntap add dev 49-1 mode tap\n"
+    assert switch.cmds == ["timeout %d %s/sbin/ip -force -batch "
+                           "/shared/tuntap_batch" %
+                           (TUNTAP_BATCH_TIMEOUT, SWNS_EXEC)]
+    assert capsys.readouterr()[0] == ''
+
+
+def test_failed_port_through_the_shell(switch, capsys):
+    # The node shell gives stderr as part of stdout.
+    fake_exec(switch, (1, FAILED_PORT_OUTPUT, ''))
+    assert not switch.tuntap_batch(['1', '2', '3'])
+    assert capsys.readouterr()[0] == \
+        "Failed to add tuntap port 2: ioctl(TUNSETIFF): Device or " \
+        "resource busy\n"
+
+
+def test_failed_port_through_the_agent(switch, capsys):
+    fake_exec(switch, (1, '', FAILED_PORT_OUTPUT.replace('\r', '')))
+    assert not switch.tuntap_batch(['1', '2', '3'])
+    assert "Failed to add tuntap port 2:" in capsys.readouterr()[0]
+
+
+def test_timeout(switch, capsys):
+    fake_exec(switch, (124, '', ''))
+    assert switch.tuntap_batch(['1'])
+    assert "Failed tuntap command" in capsys.readouterr()[0]
+
+
+def test_no_ports(switch):
+    fake_exec(switch, (0, '', ''))
+    assert not switch.tuntap_batch([])
+    assert switch.cmds == []
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+
+# Runs VsiOpenSwitch.wait_for_services with the node shell replaced by a
+# local one and a fake systemctl on the PATH, so that it can run without
+# docker or systemd.
+
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import pytest
+
+from opsvsi.opsvsitest import *
+
+# Units get active 'delay' seconds after they are started, as given by
+# the <unit>.delay files, or never with 'never'. Like the real one,
+# 'systemctl start' returns once the units are up, after the seconds in
+# the start.delay file, and complains on stderr.
+FAKE_SYSTEMCTL = r'''#!/bin/sh
+cmd=$1
+shift
+case $cmd in
+start)
+    echo "Warning: fake systemctl start $*" >&2
+    touch $FAKE_SYSTEMD/started
+    sleep `cat $FAKE_SYSTEMD/start.delay 2>/dev/null || echo 0`
+    for u; do
+        [ -e $FAKE_SYSTEMD/$u.active ] && continue
+        d=`cat $FAKE_SYSTEMD/$u.delay 2>/dev/null || echo 0`
+        [ "$d" = never ] && d=1000
+        sleep $d >/dev/null 2>&1
+        touch $FAKE_SYSTEMD/$u.active
+    done
+    ;;
+is-active)
+    echo "$*" >> $FAKE_SYSTEMD/is-active.calls
+    quiet=0
+    if [ "$1" = --quiet ]; then
+        quiet=1
+        shift
+    fi
+    rc=3
+    for u; do
+        if [ -e $FAKE_SYSTEMD/$u.active ]; then
+            rc=0
+            state=active
+        else
+            state=inactive
+        fi
+        [ $quiet = 1 ] || echo $state
+    done
+    exit $rc
+    ;;
+esac
+'''
+
+
+@pytest.fixture
+def switch():
+    tmpdir = tempfile.mkdtemp()
+    path = os.path.join(tmpdir, 'systemctl')
+    f = open(path, 'w')
+    f.write(FAKE_SYSTEMCTL)
+    f.close()
+    os.chmod(path, 0755)
+
+    env = dict(os.environ, FAKE_SYSTEMD=tmpdir,
+               PATH=tmpdir + os.pathsep + os.environ['PATH'])
+
+    # Like the node shell, with stderr in the output.
+    def cmd(command):
+        return subprocess.Popen(['bash', '-c', command], env=env,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT).communicate()[0]
+
+    switch = VsiOpenSwitch.__new__(VsiOpenSwitch)
+    switch.name = 's1'
+    switch.cmd = cmd
+    switch.systemd = tmpdir
+    yield switch
+    shutil.rmtree(tmpdir)
+
+
+def set_state(switch, name, content):
+    f = open(os.path.join(switch.systemd, name), 'w')
+    f.write(content)
+    f.close()
+
+
+def test_waits_for_every_service(switch):
+    set_state(switch, 'b.delay', '0.6')
+    start = time.time()
+    assert switch.wait_for_services(['a', 'b', 'c'], 10, start=True)
+    assert time.time() - start >= 0.5
+
+
+def test_services_already_active(switch):
+    for unit in ('a', 'b'):
+        set_state(switch, unit + '.active', '')
+    assert switch.wait_for_services(['a', 'b'], 10)
+    assert not os.path.exists(os.path.join(switch.systemd, 'started'))
+
+
+def test_not_started_without_start(switch):
+    start = time.time()
+    assert not switch.wait_for_services(['a'], 1)
+    assert time.time() - start < 2
+
+
+def test_one_deadline_for_start_and_wait(switch):
+    set_state(switch, 'start.delay', '0.8')
+    set_state(switch, 'b.delay', 'never')
+    start = time.time()
+    assert not switch.wait_for_services(['a', 'b'], 1, start=True)
+    assert time.time() - start < 1.6
+
+
+def test_start_blocks_instead_of_polling(switch):
+    set_state(switch, 'a.delay', '0.3')
+    assert switch.wait_for_services(['a', 'b'], 10, start=True)
+    # Only the final check of the states.
+    calls = open(os.path.join(switch.systemd, 'is-active.calls')).read()
+    assert calls == "a b\n"